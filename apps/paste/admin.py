@@ -5,26 +5,20 @@
 
 import logging
 from django.contrib import admin, messages
+from apps.paste import pastetools
 from apps.paste.models import wp_paste
 from home.admin import admin_site
 log = logging.getLogger('wp.apps.paste.admin')
 
 
 def delete_expired(pastes):
-    """ Delete all expired pastes, given a QuerySet/List of pastes. """
-    try:
-        pastes = pastes.order_by('publish_date')
-    except AttributeError:
-        # Can't sort a list of pastes using order_by.
+    """ Delete all expired pastes, given a QuerySet of pastes.
+        Pastes with replies are kept.
+    """
+    if not hasattr(pastes, 'expired'):
+        # Can't bulk delete a list of pastes.
         return -1
-
-    deletedcount = 0
-    for p in pastes:
-        if p.is_expired():
-            p.delete()
-            deletedcount += 1
-
-    return deletedcount
+    return sum(pastetools.sweep_expired(pastes, delete=True))
 
 
 def delete_sel_expired(modeladmin, request, queryset):
@@ -40,21 +34,11 @@ delete_sel_expired.short_description = 'Delete selected expired pastes'
 
 
 def disable_expired(pastes):
-    """ Disabled all expired pastes, given a QuerySet/List of pastes. """
-    try:
-        pastes = pastes.order_by('publish_date')
-    except AttributeError:
-        # Can't sort a list of pastes using order_by.
+    """ Disabled all expired pastes, given a QuerySet of pastes. """
+    if not hasattr(pastes, 'expired'):
+        # Can't bulk update a list of pastes.
         return -1
-
-    disabledcount = 0
-    for p in pastes:
-        if p.is_expired():
-            p.disabled = True
-            p.save()
-            disabledcount += 1
-
-    return disabledcount
+    return sum(pastetools.sweep_expired(pastes))
 
 
 def disable_sel_expired(modeladmin, request, queryset):
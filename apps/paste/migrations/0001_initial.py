@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+import datetime
+
+
+class Migration(migrations.Migration):
+
+    # The wp_pastes table already exists on deployed sites,
+    # use: manage.py migrate paste --fake-initial
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='wp_paste',
+            fields=[
+                ('id', models.AutoField(serialize=False, primary_key=True, auto_created=True, verbose_name='ID')),
+                ('author', models.CharField(blank=True, default='', max_length=255, help_text='Author for the paste.', verbose_name='author')),
+                ('author_ip', models.CharField(blank=True, default='', max_length=15, help_text="Author's IP for the paste.", verbose_name="author's ip")),
+                ('content', models.TextField(help_text='Content for the paste.', verbose_name='content')),
+                ('title', models.CharField(blank=True, default='', max_length=255, help_text='Title for the paste.', verbose_name='title')),
+                ('language', models.CharField(blank=True, default='', max_length=255, help_text='Language for highlighting.', verbose_name='language')),
+                ('paste_id', models.CharField(blank=True, max_length=255, help_text='Paste ID for building urls.', verbose_name='paste id')),
+                ('publish_date', models.DateTimeField(default=datetime.datetime.now, help_text='Date the paste was published. (Set automatically)', verbose_name='publish date')),
+                ('apisubmit', models.BooleanField(default=False, help_text='Whether or not this was submitted with the public api.', verbose_name='api submitted')),
+                ('disabled', models.BooleanField(default=False, help_text='Whether or not this paste is disabled (not viewable).', verbose_name='disabled')),
+                ('onhold', models.BooleanField(default=False, help_text='Whether or not this paste is on hold (never expires).', verbose_name='on hold')),
+                ('private', models.BooleanField(default=False, help_text='Whether or not this paste is private (not listable).', verbose_name='private')),
+                ('view_count', models.PositiveIntegerField(default=0, help_text='How many times this paste has been viewed.', verbose_name='view count')),
+                ('parent', models.ForeignKey(blank=True, null=True, related_name='children', to='paste.wp_paste', verbose_name='parent of this paste')),
+            ],
+            options={
+                'get_latest_by': 'publish_date',
+                'verbose_name': 'Paste',
+                'db_table': 'wp_pastes',
+                'ordering': ['-publish_date'],
+                'verbose_name_plural': 'Pastes',
+            },
+            bases=(models.Model,),
+        ),
+    ]
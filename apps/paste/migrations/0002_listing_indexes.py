@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('paste', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='wp_paste',
+            name='view_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, help_text='How many times this paste has been viewed.', verbose_name='view count'),
+        ),
+        migrations.AlterIndexTogether(
+            name='wp_paste',
+            index_together=set([('disabled', 'private', 'publish_date')]),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+# Same as apps.paste.models.encode_tree_id, frozen for this migration.
+TREE_ID_WIDTH = 8
+
+
+def build_tree_paths(apps, schema_editor):
+    """ Set tree_path for all existing pastes, one thread level at a time.
+    """
+    wp_paste = apps.get_model('paste', 'wp_paste')
+    paths = {}
+    level = wp_paste.objects.filter(parent=None)
+    while level.exists():
+        levelids = []
+        for pk, parentid in level.values_list('id', 'parent_id'):
+            path = '{}{:0{width}x}'.format(
+                paths.get(parentid, ''),
+                pk,
+                width=TREE_ID_WIDTH
+            )
+            wp_paste.objects.filter(id=pk).update(tree_path=path)
+            paths[pk] = path
+            levelids.append(pk)
+        level = wp_paste.objects.filter(parent_id__in=levelids)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('paste', '0002_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wp_paste',
+            name='tree_path',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, help_text='Path of paste ids in the reply tree. (Set automatically)', max_length=1024, verbose_name='tree path'),
+        ),
+        migrations.RunPython(
+            build_tree_paths,
+            migrations.RunPython.noop
+        ),
+    ]
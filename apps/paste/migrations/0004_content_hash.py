@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import hashlib
+
+from django.db import models, migrations
+
+
+def build_content_hashes(apps, schema_editor):
+    """ Set content_hash for all existing pastes. """
+    wp_paste = apps.get_model('paste', 'wp_paste')
+    pastes = wp_paste.objects.filter(content_hash='')
+    for pk, content in pastes.values_list('id', 'content').iterator():
+        wp_paste.objects.filter(id=pk).update(
+            content_hash=hashlib.sha256(
+                (content or '').encode('utf-8')
+            ).hexdigest()
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('paste', '0003_tree_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wp_paste',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', editable=False, help_text='Hash of the content. (Set automatically)', max_length=64, verbose_name='content hash'),
+        ),
+        migrations.AlterIndexTogether(
+            name='wp_paste',
+            index_together=set([('disabled', 'private', 'publish_date'), ('author_ip', 'publish_date')]),
+        ),
+        migrations.RunPython(
+            build_content_hashes,
+            migrations.RunPython.noop
+        ),
+    ]
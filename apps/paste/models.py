@@ -1,21 +1,126 @@
 """ Welborn Productions - Apps - Paste - Models
     Holds information for the paste app.
 """
+import hashlib
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models import Max
+from django.db.models.functions import Concat, Length, Substr
 
 from wp_main.utilities import id_tools
 
 log = logging.getLogger('wp.apps.paste.models')
 
+# Pastes expire when they are this old (unless they are on hold).
+EXPIRE_AGE = timedelta(days=1)
+# Width of each paste id in a tree_path.
+TREE_ID_WIDTH = 8
+# Max length for a tree_path, which limits how deep a reply thread can go.
+TREE_PATH_LENGTH = 1024
+# Deepest reply allowed (root pastes are 0).
+MAX_TREE_DEPTH = (TREE_PATH_LENGTH // TREE_ID_WIDTH) - 1
+
+
+def encode_tree_id(pk):
+    """ Encode a paste's id for use in a tree_path.
+        These are fixed-width, so paths sort in thread order.
+    """
+    return '{:0{width}x}'.format(pk, width=TREE_ID_WIDTH)
+
+
+def get_content_hash(content):
+    """ Return a hash of paste content, for finding duplicate pastes. """
+    return hashlib.sha256((content or '').encode('utf-8')).hexdigest()
+
+
+def get_expire_cutoff():
+    """ Return the publish_date cutoff for expired pastes.
+        Pastes published before this (and not on hold) are expired.
+    """
+    return datetime.today() - EXPIRE_AGE
+
 
 def repr_header():
     """ Return a string header for the repr(paste) data. """
     return 'publish date        views  id       status   author     title'
 
 
+class PasteQuerySet(models.QuerySet):
+
+    """ Adds expiration filters, so expired pastes can be filtered in the
+        database instead of calling is_expired() on every paste.
+    """
+
+    def bulk_create(self, objs, batch_size=None):
+        """ Like QuerySet.bulk_create(), but ids are reserved first so
+            paste_id and tree_path are set for every paste.
+            Parents must already be saved.
+            If ids can't be reserved, each paste is saved separately.
+        """
+        objs = list(objs)
+        newpastes = [p for p in objs if p.id is None]
+        reserved = []
+        if newpastes:
+            reserved = id_tools.reserve_ids(
+                self.model,
+                count=len(newpastes)
+            )
+        if newpastes and not reserved:
+            log.debug('Unable to reserve ids, saving pastes separately.')
+            for paste in objs:
+                paste.save(force_insert=True)
+            return objs
+        for paste, pk in zip(newpastes, reserved):
+            paste.id = pk
+        for paste in objs:
+            paste.content_hash = get_content_hash(paste.content)
+            paste.paste_id = paste.paste_id or id_tools.encode_id(paste.id)
+            paste.tree_path = paste.build_tree_path()
+        return super(PasteQuerySet, self).bulk_create(
+            objs,
+            batch_size=batch_size
+        )
+
+    def expired(self, never_onhold=True):
+        """ Filter to expired pastes only.
+            Arguments:
+                never_onhold  : Whether on-hold pastes should be excluded.
+                                Like wp_paste.is_expired(never_onhold).
+        """
+        expired = self.filter(publish_date__lte=get_expire_cutoff())
+        if never_onhold:
+            return expired.filter(onhold=False)
+        return expired
+
+    def listable(self):
+        """ Filter to public, enabled, unexpired pastes. """
+        return self.filter(disabled=False, private=False).unexpired()
+
+    def thread(self, paste, include_self=True):
+        """ Filter to a paste and all of its replies (and their replies),
+            in thread order. This is a single range query on tree_path.
+            Arguments:
+                paste         : The wp_paste to get the thread for.
+                include_self  : Whether to include `paste` itself.
+        """
+        pastes = self.filter(
+            tree_path__startswith=paste.tree_path
+        ).order_by('tree_path')
+        if include_self:
+            return pastes
+        return pastes.exclude(id=paste.id)
+
+    def unexpired(self):
+        """ Filter to unexpired pastes (including on-hold pastes). """
+        return self.filter(
+            models.Q(onhold=True) |
+            models.Q(publish_date__gt=get_expire_cutoff())
+        )
+
+
 class wp_paste(models.Model):  # noqa
 
     """ A Paste object for the paste app. """
@@ -45,6 +150,16 @@ class wp_paste(models.Model):  # noqa
         help_text='Content for the paste.'
     )
 
+    # hash of the content, for duplicate checks without loading content.
+    content_hash = models.CharField(
+        'content hash',
+        max_length=64,
+        blank=True,
+        default='',
+        editable=False,
+        help_text='Hash of the content. (Set automatically)'
+    )
+
     # paste title..
     title = models.CharField(
         'title',
@@ -111,6 +226,7 @@ class wp_paste(models.Model):  # noqa
     view_count = models.PositiveIntegerField(
         'view count',
         default=0,
+        db_index=True,
         help_text='How many times this paste has been viewed.'
     )
 
@@ -123,8 +239,22 @@ class wp_paste(models.Model):  # noqa
         related_name='children'
     )
 
+    # Materialized path for the reply thread, from the root paste down to
+    # this paste (encode_tree_id() for each). Maintained on save.
+    tree_path = models.CharField(
+        'tree path',
+        max_length=TREE_PATH_LENGTH,
+        blank=True,
+        default='',
+        db_index=True,
+        editable=False,
+        help_text='Path of paste ids in the reply tree. (Set automatically)'
+    )
+
     date_hierarchy = 'publish_date'
 
+    objects = PasteQuerySet.as_manager()
+
     def __str__(self):
         """ Default string format for a paste object.
             This is a simple format, for more info see: __repr__
@@ -172,32 +302,118 @@ class wp_paste(models.Model):  # noqa
     class Meta:
         get_latest_by = 'publish_date'
         db_table = 'wp_pastes'
+        index_together = [
+            # For listings, which filter on these and sort by date.
+            ('disabled', 'private', 'publish_date'),
+            # For finding an author's last paste, when submitting.
+            ('author_ip', 'publish_date'),
+        ]
         ordering = ['-publish_date']
         verbose_name = 'Paste'
         verbose_name_plural = 'Pastes'
 
     def save(self, *args, **kwargs):
-        """ Generate paste_id before saving. """
+        """ Generate paste_id, tree_path, and content_hash before saving,
+            so a new paste is written with a single INSERT when the id can
+            be reserved.
+            Raises ValidationError if the reply thread would be too deep.
+            content_hash and tree_path are only rebuilt when the content or
+            parent changed since the paste was loaded.
+        """
+        loaded = getattr(self, '_loaded', None)
+        # Deferred content that was never loaded hasn't changed.
+        content = self.__dict__.get('content', None)
+        if (loaded is None) or (
+                (content is not None) and (content != loaded[0])):
+            self.content_hash = get_content_hash(self.content)
+        newpath = (
+            (loaded is None) or
+            (self.parent_id != loaded[1]) or
+            (not self.tree_path)
+        )
+        if newpath:
+            self.check_tree_depth()
+        if self.id is None:
+            reserved = id_tools.reserve_ids(wp_paste)
+            if reserved:
+                self.id = reserved[0]
+                kwargs['force_insert'] = True
+        if self.id is None:
+            # No id sequence to reserve from, the ids must be set after the
+            # INSERT.
+            super(wp_paste, self).save(*args, **kwargs)
+            self.paste_id = self.paste_id or id_tools.encode_id(self.id)
+            self.tree_path = self.build_tree_path()
+            wp_paste.objects.filter(id=self.id).update(
+                paste_id=self.paste_id,
+                tree_path=self.tree_path
+            )
+            self.set_loaded()
+            return
 
-        super(wp_paste, self).save(*args, **kwargs)
-        # Generate a paste_id for this paste if it doesnt have one already.
         if not self.paste_id:
-            self.generate_id()
+            self.paste_id = id_tools.encode_id(self.id)
+        oldpath = self.tree_path
+        if newpath:
+            self.tree_path = self.build_tree_path()
+        super(wp_paste, self).save(*args, **kwargs)
+        if oldpath and (oldpath != self.tree_path):
+            self.move_replies(oldpath)
+        self.set_loaded()
+
+    def build_tree_path(self):
+        """ Build tree_path from the parent's path.
+            The current path is kept if the parent is one of this paste's
+            own replies.
+        """
+        parentpath = ''
+        if self.parent is not None:
+            parentpath = self.parent.tree_path
+            if not parentpath:
+                # Parent was never saved with a path.
+                self.parent.save()
+                parentpath = self.parent.tree_path
+        if self.tree_path and parentpath.startswith(self.tree_path):
+            log.error('Paste cannot be a reply to its own reply: {}'.format(
+                self.paste_id or self.id
+            ))
+            return self.tree_path
+        return '{}{}'.format(parentpath, encode_tree_id(self.id))
+
+    def check_tree_depth(self):
+        """ Raise ValidationError if this paste (and any replies that
+            move with it) would be deeper than MAX_TREE_DEPTH.
+        """
+        if self.parent is None:
+            return
+        # A parent without a path yet gets one id's worth.
+        parentpath = self.parent.tree_path or encode_tree_id(0)
+        pathlen = len(parentpath) + TREE_ID_WIDTH
+        if self.tree_path:
+            # Replies are moved along with this paste.
+            deepest = wp_paste.objects.filter(
+                tree_path__startswith=self.tree_path
+            ).aggregate(pathlen=Max(Length('tree_path')))['pathlen']
+            pathlen += (deepest or len(self.tree_path)) - len(self.tree_path)
+        if pathlen > TREE_PATH_LENGTH:
+            raise ValidationError(
+                'Reply thread is too deep, max depth is {}.'.format(
+                    MAX_TREE_DEPTH
+                )
+            )
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        paste = super(wp_paste, cls).from_db(db, field_names, values)
+        paste.set_loaded()
+        return paste
 
     def generate_id(self):
-        """ Get current paste_id, or generate a new one and saves it. """
-        if self.paste_id:
-            return self.paste_id
-
-        realid = self.id
-        if realid is None:
-            # This will call generate_id() again, but make an id to use.
+        """ Get current paste_id, or generate a new one and save it. """
+        if not self.paste_id:
+            # The paste_id is generated in save().
             self.save()
-
-        newid = id_tools.encode_id(realid)
-        self.paste_id = newid
-        # Save the newly generated id.
-        self.save()
+        return self.paste_id
 
     def get_url(self):
         """ Return absolute url.
@@ -205,6 +421,15 @@ class wp_paste(models.Model):  # noqa
         """
         return '/paste/?id={}'.format(self.paste_id)
 
+    def increment_views(self):
+        """ Add 1 to the view_count with a single UPDATE query,
+            without saving anything else.
+        """
+        wp_paste.objects.filter(id=self.id).update(
+            view_count=models.F('view_count') + 1
+        )
+        self.view_count += 1
+
     def is_expired(self, never_onhold=True):
         """ Determine if this paste is expired.
             Pastes that are on hold will never expire.
@@ -214,11 +439,24 @@ class wp_paste(models.Model):  # noqa
             return False
 
         try:
-            elapsed = datetime.today() - self.publish_date
+            return self.publish_date <= get_expire_cutoff()
         except Exception as ex:
             log.error('Error getting elapsed time:\n{}'.format(ex))
-            return False
-        return (elapsed.days > 0)
+        return False
+
+    def move_replies(self, oldpath):
+        """ Move all replies (and their replies) along with this paste,
+            after its tree_path changed from `oldpath` (when the parent was
+            changed). This is a single update() query.
+        """
+        wp_paste.objects.filter(
+            tree_path__startswith=oldpath
+        ).exclude(id=self.id).update(
+            tree_path=Concat(
+                models.Value(self.tree_path),
+                Substr('tree_path', len(oldpath) + 1)
+            )
+        )
 
     def reverse_id(self, pasteid=None):
         """ Decode a paste_id, return the actual id.
@@ -230,3 +468,14 @@ class wp_paste(models.Model):  # noqa
             return id_tools.decode_id(self.paste_id)
         # Decode pasteid given..
         return id_tools.decode_id(pasteid)
+
+    def set_loaded(self):
+        """ Remember the saved content and parent, so save() can skip
+            rebuilding content_hash and tree_path when they don't change.
+        """
+        self._loaded = (self.__dict__.get('content', None), self.parent_id)
+
+    @property
+    def tree_depth(self):
+        """ Depth of this paste in its thread. Root pastes are 0. """
+        return max(0, (len(self.tree_path) // TREE_ID_WIDTH) - 1)
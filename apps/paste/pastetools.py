@@ -2,6 +2,53 @@
     Tools for dealing with wp_paste objects.
     -Christopher Welborn 1-3-17
 """
+import base64
+import json
+from collections import Counter, namedtuple
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+# A reply from get_paste_thread(), with its depth below the thread's paste,
+# and the number of visible direct replies it has.
+PasteThreadItem = namedtuple(
+    'PasteThreadItem',
+    ['level', 'paste', 'replycount']
+)
+
+
+def decode_cursor(cursor, orderfield):
+    """ Decode a listing cursor from encode_cursor().
+        Returns a tuple of (orderfield value, id).
+        Raises ValueError for invalid cursors.
+    """
+    try:
+        value, pk = json.loads(
+            base64.urlsafe_b64decode(cursor.encode()).decode()
+        )
+    except (TypeError, ValueError, UnicodeError) as ex:
+        raise ValueError('Invalid cursor: {}'.format(ex))
+    if orderfield == 'publish_date':
+        value = parse_datetime(value or '')
+        if value is None:
+            raise ValueError('Invalid cursor date.')
+    elif not isinstance(value, int):
+        raise ValueError('Invalid cursor value.')
+    if not isinstance(pk, int):
+        raise ValueError('Invalid cursor id.')
+    return value, pk
+
+
+def encode_cursor(paste, orderfield):
+    """ Encode a listing cursor, pointing to the paste after `paste`.
+        The cursor is an opaque string for the public api.
+    """
+    value = getattr(paste, orderfield)
+    if orderfield == 'publish_date':
+        value = value.isoformat()
+    return base64.urlsafe_b64encode(
+        json.dumps([value, paste.id]).encode()
+    ).decode()
 
 
 def get_paste_children(paste, order_by='-publish_date'):
@@ -11,19 +58,67 @@ def get_paste_children(paste, order_by='-publish_date'):
         # Don't show private replies for public pastes.
         filterargs['private'] = False
 
-    # Use ids at first, running is_expired(). No content needed for this.
-    children_ids = set(
-        p.id
-        for p in paste.children.defer('content').filter(**filterargs)
-        if not p.is_expired()
-    )
-    # Convert back into QuerySet using filter and children_ids.
-    children = paste.children.filter(id__in=children_ids)
+    children = paste.children.filter(**filterargs).unexpired()
     if order_by:
         return children.order_by(order_by)
     return children
 
 
+def get_paste_children_ids(pastes, order_by='-publish_date'):
+    """ Get reply paste_ids for a batch of pastes, in one query.
+        Applies the same rules as get_paste_children().
+        Returns a dict of {paste.id: [child paste_id, ...]}.
+    """
+    pastes = list(pastes)
+    if not pastes:
+        return {}
+    model = type(pastes[0])
+    private = {p.id: p.private for p in pastes}
+    childids = {p.id: [] for p in pastes}
+    children = model.objects.filter(
+        parent_id__in=list(private),
+        disabled=False
+    ).unexpired()
+    if order_by:
+        children = children.order_by(order_by)
+    rows = children.values_list('parent_id', 'paste_id', 'private')
+    for parentid, pasteid, childprivate in rows:
+        # Don't show private replies for public pastes.
+        if childprivate and not private[parentid]:
+            continue
+        childids[parentid].append(pasteid)
+    return childids
+
+
+def get_paste_page(pastes, orderfield, cursor=None, limit=25):
+    """ Get one page of pastes, in descending `orderfield` order,
+        using keyset pagination ((orderfield, id) < cursor).
+        Arguments:
+            pastes      : A wp_paste QuerySet to paginate.
+            orderfield  : Field to order by, 'publish_date' or 'view_count'.
+            cursor      : A cursor from a previous page, or None for the
+                          first page.
+            limit       : Max number of pastes for the page (at least 1).
+        Returns a tuple of (list of pastes, next cursor or None).
+        Raises ValueError for invalid cursors or limits.
+    """
+    if limit < 1:
+        raise ValueError('Invalid limit: {}'.format(limit))
+    if cursor:
+        value, pk = decode_cursor(cursor, orderfield)
+        pastes = pastes.filter(
+            Q(**{'{}__lt'.format(orderfield): value}) |
+            Q(**{orderfield: value, 'id__lt': pk})
+        )
+    pastes = pastes.order_by('-{}'.format(orderfield), '-id')
+    # Grab one extra, to see if there is a next page.
+    page = list(pastes[:limit + 1])
+    if len(page) > limit:
+        page = page[:limit]
+        return page, encode_cursor(page[-1], orderfield)
+    return page, None
+
+
 def get_paste_parent(paste):
     """ Get a paste's parent, if it is not disabled.
         A private parent is only viewable if the child (`paste`) is private
@@ -43,3 +138,67 @@ def get_paste_parent(paste):
     if paste.parent.is_expired():
         return None
     return paste.parent
+
+
+def get_paste_thread(paste):
+    """ Get all visible replies for a paste (and their replies), in thread
+        order, using a single query on the materialized tree_path.
+        Applies the same rules as get_paste_children() at each level, and
+        replies to hidden pastes are hidden also.
+        Paste content is deferred.
+        Returns a list of PasteThreadItem.
+    """
+    model = type(paste)
+    replies = model.objects.thread(
+        paste,
+        include_self=False
+    ).filter(disabled=False).unexpired().defer('content')
+    basedepth = paste.tree_depth
+    # Visible pastes, with whether they are private.
+    private = {paste.id: paste.private}
+    visible = []
+    for p in replies:
+        if p.parent_id not in private:
+            # Parent is hidden.
+            continue
+        if p.private and not private[p.parent_id]:
+            # Don't show private replies for public pastes.
+            continue
+        private[p.id] = p.private
+        visible.append(p)
+
+    replycounts = Counter(p.parent_id for p in visible)
+    return [
+        PasteThreadItem(p.tree_depth - basedepth, p, replycounts[p.id])
+        for p in visible
+    ]
+
+
+def sweep_expired(model, delete=False, batch_size=500):
+    """ Disable (or delete) expired pastes in batches, using a single
+        UPDATE (or DELETE) per batch. On-hold pastes are never swept.
+        Deleting only removes pastes without replies, so each sweep
+        removes the leaves of expired threads.
+        This is a generator, yielding the number of pastes swept for each
+        batch.
+        Arguments:
+            model       : The wp_paste model (or a QuerySet to sweep).
+            delete      : Whether to delete pastes instead of disabling.
+            batch_size  : Max number of pastes to sweep in each batch.
+    """
+    pastes = getattr(model, 'objects', model).all().expired()
+    if delete:
+        pastes = pastes.filter(children=None)
+    else:
+        pastes = pastes.filter(disabled=False)
+    pastes = pastes.order_by('publish_date')
+    while True:
+        ids = list(pastes.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        batch = pastes.model.objects.filter(id__in=ids)
+        if delete:
+            batch.delete()
+        else:
+            batch.update(disabled=True)
+        yield len(ids)
@@ -9,36 +9,46 @@
 from docopt import docopt
 import os
 import sys
+import time
 
 # A little hack to use django_init.
 scriptsdir = os.path.abspath(os.path.join(sys.path[0], '../../../scripts'))
 sys.path.insert(1, scriptsdir)
 
 NAME = 'pastetool.py'
-VERSION = '1.1.0'
+VERSION = '1.2.0'
 VERSIONSTR = '{} v. {}'.format(NAME, VERSION)
 SCRIPT = os.path.split(sys.argv[0])[-1]
 
 USAGESTR = """{versionstr}
     This tool is for very specific operations, such as deleting/disabling
     expired pastes.
+    Expired pastes are disabled/deleted in batches, with one query per
+    batch, so this can be run from cron to sweep them regularly:
+        */15 * * * * /path/to/apps/paste/scripts/pastetool.py -d -q
 
     For modifying a single paste, you can run the updatepaste tool
     found in /wp_site/scripts.
 
     Usage:
         {script} [-h | -v]
-        {script} -a | -d | -D | -e | -E
+        {script} -a | -e | -E
+        {script} (-d | -D) [-b num] [-q]
 
     Options:
         -a,--all             : Show all pastes.
+        -b num,--batch num   : Number of pastes to disable/delete with each
+                               query.
+                               Default: 500
         -d,--disableexpired  : Disable expired pastes.
-        -D,--deleteexpired   : Delete expired pastes. Will not delete onholds.
+        -D,--deleteexpired   : Delete expired pastes. Will not delete onholds,
+                               or pastes with replies.
         -e,--expired         : Show expired pastes.
         -E,--enableexpired   : Enable expired pastes.
                                This is dangerous. It will enable all disabled,
                                expired pastes.
         -h,--help            : Show this help message.
+        -q,--quiet           : Only print errors when disabling/deleting.
         -v,--version         : Show version.
 """.format(script=SCRIPT, versionstr=VERSIONSTR)
 
@@ -59,7 +69,8 @@ except Exception as ex:
     sys.exit(1)
 
 # Import django stuff
-from apps.paste.models import wp_paste
+from apps.paste import pastetools  # noqa
+from apps.paste.models import wp_paste  # noqa
 
 
 def main(argd):
@@ -69,83 +80,74 @@ def main(argd):
         return print_all()
     elif argd['--enableexpired']:
         # Enable expired pastes.
-        return do_modify_expired(disabled=False)
+        return do_enable_expired()
     elif argd['--expired']:
         # Show expired pastes.
         return print_expired()
-    elif argd['--deleteexpired']:
-        # Delete expired pastes.
-        return do_modify_expired(delete=True)
-    elif argd['--disableexpired']:
-        # Disable expired pastes.
-        return do_modify_expired(disabled=True)
+    elif argd['--deleteexpired'] or argd['--disableexpired']:
+        # Delete or disable expired pastes.
+        try:
+            batchsize = max(1, int(argd['--batch'] or 500))
+        except ValueError as ex:
+            print('\nInvalid batch size: {}'.format(ex))
+            return 1
+        return do_sweep_expired(
+            delete=argd['--deleteexpired'],
+            batch_size=batchsize,
+            quiet=argd['--quiet']
+        )
     else:
         # Default action, show expired pastes.
         return print_expired()
     return 0
 
 
-def do_modify_expired(**kwargs):
-    """ Modify expired pastes.
-        Keyword arguments are used to set attributes on the paste.
-        do_modify_expired(disabled=True)
-        will set paste.disabled=True on every expired paste.
-
-        There is one special keyword argument:
-            do_modify_expired(delete=True)
-            ..this will paste.delete() the expired pastes.
-    """
-
-    if not kwargs:
-        print('Expecting attributes to set, or delete=True!')
+def do_enable_expired():
+    """ Enable all disabled, expired pastes. """
+    try:
+        modcnt = wp_paste.objects.expired(never_onhold=False).filter(
+            disabled=True
+        ).update(disabled=False)
+    except Exception as ex:
+        print('\nUnable to enable pastes!\n{}'.format(ex))
         return 1
-
-    delete = kwargs.get('delete', False)
-    # The delete arg needs to be removed, so its not seen as a paste attribute
-    if 'delete' in kwargs:
-        kwargs.pop('delete')
-
-    modcnt = 0
-    for paste in iter_expired():
-        # Deleting the pastes?
-        if delete:
-            if paste.onhold:
-                print('    on hold: {}'.format(paste.paste_id))
-            else:
-                paste.delete()
-                print('    deleted: {}'.format(paste.paste_id))
-        else:
-            # Setting attributes.
-            attrset = []
-            for attr in kwargs:
-                attrval = kwargs[attr]
-                setattr(paste, attr, attrval)
-                attrset.append('{} = {}'.format(attr, attrval))
-            # Save modifications
-            paste.save()
-            print('    set attributes for: {}'.format(paste.paste_id))
-            print('        {}'.format('\n        '.join(attrset)))
-        modcnt += 1
-
     pastestr = 'paste' if modcnt == 1 else 'pastes'
-    print('\nModified {} {}.'.format(modcnt, pastestr))
+    print('\nEnabled {} {}.'.format(modcnt, pastestr))
     return 0
 
 
-def iter_expired():
-    """ Yields expired pastes. """
+def do_sweep_expired(delete=False, batch_size=500, quiet=False):
+    """ Disable or delete expired pastes, in batches, printing the
+        throughput.
+    """
+    action = 'Deleted' if delete else 'Disabled'
+    modcnt = batches = 0
+    start = time.time()
     try:
-        pastes = wp_paste.objects.order_by('publish_date')
+        for count in pastetools.sweep_expired(
+                wp_paste,
+                delete=delete,
+                batch_size=batch_size):
+            modcnt += count
+            batches += 1
+            if not quiet:
+                print('    {} {} pastes.'.format(action.lower(), count))
     except Exception as ex:
-        print('\nUnable to retrieve pastes!\n{}'.format(ex))
-        return
+        print('\nError sweeping pastes:\n{}'.format(ex))
+        return 1
 
-    for paste in pastes:
-        if paste.is_expired(never_onhold=False):
-            yield paste
-        else:
-            # This paste is not expired, and all other pastes are newer.
-            return
+    if not quiet:
+        elapsed = time.time() - start
+        pastestr = 'paste' if modcnt == 1 else 'pastes'
+        print('\n{} {} {} in {} batches, {:.2f}s ({:.0f}/s).'.format(
+            action,
+            modcnt,
+            pastestr,
+            batches,
+            elapsed,
+            (modcnt / elapsed) if elapsed else 0,
+        ))
+    return 0
 
 
 def print_all():
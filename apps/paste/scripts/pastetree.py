@@ -72,27 +72,28 @@ def main(argd):
 
 
 def iter_paste_children(paste, level=1):
-    """ Iterate over all children of a paste, and children's children. """
-    for p in paste.children.order_by('publish_date'):
-        yield IterPasteResult(level, p)
-        if p.children.count() > 0:
-            yield from iter_paste_children(p, level=level + 1)
+    """ Iterate over all children of a paste, and children's children.
+        The whole thread is retrieved in one query.
+    """
+    basedepth = paste.tree_depth - (level - 1)
+    for p in wp_paste.objects.thread(paste, include_self=False):
+        yield IterPasteResult(p.tree_depth - basedepth, p)
 
 
 def iter_pastes(startpastes=None):
-    """ Iterate over all pastes that have no parent.
-        Given a 'startpastes' list, it will start from that paste only.
+    """ Iterate over all pastes that have no parent, and their threads.
+        Given a 'startpastes' paste, it will start from that paste only.
     """
     if startpastes is None:
-        pastes = wp_paste.objects.filter(parent=None)
-        pastes = pastes.order_by('publish_date')
+        # All threads, in thread order.
+        pastes = wp_paste.objects.order_by('tree_path')
+        basedepth = 0
     else:
-        pastes = [startpastes]
+        pastes = wp_paste.objects.thread(startpastes)
+        basedepth = startpastes.tree_depth
 
     for p in pastes:
-        yield IterPasteResult(0, p)
-        if p.children.count() > 0:
-            yield from iter_paste_children(p, level=1)
+        yield IterPasteResult(p.tree_depth - basedepth, p)
 
 
 def print_pasteresult(iresult):
@@ -16,6 +16,10 @@ register = template.Library()
 @register.filter
 def child_count(paste):
     """ Get count of children for this paste. """
+    replycount = getattr(paste, 'reply_count', None)
+    if replycount is not None:
+        # Already counted with pastetools.get_paste_thread().
+        return replycount
     if paste and hasattr(paste, 'children'):
         # No content needed for the count.
         return (
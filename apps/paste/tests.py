@@ -0,0 +1,55 @@
+import json
+
+from django.test import TestCase
+
+from apps.paste.models import wp_paste
+from apps.paste.pastetools import get_paste_page
+from apps.paste.views import JSONLISTINGMAX
+
+
+class PasteTest(TestCase):
+
+    def setUp(self):
+        for i in range(3):
+            wp_paste.objects.create(content='paste {}'.format(i))
+
+    def get_listing(self, limit):
+        """ Get the latest paste listing from the api, as a dict. """
+        resp = self.client.get(
+            '/paste/api/',
+            {'id': 'latest', 'limit': limit}
+        )
+        self.assertEqual(resp.status_code, 200, msg='limit={}'.format(limit))
+        return json.loads(resp.content.decode())
+
+    def test_get_paste_page(self):
+        """ get_paste_page() pages through pastes, and rejects bad limits. """
+        pastes = wp_paste.objects.all()
+        page, cursor = get_paste_page(pastes, 'publish_date', limit=2)
+        self.assertEqual(len(page), 2)
+        self.assertIsNotNone(cursor)
+        page, cursor = get_paste_page(
+            pastes,
+            'publish_date',
+            cursor=cursor,
+            limit=2
+        )
+        self.assertEqual(len(page), 1)
+        self.assertIsNone(cursor)
+        for limit in (0, -1):
+            with self.assertRaises(ValueError, msg='limit={}'.format(limit)):
+                get_paste_page(pastes, 'publish_date', limit=limit)
+
+    def test_listing_limit(self):
+        """ Paste listing limits are clamped to 1 - JSONLISTINGMAX. """
+        for limit in (0, -5):
+            data = self.get_listing(limit)
+            self.assertEqual(data['status'], 'ok', msg=data)
+            self.assertEqual(data['count'], 1, msg='limit={}'.format(limit))
+
+        for i in range(JSONLISTINGMAX):
+            wp_paste.objects.create(content='more {}'.format(i))
+        data = self.get_listing(JSONLISTINGMAX * 10)
+        self.assertEqual(data['status'], 'ok', msg=data)
+        self.assertEqual(data['count'], JSONLISTINGMAX)
+        self.assertTrue(data['next'], msg='next cursor was not set.')
@@ -5,6 +5,7 @@
 """
 
 import logging
+import time
 from datetime import datetime
 
 from django.views.decorators.csrf import (
@@ -13,12 +14,13 @@ from django.views.decorators.csrf import (
 from django.views.decorators.cache import never_cache
 
 from wp_main.utilities import responses
+from wp_main.utilities.ratelimit import SlidingWindowLimiter
 from wp_main.utilities.utilities import (
     get_object, get_remote_ip, parse_bool
 )
 
 # For creating/accessing wp_paste() objects.
-from apps.paste.models import wp_paste
+from apps.paste.models import get_content_hash, wp_paste
 from apps.paste import pastetools
 from apps.models import wp_app
 
@@ -29,8 +31,12 @@ log = logging.getLogger('wp.apps.paste')
 REPLYMAX = 10
 # Maximum amount of pastes to show in simple listings.
 LISTINGMAX = 25
+# Maximum amount of pastes for each page of a JSON listing.
+JSONLISTINGMAX = 50
 # Minimum seconds allowed between public api paste submits.
 MIN_SUBMIT_SECS = 15
+# Recent public api submits by ip, checked before the database.
+SUBMIT_LIMITER = SlidingWindowLimiter(MIN_SUBMIT_SECS)
 
 
 def invalidate_submit(submitdata):
@@ -47,6 +53,8 @@ def invalidate_submit(submitdata):
                 reject_the_paste('Not allowed: {}'.format(invalid_reason))
             else:
                 save_the_paste()
+        The submit is only recorded in SUBMIT_LIMITER by process_submit(),
+        once the paste was saved.
 
         Arguments:
             submitdata  : A dict of paste data, usually from JSON.
@@ -57,34 +65,41 @@ def invalidate_submit(submitdata):
         # None, or '' was passed (unable to get ip,  give'em a break)
         return None
 
-    userpastes = wp_paste.objects.filter(author_ip=ipaddr)
-    if not userpastes:
-        # User has no pastes..
-        return None
-
-    # Get user's last paste.
-    lastpaste = userpastes.latest('publish_date')
-    try:
-        elapsed = (datetime.now() - lastpaste.publish_date).total_seconds()
-    except Exception as ex:
-        log.error('Error getting elapsed paste-time for: {}\n{}'.format(
-            lastpaste,
-            ex))
-        # Don't fault a possibly good user for our error.
-        return None
-
     # Deny pastes that are less than MIN_SUBMIT_SECS (seconds) apart.
-    if elapsed < MIN_SUBMIT_SECS:
-        return 'Last paste time: {}s ago'.format(elapsed)
+    # This process may have seen the last paste already.
+    lasttime = SUBMIT_LIMITER.last_hit(ipaddr)
+    if lasttime is not None:
+        return 'Last paste time: {}s ago'.format(time.time() - lasttime)
 
-    # Deny pastes that have the same content as the last one.
     content = submitdata.get('content', None)
     if not content:
         return 'Paste has no content.'
 
-    lang = submitdata.get('language', None)
-    if (content == lastpaste.content) and (lang == lastpaste.language):
-        return 'Same as last paste.'
+    # Get user's last paste, without the content.
+    lastpaste = wp_paste.objects.filter(author_ip=ipaddr).order_by(
+        '-publish_date'
+    ).values('publish_date', 'content_hash', 'language').first()
+    if lastpaste is not None:
+        try:
+            elapsed = (
+                datetime.now() - lastpaste['publish_date']
+            ).total_seconds()
+        except Exception as ex:
+            log.error('Error getting elapsed paste-time for: {}\n{}'.format(
+                ipaddr,
+                ex))
+            # Don't fault a possibly good user for our error.
+            return None
+        if elapsed < MIN_SUBMIT_SECS:
+            return 'Last paste time: {}s ago'.format(elapsed)
+
+        # Deny pastes that have the same content as the last one.
+        lang = submitdata.get('language', None)
+        samecontent = (
+            get_content_hash(content.strip()) == lastpaste['content_hash']
+        )
+        if samecontent and (lang == lastpaste['language']):
+            return 'Same as last paste.'
 
     # Paste passed the gauntlet.
     return None
@@ -111,33 +126,54 @@ def json_paste(request, pasteidarg):
 
     # Valid paste, build the response data.
     respdata = paste_data(pasteobj)
+    respdata['thread'] = paste_thread_data(pasteobj)
     respdata['status'] = 'ok'
     respdata['message'] = 'Paste id: {} retrieved.'.format(respdata['id'])
 
     return responses.json_response(respdata)
 
 
-def json_paste_listing(groupby=None):
+def json_paste_listing(request, groupby=None):
     """ Get a paste listing in JSON format.
+        Listings are paginated, the 'next' cursor in the response can be
+        passed back as the 'cursor' arg to get the next page.
         Returns an HttpResponse with application/json.
         Arguments:
+            request  : Request, for the 'cursor' and 'limit' args.
             groupby  : None, 'all', 'latest': Sort by date.
                        'top' : Sort by view count.
     """
-    # List all paste items (with custom orderby)
-    pastes = wp_paste.objects.filter(disabled=False, private=False)
-    respdata = {'count': 0, 'pastes': []}
+    # List public, unexpired paste items (with custom orderby)
+    pastes = wp_paste.objects.listable().select_related(
+        'parent'
+    ).defer('parent__content')
     if groupby == 'top':
-        orderby = '-view_count'
+        orderfield = 'view_count'
     else:
-        orderby = '-publish_date'
+        orderfield = 'publish_date'
 
-    # Build pastes data. Only public and unexpired pastes should show.
-    respdata['pastes'] = [
-        paste_data(p) for p in pastes.order_by(orderby)
-        if not p.is_expired()
-    ]
+    cursor = responses.get_request_arg(request, 'cursor', default='')
+    limit = responses.get_request_arg(
+        request,
+        'limit',
+        default=JSONLISTINGMAX
+    )
+    # min_val/max_val are not used when a default is given.
+    limit = max(1, min(limit, JSONLISTINGMAX))
+    try:
+        page, nextcursor = pastetools.get_paste_page(
+            pastes,
+            orderfield,
+            cursor=cursor or None,
+            limit=limit
+        )
+    except ValueError as ex:
+        return responses.json_response(paste_err_data(str(ex)))
+
+    respdata = {'count': 0, 'pastes': []}
+    respdata['pastes'] = pastes_data(page)
     respdata['count'] = len(respdata['pastes'])
+    respdata['next'] = nextcursor or ''
     respdata['status'] = 'ok'
     if respdata['count'] == 0:
         respdata['message'] = 'No pastes to retrieve.'
@@ -160,20 +196,19 @@ def list_view(request, title=None, filterkw=None, orderby=None):
     filterkw['private'] = filterkw.get('private', False)
 
     try:
-        p = wp_paste.objects.filter(**filterkw)
+        # Listings don't show the content.
+        p = wp_paste.objects.filter(**filterkw).defer('content')
         if orderby is not None:
             p = p.order_by(orderby)
         # Expired pastes should not show up in the list for non-admins.
         if not request.user.is_staff:
-            p = [paste for paste in p if not paste.is_expired()]
+            p = p.unexpired()
+        p = list(p[:LISTINGMAX])
     except Exception as ex:
         errmsg = 'Unable to retrieve pastes for: {}\n{}'
         log.error(errmsg.format(title, ex))
         p = []
 
-    if len(p) > LISTINGMAX:
-        p = p[:LISTINGMAX]
-
     context = {
         'pastes': p,
         'listing_title': title,
@@ -200,12 +235,21 @@ def paste_err_data(msg=None):
         'replies': [],
         'replycount': 0,
         'replyto': '',
+        'thread': [],
+        'next': '',
         'message': msg if msg else '',
     }
 
 
-def paste_data(paste, doreplies=True, doparent=True):
-    """ Build Paste JSON data for a valid paste. """
+def paste_data(paste, doreplies=True, doparent=True, replies=None):
+    """ Build Paste JSON data for a valid paste.
+        Arguments:
+            paste      : The wp_paste to build data for.
+            doreplies  : Whether to include reply ids.
+            doparent   : Whether to include the parent id.
+            replies    : Reply ids that were already retrieved, so they
+                         don't have to be queried for again.
+    """
     resp = {
         'title': paste.title,
         'author': paste.author,
@@ -218,7 +262,9 @@ def paste_data(paste, doreplies=True, doparent=True):
     }
     # Handle paste replies, by id.
     resp['replies'] = []
-    if doreplies:
+    if doreplies and (replies is not None):
+        resp['replies'] = list(replies)
+    elif doreplies:
         resp['replies'] = [
             p.paste_id
             for p in pastetools.get_paste_children(paste).defer('content')
@@ -234,6 +280,44 @@ def paste_data(paste, doreplies=True, doparent=True):
     return resp
 
 
+def paste_thread_data(paste):
+    """ Build JSON data for all replies in a paste's thread,
+        in thread order.
+    """
+    pasteids = {paste.id: paste.paste_id}
+    thread = []
+    for item in pastetools.get_paste_thread(paste):
+        pasteids[item.paste.id] = item.paste.paste_id
+        thread.append({
+            'id': item.paste.paste_id,
+            'replyto': pasteids[item.paste.parent_id],
+            'depth': item.level,
+            'replycount': item.replycount,
+        })
+    return thread
+
+
+def pastes_data(pastes, doreplies=True, doparent=True):
+    """ Build Paste JSON data for a batch of valid pastes.
+        The reply ids for all pastes are retrieved in a single query.
+        Parents should be loaded with select_related('parent'), to avoid
+        a query for each paste.
+    """
+    pastes = list(pastes)
+    replies = {}
+    if doreplies:
+        replies = pastetools.get_paste_children_ids(pastes)
+    return [
+        paste_data(
+            p,
+            doreplies=doreplies,
+            doparent=doparent,
+            replies=replies.get(p.id, [])
+        )
+        for p in pastes
+    ]
+
+
 def process_submit(submitdata, apisubmit=False):
     """ Given request arguments, parses them and tries to create a new paste.
         The submitdata can be any dict.
@@ -298,6 +382,9 @@ def process_submit(submitdata, apisubmit=False):
     try:
         # Try saving the new paste.
         newpaste.save()
+        if apisubmit and newpaste.author_ip:
+            # Only saved pastes count against the submit limit.
+            SUBMIT_LIMITER.add(newpaste.author_ip)
         # Build success message with id/url/message.
         jsonresp = {
             'status': 'ok',
@@ -414,7 +501,7 @@ def view_index(request):
     app = get_object(wp_app.objects, alias='paste')
     if app:
         app.view_count += 1
-        app.save()
+        app.save(update_fields=['view_count'])
 
     # If the request has args pass it on down to view_paste()
     if request.GET or request.POST:
@@ -454,7 +541,7 @@ def view_json(request):
 
     if pasteidarg in {'all', 'latest', 'top'}:
         # Paste listing.
-        return json_paste_listing(pasteidarg)
+        return json_paste_listing(request, pasteidarg)
 
     # Try retrieving a single paste.
     return json_paste(request, pasteidarg)
@@ -515,9 +602,7 @@ def view_paste(request):
             # Grab parent as the replyto object.
             replytoobj = pastetools.get_paste_parent(pasteobj)
             # Update some info about the paste.
-            pasteobj.view_count += 1
-            # Save changes.
-            pasteobj.save()
+            pasteobj.increment_views()
 
     if replytoidarg is not None:
         # Lookup parent paste by id.
@@ -586,8 +671,7 @@ def view_paste_raw(request):
         return responses.error404(request, 'Paste is expired.')
 
     try:
-        pasteobj.view_count += 1
-        pasteobj.save()
+        pasteobj.increment_views()
     except Exception as ex:
         log.error('Unable to update view_count!\n{}'.format(ex))
     try:
@@ -618,7 +702,12 @@ def view_replies(request):
         errmsg = 'Paste not found: {}'.format(pasteidarg)
         return responses.error404(request, errmsg)
 
-    replies = pastetools.get_paste_children(pasteobj)
+    # The whole thread is one query, and gives the reply counts too.
+    replies = []
+    for item in pastetools.get_paste_thread(pasteobj):
+        if item.level == 1:
+            item.paste.reply_count = item.replycount
+            replies.append(item.paste)
     context = {
         'paste': pasteobj,
         'replies': replies,
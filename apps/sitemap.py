@@ -0,0 +1,24 @@
+""" Welborn Productions - Apps - Sitemap
+    Provides sitemap urls for the sitemaps module.
+"""
+from apps.models import wp_app
+from wp_main.sitemaps.sitemaps import SitemapUrl
+
+# Saving/deleting these invalidates the cached sitemap for this app.
+models = (wp_app, )
+
+
+def build_urls(protocol, domain):
+    """ Yields SitemapUrl()s for all web apps. """
+    apps = wp_app.objects.filter(
+        disabled=False,
+        admin_only=False)
+    for app in apps.order_by('name'):
+        yield SitemapUrl(
+            rel_location='/apps/{}'.format(app.alias),
+            protocol=protocol,
+            domain=domain,
+            changefreq='monthly',
+            lastmod=str(app.publish_date),
+            priority='0.9'
+        )
@@ -12,10 +12,45 @@ from apps.timekeeper.models import (
     TKZipCode,
 )
 
-from django.contrib import admin
+from apps.timekeeper import tools
+
+from django.contrib import admin, messages
 from solo.admin import SingletonModelAdmin
 
 
+def mark_jobs_paid(modeladmin, request, queryset):
+    """ Mark selected jobs, and all of their sessions, as paid. """
+    jobcnt = queryset.mark_paid()
+    tools.invalidate_reports()
+    modeladmin.message_user(
+        request,
+        'Marked {} {} as paid.'.format(jobcnt, plural(jobcnt, 'job')),
+        level=messages.SUCCESS
+    )
+
+
+mark_jobs_paid.short_description = 'Mark selected jobs as paid'
+
+
+def plural(cnt, word):
+    """ Pluralize a word based on a count. """
+    return word if cnt == 1 else '{}s'.format(word)
+
+
+def update_jobs_paid(modeladmin, request, queryset):
+    """ Set the paid status of selected jobs from their sessions. """
+    jobcnt = queryset.update_paid()
+    tools.invalidate_reports()
+    modeladmin.message_user(
+        request,
+        'Updated paid status for {} {}.'.format(jobcnt, plural(jobcnt, 'job')),
+        level=messages.SUCCESS
+    )
+
+
+update_jobs_paid.short_description = 'Update paid status from sessions'
+
+
 class TKAddressAdmin(admin.ModelAdmin):
     pass
 
@@ -25,7 +60,10 @@ class TKEmployeeAdmin(admin.ModelAdmin):
 
 
 class TKJobAdmin(admin.ModelAdmin):
-    pass
+    actions = [
+        mark_jobs_paid,
+        update_jobs_paid,
+    ]
 
 
 class TKSessionAdmin(admin.ModelAdmin):
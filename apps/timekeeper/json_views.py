@@ -1,5 +1,6 @@
 # disable cache for ip/useragent pages.
 from django.views.decorators.cache import never_cache
+from django.utils.dateparse import parse_date
 from django.db.models import Q
 # various welbornprod tools
 from wp_main.utilities import (
@@ -20,9 +21,57 @@ def view_index(request):
     return responses.json_response_err(NotImplementedError('Still working..'))
 
 
+def get_session_args(args):
+    """ Get the date range and paging args for a session listing.
+        Dates are YYYY-MM-DD.
+        Returns a dict of get_sessions() and iter_sessions() kwargs.
+        Raises ValueError for invalid dates or numbers.
+    """
+    kwargs = {}
+    for argname, kwargname in (('start', 'date_min'), ('end', 'date_max')):
+        datestr = args.get(argname, None)
+        if not datestr:
+            continue
+        date = parse_date(str(datestr))
+        if date is None:
+            raise ValueError('Invalid {} date: {}'.format(argname, datestr))
+        kwargs[kwargname] = date
+    for argname in ('offset', 'limit'):
+        numstr = args.get(argname, None) or 0
+        try:
+            kwargs[argname] = max(0, int(numstr))
+        except (TypeError, ValueError):
+            raise ValueError('Invalid {}: {}'.format(argname, numstr))
+    # A limit of 0 means no limit.
+    kwargs['limit'] = kwargs['limit'] or None
+    return kwargs
+
+
+def session_stream(args, job=None):
+    """ Return an iterable of session dicts for a session listing,
+        using the date range and paging args.
+    """
+    kwargs = get_session_args(args)
+    sessions = tools.get_sessions(
+        job=job,
+        date_min=kwargs.get('date_min', None),
+        date_max=kwargs.get('date_max', None)
+    )
+    return (
+        ses.to_dict(include_job=job is None)
+        for ses in tools.iter_sessions(
+            sessions,
+            offset=kwargs['offset'],
+            limit=kwargs['limit']
+        )
+    )
+
+
 @never_cache
 def view_job(request):
-    """ View JSON for a specific job. """
+    """ View JSON for a specific job, with its sessions streamed.
+        Accepts the same date range and paging args as view_sessions.
+    """
     if not request.user.is_authenticated():
         return responses.json_response_err(Exception('You must login first.'))
 
@@ -35,7 +84,9 @@ def view_job(request):
     if not jobid:
         return responses.json_response_err(ValueError('No job id given.'))
 
-    jobs = TKJob.objects.filter(disabled=False)
+    jobs = TKJob.objects.filter(disabled=False).select_related(
+        'address__zipcode'
+    )
     try:
         jobintid = int(jobid)
         job = jobs.get(id=jobintid)
@@ -47,8 +98,48 @@ def view_job(request):
                 ValueError('No job with that id: {}'.format(jobid)),
                 logit=True)
 
-    return responses.json_response({
-        'job': job.to_json(include_sessions=True),
-        'status': 'ok',
-        'message': 'Successfully retrieved job #{}.'.format(job.id)
-    })
+    try:
+        sessions = session_stream(args, job=job)
+    except ValueError as ex:
+        return responses.json_response_err(ex)
+
+    return responses.json_stream_response(
+        {
+            'job': job.to_dict(include_sessions=False),
+            'status': 'ok',
+            'message': 'Successfully retrieved job #{}.'.format(job.id)
+        },
+        'sessions',
+        sessions
+    )
+
+
+@never_cache
+def view_sessions(request):
+    """ View JSON for all sessions, streamed.
+        Arguments:
+            start   : First date for the sessions (YYYY-MM-DD).
+            end     : Last date for the sessions (YYYY-MM-DD).
+            offset  : Number of sessions to skip.
+            limit   : Max number of sessions to send.
+    """
+    if not request.user.is_authenticated():
+        return responses.json_response_err(Exception('You must login first.'))
+
+    args = (
+        responses.json_get_request(request) or
+        responses.get_request_args(request)
+    )
+    try:
+        sessions = session_stream(args)
+    except ValueError as ex:
+        return responses.json_response_err(ex)
+
+    return responses.json_stream_response(
+        {
+            'status': 'ok',
+            'message': 'Streaming sessions.',
+        },
+        'sessions',
+        sessions
+    )
@@ -10,6 +10,8 @@ from decimal import Decimal
 from moneyed import USD
 
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch.dispatcher import receiver
 from django.conf import settings
 from djmoney.models.fields import MoneyField, MoneyPatched
 from solo.models import SingletonModel
@@ -40,6 +42,13 @@ def now_plus():
 
 def hours_from_secs(seconds):
     """ Return hours from seconds in a float. """
+    return minutes_from_secs(seconds) / 60
+
+
+def minutes_from_secs(seconds):
+    """ Return the rounded number of minutes from seconds, in an int.
+        This is the rounding that hours_from_secs() uses.
+    """
     minutes, seconds = divmod(seconds, 60)
     hours, minutes = divmod(minutes, 60)
     # Do some rounding.
@@ -49,7 +58,7 @@ def hours_from_secs(seconds):
     if minutes > 50:
         hours += 1
         minutes = 0
-    return hours + (minutes / 60)
+    return int((hours * 60) + minutes)
 
 
 class TKConfig(SingletonModel):
@@ -244,6 +253,31 @@ class TKEmployee(models.Model):
         db_table = 'timekeeper_employee'
 
 
+class TKJobQuerySet(models.QuerySet):
+    """ Set-based paid status for many jobs at once. """
+
+    def mark_paid(self):
+        """ Mark these jobs, and all of their sessions, as paid.
+            Returns the number of jobs updated.
+        """
+        TKSession.objects.filter(job__in=self, paid=False).update(paid=True)
+        return self.update(paid=True)
+
+    def update_paid(self):
+        """ Set the paid status for these jobs from their sessions.
+            A job is paid when it has sessions, and none of them are unpaid.
+            Returns the number of jobs that changed.
+        """
+        unpaid = self.filter(paid=True, session__paid=False).update(
+            paid=False
+        )
+        paid = self.filter(
+            paid=False,
+            session__paid=True
+        ).exclude(session__paid=False).update(paid=True)
+        return unpaid + paid
+
+
 class TKJob(models.Model):
     """ A single job id/name/address. """
     disabled = models.BooleanField(
@@ -281,6 +315,8 @@ class TKJob(models.Model):
         help_text='Notes pertaining to this job (html is okay).'
     )
 
+    objects = TKJobQuerySet.as_manager()
+
     def __repr__(self):
         return 'TKJob({})'.format(
             ', '.join((
@@ -295,17 +331,16 @@ class TKJob(models.Model):
 
     def save(self, *args, **kwargs):
         """ Handle any payment processing automatically when saving. """
-        if self.paid:
-            # Job is paid, set all sessions as paid.
-            self.sessions.update(paid=True)
-        else:
-            # All sessions are paid, set self as paid.
-            for ses in self.sessions.all():
-                if not ses.paid:
-                    break
+        if self.pk is not None:
+            if self.paid:
+                # Job is paid, set all sessions as paid.
+                self.sessions.filter(paid=False).update(paid=True)
             else:
-                # All sessions are paid.
-                self.paid = True
+                # All sessions are paid, set self as paid.
+                self.paid = (
+                    self.sessions.exists() and
+                    not self.sessions.filter(paid=False).exists()
+                )
 
         return super().save(*args, **kwargs)
 
@@ -430,6 +465,10 @@ class TKSession(models.Model):
         """ Return the number of hours in a float for this session. """
         return hours_from_secs(self.duration().seconds)
 
+    def minutes(self):
+        """ Return the rounded number of minutes for this session. """
+        return minutes_from_secs(self.duration().seconds)
+
     def in_range(self, date_min, date_max):
         """ Returns True if this session fell between `date_min` and
             `date_max`.
@@ -468,6 +507,8 @@ class TKSession(models.Model):
     def to_dict(self, include_job=True):
         emp_pay = self.employee_pay()
         data = {
+            'id': self.id,
+            'job_id': self.job_id,
             'disabled': self.disabled,
             'employees': [emp.to_dict() for emp in self.employees.all()],
             'start_time': self.start_time.strftime(self.datetime_format),
@@ -498,6 +539,13 @@ class TKSession(models.Model):
         db_table = 'timekeeper_session'
 
 
+@receiver(post_delete, sender=TKSession)
+@receiver(post_save, sender=TKSession)
+def tksession_paid_changed(sender, instance, **kwargs):
+    """ Update the job's paid status when one of its sessions changes. """
+    TKJob.objects.filter(id=instance.job_id).update_paid()
+
+
 class TKZipCode(models.Model):
     """ A single zip-code. Many Addresses may have the same ZipCode. """
     disabled = models.BooleanField(
@@ -1,3 +1,24 @@
 from django.test import TestCase
 
-# Create your tests here.
+from apps.timekeeper.models import hours_from_secs, minutes_from_secs
+
+
+class TimeKeeperTest(TestCase):
+
+    def test_minutes_from_secs(self):
+        """ minutes_from_secs() rounds seconds and minutes up. """
+        self.assertEqual(minutes_from_secs(0), 0)
+        self.assertEqual(minutes_from_secs(90), 1)
+        self.assertEqual(minutes_from_secs(91), 2)
+        self.assertEqual(
+            minutes_from_secs(3600 + (51 * 60)),
+            120,
+            msg='Minutes over 50 should round up to the next hour.'
+        )
+        for secs, minutes in ((0, 0), (1799, 30), (5400, 90), (29000, 483)):
+            self.assertEqual(minutes_from_secs(secs), minutes)
+
+    def test_hours_from_secs(self):
+        """ hours_from_secs() returns rounded hours in a float. """
+        for secs, hours in ((0, 0), (1799, 0.5), (5400, 1.5), (29000, 8.05)):
+            self.assertEqual(hours_from_secs(secs), hours)
@@ -3,15 +3,30 @@
     -Christopher Welborn 1-12-16
 """
 
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.core.cache import cache
+from django.db.models import Prefetch, Q
+from django.db.models.signals import m2m_changed, post_delete, post_save
 
 from apps.timekeeper.models import (
     WEEKDAYS,
     TKConfig,
+    TKEmployee,
     TKJob,
     TKSession
 )
 
+# Cache key for the report generation, which changes whenever a model that
+# the reports depend on is changed.
+REPORT_GENERATION_KEY = 'timekeeper.report.generation'
+# How long to keep finished week reports.
+REPORT_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+CENTS = Decimal('0.01')
+
 # TKConfig is a SingletonModel. This will only be created once, when
 # migrating for the first time, or when the db has been wiped during testing.
 config = TKConfig.objects.get_or_create()[0]
@@ -40,6 +55,38 @@ def get_week_indexes():
     return weekindexes
 
 
+def get_report_generation():
+    """ Return the current report generation, for cache keys. """
+    generation = cache.get(REPORT_GENERATION_KEY)
+    if generation is None:
+        generation = invalidate_reports()
+    return generation
+
+
+def get_sessions(job=None, date_min=None, date_max=None):
+    """ Return a QuerySet of enabled sessions, optionally for a single job
+        and date range, with everything TKSession.to_dict() needs loaded
+        in the same 2 queries.
+        Arguments:
+            job       : A TKJob to get sessions for, or None for all jobs.
+            date_min  : Minimum start date for the sessions, or None.
+            date_max  : Maximum start date for the sessions, or None.
+                        This date is included.
+    """
+    sessions = TKSession.objects.filter(disabled=False, job__disabled=False)
+    if job is not None:
+        sessions = sessions.filter(job=job)
+    if date_min is not None:
+        sessions = sessions.filter(start_time__gte=date_min)
+    if date_max is not None:
+        sessions = sessions.filter(
+            start_time__lt=date_max + timedelta(days=1)
+        )
+    return sessions.select_related(
+        'job__address__zipcode'
+    ).prefetch_related(prefetch_employees())
+
+
 def get_week_jobs(date=None):
     """ Return a dict of {TKJob: [TKSessions]} for all
         jobs with sessions in the given work week (determined from `date`).
@@ -49,6 +96,16 @@ def get_week_jobs(date=None):
                     of the sessions, and whether the job/session falls into
                     the week.
     """
+    jobsessions = OrderedDict()
+    for session in get_week_sessions(date):
+        jobsessions.setdefault(session.job, []).append(session)
+    return jobsessions
+
+
+def get_week_range(date=None):
+    """ Return the (date_min, date_max) dates for the work week, for use
+        with __range lookups.
+    """
     # The starting work week day, based on the `date` given.
     date_min = get_week_start(date).date()
     # The maximum date for this week. It's possible that there are no sessions
@@ -56,13 +113,199 @@ def get_week_jobs(date=None):
     # date_max is date_min + 7 days, plus 1 more because __range uses 00:00:00
     # and the end date wouldn't be included.
     date_max = date_min + timedelta(days=8)
-    jobsessions = {}
-    for job in TKJob.objects.filter(disabled=False):
-        sessions = job.sessions.filter(
-            disabled=False,
-            start_time__range=(date_min, date_max)
+    return date_min, date_max
+
+
+def get_week_report(date=None):
+    """ Return a WeekReport's data (WeekReport.to_dict()) for the work week
+        that `date` falls in. Finished weeks are cached, and their sessions
+        are only queried on a cache miss.
+    """
+    report = WeekReport(date)
+    if not report.finished():
+        return report.to_dict()
+    key = 'timekeeper.report.{}.{}'.format(
+        get_report_generation(),
+        report.date_min.isoformat()
+    )
+    reportdata = cache.get(key)
+    if reportdata is None:
+        reportdata = report.to_dict()
+        cache.set(key, reportdata, REPORT_CACHE_TIMEOUT)
+    return reportdata
+
+
+def get_week_sessions(date=None):
+    """ Return a QuerySet of enabled sessions for enabled jobs in the given
+        work week, ordered by job. The jobs, addresses, and employees are
+        loaded in the same 2 queries.
+    """
+    return TKSession.objects.filter(
+        disabled=False,
+        job__disabled=False,
+        start_time__range=get_week_range(date)
+    ).select_related(
+        'job__address__zipcode'
+    ).prefetch_related(
+        prefetch_employees()
+    ).order_by('job_id', 'start_time')
+
+
+def invalidate_reports(**kwargs):
+    """ Start a new report generation, so cached reports are rebuilt.
+        This is a signal receiver.
+    """
+    generation = '{}'.format(time.time())
+    cache.set(REPORT_GENERATION_KEY, generation, None)
+    return generation
+
+
+def iter_sessions(sessions, offset=0, limit=None, chunk_size=500):
+    """ Iterate over sessions in (start_time, id) order, loading them in
+        chunks so that select_related()/prefetch_related() still apply
+        (QuerySet.iterator() would skip the prefetch).
+        Each chunk after the first uses the last session as a cursor,
+        instead of an OFFSET.
+        Arguments:
+            sessions    : A TKSession QuerySet.
+            offset      : Number of sessions to skip.
+            limit       : Max number of sessions, or None for all of them.
+            chunk_size  : Number of sessions to load with each query.
+    """
+    sessions = sessions.order_by('start_time', 'id')
+    remaining = limit
+    last = None
+    while (remaining is None) or (remaining > 0):
+        size = chunk_size if remaining is None else min(chunk_size, remaining)
+        if last is None:
+            chunk = list(sessions[offset:offset + size])
+        else:
+            chunk = list(sessions.filter(
+                Q(start_time__gt=last.start_time) |
+                Q(start_time=last.start_time, id__gt=last.id)
+            )[:size])
+        yield from chunk
+        if len(chunk) < size:
+            return
+        if remaining is not None:
+            remaining -= len(chunk)
+        last = chunk[-1]
+
+
+def money(amount):
+    """ Round a Decimal amount to cents. """
+    return amount.quantize(CENTS, rounding=ROUND_HALF_UP)
+
+
+def prefetch_employees():
+    """ Return a Prefetch for session employees, with their users loaded
+        in the same query (TKEmployee.to_dict() uses the user).
+    """
+    return Prefetch(
+        'employees',
+        queryset=TKEmployee.objects.select_related('user')
+    )
+
+
+class WeekReport(object):
+    """ Hours and pay for a work week, computed with Decimals from a fixed
+        number of queries (see get_week_sessions()).
+    """
+
+    def __init__(self, date=None):
+        self.date = date
+        self.date_min, self.date_max = get_week_range(date)
+        self._jobs = None
+
+    @property
+    def jobs(self):
+        """ The {TKJob: [TKSessions]} for this week, loaded on first use
+            so cached reports don't query for them.
+        """
+        if self._jobs is None:
+            self._jobs = get_week_jobs(self.date)
+        return self._jobs
+
+    def finished(self):
+        """ Returns True if this week is over, and can't change. """
+        return self.date_max <= datetime.now().date()
+
+    def session_dict(self, session):
+        """ Build report data for a single session. """
+        minutes = Decimal(session.minutes())
+        emp_pay = OrderedDict(
+            (emp.name(), money(emp.wage.amount * minutes / 60))
+            for emp in session.employees.all()
         )
-        if sessions:
-            jobsessions[job] = sessions
+        return {
+            'id': session.id,
+            'day': session.day(),
+            'description': str(session),
+            'start_time': session.start_time.strftime(
+                session.datetime_format
+            ),
+            'stop_time': session.stop_time.strftime(
+                session.datetime_format
+            ),
+            'paid': session.paid,
+            'hours': money(minutes / 60),
+            'employee_pay': emp_pay,
+            'pay': sum(emp_pay.values(), Decimal(0)),
+        }
 
-    return jobsessions
+    def to_dict(self):
+        """ Build the report data. Amounts and hours are Decimals. """
+        jobs = []
+        employee_pay = OrderedDict()
+        for job, sessions in self.jobs.items():
+            sessiondata = [self.session_dict(ses) for ses in sessions]
+            for ses in sessiondata:
+                for name, amount in ses['employee_pay'].items():
+                    employee_pay[name] = (
+                        employee_pay.get(name, Decimal(0)) + amount
+                    )
+            jobs.append({
+                'id': job.id,
+                'name': job.name,
+                'address': str(job.address),
+                'paid': job.paid,
+                'sessions': sessiondata,
+                'hours': sum((s['hours'] for s in sessiondata), Decimal(0)),
+                'pay': sum((s['pay'] for s in sessiondata), Decimal(0)),
+            })
+        return {
+            'date_min': self.date_min,
+            'date_max': self.date_max,
+            'jobs': jobs,
+            'employee_pay': employee_pay,
+            'hours': sum((j['hours'] for j in jobs), Decimal(0)),
+            'pay': sum((j['pay'] for j in jobs), Decimal(0)),
+        }
+
+
+def connect_signals():
+    """ Invalidate cached reports when any of their models change. """
+    for model in (TKEmployee, TKJob, TKSession):
+        post_save.connect(
+            invalidate_reports,
+            sender=model,
+            weak=False,
+            dispatch_uid='timekeeper.reports.save.{}'.format(model.__name__)
+        )
+        post_delete.connect(
+            invalidate_reports,
+            sender=model,
+            weak=False,
+            dispatch_uid='timekeeper.reports.delete.{}'.format(
+                model.__name__
+            )
+        )
+    m2m_changed.connect(
+        invalidate_reports,
+        sender=TKSession.employees.through,
+        weak=False,
+        dispatch_uid='timekeeper.reports.employees'
+    )
+
+
+connect_signals()
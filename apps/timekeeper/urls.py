@@ -1,8 +1,11 @@
 from django.conf.urls import url
 
-from apps.timekeeper import views
+from apps.timekeeper import json_views, views
 # Patterns for pastebin app.
 urlpatterns = [
     # timekeeper main
     url(r'^$', views.view_index),
+    # timekeeper json api
+    url(r'^json/job/?$', json_views.view_job),
+    url(r'^json/sessions/?$', json_views.view_sessions),
 ]
@@ -21,6 +21,6 @@ def view_index(request):
     """ Landing page for the timekeeper app. """
     return responses.clean_response(
         template_name='timekeeper/index.html',
-        context={'jobsessions': tools.get_week_jobs()},
+        context={'report': tools.get_week_report()},
         request=request
     )
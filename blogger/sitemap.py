@@ -0,0 +1,21 @@
+""" Welborn Productions - Blogger - Sitemap
+    Provides sitemap urls for the sitemaps module.
+"""
+from blogger.models import wp_blog
+from wp_main.sitemaps.sitemaps import SitemapUrl
+
+# Saving/deleting these invalidates the cached sitemap for this app.
+models = (wp_blog, )
+
+
+def build_urls(protocol, domain):
+    """ Yields SitemapUrl()s for all blog posts. """
+    for post in wp_blog.objects.filter(disabled=False).order_by('-posted'):
+        yield SitemapUrl(
+            rel_location='/blog/view/{}'.format(post.slug),
+            protocol=protocol,
+            domain=domain,
+            changefreq='never',
+            lastmod=str(post.posted),
+            priority='0.5'
+        )
@@ -128,7 +128,7 @@ def view_post(request, identifier):
     # increment view count
     try:
         post.view_count += 1
-        post.save()
+        post.save(update_fields=['view_count'])
     except Exception as exsave:
         log.error('Unable to increment view_count for: '
                   '{}\n{}'.format(post, exsave))
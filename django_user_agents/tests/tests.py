@@ -29,6 +29,7 @@ class MiddlewareTest(SimpleTestCase):
     def tearDown(self):
         for ua in [iphone_ua_string, ipad_ua_string, long_ua_string]:
             cache.delete(get_cache_key(ua))
+        utils.local_cache.clear()
 
     def test_middleware_assigns_user_agent(self):
         client = Client(HTTP_USER_AGENT=ipad_ua_string)
@@ -75,6 +76,27 @@ class MiddlewareTest(SimpleTestCase):
             'django_user_agents.00705b9375a0e46e966515fe90f111da',
         )
 
+    def test_local_cache(self):
+        utils.local_cache.clear()
+        request = RequestFactory(HTTP_USER_AGENT=iphone_ua_string).get('')
+        user_agent = get_user_agent(request)
+        self.assertIs(utils.local_cache.get(iphone_ua_string), user_agent)
+        # Second lookup is served from the local cache.
+        cache.delete(get_cache_key(iphone_ua_string))
+        self.assertIs(get_user_agent(request), user_agent)
+        self.assertIsNone(cache.get(get_cache_key(iphone_ua_string)))
+        self.assertEqual(utils.get_cache_info()['parses'], 1)
+
+    def test_local_cache_eviction(self):
+        lru = utils.LRUCache(maxsize=2)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+        self.assertIsNone(lru.get('b'))
+        self.assertEqual(lru.get('a'), 1)
+        self.assertEqual(lru.get('c'), 3)
+
     @override_settings(USER_AGENTS_CACHE=None)
     def test_disabled_cache(self):
         reload_module(utils)  # re-import with patched settings
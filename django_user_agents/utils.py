@@ -1,4 +1,6 @@
 import sys
+import threading
+from collections import OrderedDict
 from hashlib import md5
 
 from django.conf import settings
@@ -31,6 +33,72 @@ else:
     cache = None
 
 
+# Number of parsed UserAgents to keep in this process (0 disables it).
+USER_AGENTS_LOCAL_CACHE_SIZE = getattr(
+    settings,
+    'USER_AGENTS_LOCAL_CACHE_SIZE',
+    256
+)
+
+
+class LRUCache(object):
+    # A small, thread-safe LRU cache for parsed UserAgents, keyed by the
+    # raw user agent string. It sits in front of the shared cache, so
+    # most requests never hash the string or hit the shared cache.
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.shared_hits = 0
+        self.parses = 0
+
+    def __len__(self):
+        return len(self.data)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+            self.hits = self.misses = self.shared_hits = self.parses = 0
+
+    def get(self, key, default=None):
+        with self.lock:
+            try:
+                value = self.data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self.data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def info(self):
+        # Hit/miss metrics, for debugging/stats pages.
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self.data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'shared_hits': self.shared_hits,
+            'parses': self.parses,
+            'hit_ratio': (self.hits / lookups) if lookups else 0.0,
+        }
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+
+local_cache = LRUCache(USER_AGENTS_LOCAL_CACHE_SIZE)
+
+
 def get_cache_key(ua_string):
     # Some user agent strings are longer than 250 characters so we use its MD5
     if isinstance(ua_string, text_type):
@@ -38,24 +106,44 @@ def get_cache_key(ua_string):
     return ''.join(['django_user_agents.', md5(ua_string).hexdigest()])
 
 
-def get_user_agent(request):
-    # Tries to get UserAgent objects from cache before constructing a UserAgent
-    # from scratch because parsing regexes.yaml/json (ua-parser) is slow
-    if not hasattr(request, 'META'):
-        return ''
+def get_cache_info():
+    # Hit/miss metrics for the local (L1) and shared (L2) caches.
+    return local_cache.info()
+
+
+def get_parsed_user_agent(ua_string):
+    # Checks the local LRU first, then the shared cache, and only parses
+    # when both miss. Parsed UserAgents are stored in both caches.
+    user_agent = local_cache.get(ua_string)
+    if user_agent is not None:
+        return user_agent
 
-    ua_string = request.META.get('HTTP_USER_AGENT', '')
     if cache:
         key = get_cache_key(ua_string)
         user_agent = cache.get(key)
         if user_agent is None:
             user_agent = parse(ua_string)
+            local_cache.parses += 1
             cache.set(key, user_agent)
+        else:
+            local_cache.shared_hits += 1
     else:
         user_agent = parse(ua_string)
+        local_cache.parses += 1
+    local_cache.set(ua_string, user_agent)
     return user_agent
 
 
+def get_user_agent(request):
+    # Tries to get UserAgent objects from cache before constructing a UserAgent
+    # from scratch because parsing regexes.yaml/json (ua-parser) is slow
+    if not hasattr(request, 'META'):
+        return ''
+
+    ua_string = request.META.get('HTTP_USER_AGENT', '')
+    return get_parsed_user_agent(ua_string)
+
+
 def get_and_set_user_agent(request):
     # If request already has ``user_agent``, it will return that, otherwise
     # call get_user_agent and attach it to request so it can be reused
@@ -85,7 +85,10 @@ def increment_dl_count(file_path, absolute_path):
     for objtype, obj in trackables.items():
         if hasattr(obj, 'download_count'):
             obj.download_count += 1
-            obj.save()
+            if obj.pk is None:
+                obj.save()
+            else:
+                obj.save(update_fields=['download_count'])
             log.debug('Incremented {} download_count to {}: {}'.format(
                 objtype,
                 obj.download_count,
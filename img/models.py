@@ -133,10 +133,19 @@ class wp_image(models.Model):  # noqa
         return finalstr
 
     def save(self, *args, **kwargs):
-        """ Generate image_id before saving. """
+        """ Generate image_id before saving, so a new image is written with
+            a single INSERT when the id can be reserved.
+        """
         if (not self.filename) and self.image:
             self.filename = self.image.name
             log.debug('Saving with filename: {}'.format(self.filename))
+        if self.id is None:
+            reserved = id_tools.reserve_ids(wp_image)
+            if reserved:
+                self.id = reserved[0]
+                kwargs['force_insert'] = True
+        if (self.id is not None) and (not self.image_id):
+            self.image_id = id_tools.encode_id(self.id)
         try:
             super(wp_image, self).save(*args, **kwargs)
         except Exception as ex:
@@ -153,27 +162,23 @@ class wp_image(models.Model):  # noqa
             ))
             raise
         # Generate a image_id for this image if it doesnt have one already.
+        # This only happens when an id couldn't be reserved.
         if not self.image_id:
-            self.generate_id()
+            self.image_id = id_tools.encode_id(self.id)
+            wp_image.objects.filter(id=self.id).update(
+                image_id=self.image_id
+            )
         # Save the filename for this image.
         if not self.filename:
             self.update_filename()
         # TODO: Generate self.width and self.height.
 
     def generate_id(self):
-        """ Get current image_id, or generate a new one and saves it. """
-        if self.image_id:
-            return self.image_id
-
-        realid = getattr(self, 'id', None)
-        if realid is None:
-            # This will call generate_id() again, but make an id to use.
+        """ Get current image_id, or generate a new one and save it. """
+        if not self.image_id:
+            # The image_id is generated in save().
             self.save()
-
-        newid = id_tools.encode_id(realid)
-        self.image_id = newid
-        # Save the newly generated id.
-        self.save()
+        return self.image_id
 
     def get_url(self):
         """ Return absolute url.
@@ -0,0 +1,22 @@
+""" Welborn Productions - Img - Sitemap
+    Provides sitemap urls for the sitemaps module.
+"""
+from img.models import wp_image
+from wp_main.sitemaps.sitemaps import SitemapUrl
+
+# Saving/deleting these invalidates the cached sitemap for this app.
+models = (wp_image, )
+
+
+def build_urls(protocol, domain):
+    """ Yields SitemapUrl()s for all img posts. """
+    imgs = wp_image.objects.filter(disabled=False, private=False)
+    for img in imgs.order_by('-publish_date'):
+        yield SitemapUrl(
+            rel_location='/img?id={}'.format(img.image_id),
+            protocol=protocol,
+            domain=domain,
+            changefreq='never',
+            lastmod=str(img.publish_date.date()),
+            priority='0.5'
+        )
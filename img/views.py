@@ -129,7 +129,7 @@ def view_image_id(request, imageid):
 
     image = images[0]
     image.view_count += 1
-    image.save()
+    image.save(update_fields=['view_count'])
     log.debug('Image view_count incremented to {}: {}'.format(
         image.view_count,
         image.filename))
@@ -2,12 +2,12 @@
     Handles requests coming in to welbornprod.
 """
 import logging
-import re
-from os.path import isfile
 
 from django.conf import settings
 from django.http import HttpResponse
 
+from wp_main.utilities.banlist import get_banlist
+
 log = logging.getLogger('wp.middleware.requests')
 
 
@@ -44,101 +44,45 @@ def get_remote_ip(request):
 
 
 class WpBanIpMiddleware(object):
+    """ Refuses requests from banned IPs.
+        Bans are read from settings.SECRET_BAN_FILE, and reloaded when the
+        file changes (see wp_main.utilities.banlist).
+    """
 
     def __init__(self):
         self.configfile = settings.SECRET_BAN_FILE
-        # Raw config lines (minus comments/blanks)
-        self.configraw = []
-        # Compiled regex patterns (after successful file load/parse)
-        self.banpatterns = []
         self.log = logging.getLogger('wp.middleware.requests.wpbanip')
-        if isfile(self.configfile):
-            self.parse_config()
-
-    def build_patterns(self):
-        """ Build self.banpatterns (compiled regex) list,
-            if self.configraw is available.
-        """
-        if not self.configraw:
-            return None
-
-        self.banpatterns = [p for p in self.iter_compile() if p is not None]
-        if self.banpatterns:
-            banlen = len(self.banpatterns)
-            ipstr = 'IP is' if banlen == 1 else 'IPs are'
-            self.log.debug(
-                '\n    '.join((
-                    '{} {} in the banned list.'.format(banlen, ipstr),
-                    '\n    '.join(p.pattern for p in self.banpatterns)
-                ))
-            )
+        # Shared with utilities.ban_add(), so new bans apply immediately.
+        self.banlist = get_banlist(
+            self.configfile,
+            check_interval=settings.BAN_RELOAD_INTERVAL
+        )
+        if self.banlist:
+            self.log.debug('{} ban entries in the banned list.'.format(
+                self.banlist.matcher.count
+            ))
         else:
             self.log.debug('No IPs are in the ban list.')
 
-    def iter_compile(self):
-        """ Iterate over self.configraw,
-            yielding a <RegEx Pattern> on successful compile,
-            or None on failure.
-        """
-
-        for configpat in self.configraw:
-            pat = self.try_compile(configpat)
-            yield pat if pat else None
-
-    def parse_config(self):
-        """ Parse the config file contents, if available.
-            Logs errors, sets:
-                self.banpatterns (via self.build_patterns())
-        """
-        self.configraw = []
-        try:
-            with open(self.configfile) as f:
-                for line in f:
-                    linetrim = line.strip()
-                    if linetrim and (not linetrim.startswith('#')):
-                        self.configraw.append(linetrim)
-        except EnvironmentError as exread:
-            self.log.error('Unable to read ban config:'
-                           '{}\n{}'.format(self.configfile, exread))
-        else:
-            # Successful read, build all of the regex patterns.
-            self.build_patterns()
-
     def process_request(self, request):
         """ Process the incoming request,
             returns a 403 (Permission  Denied) if the user's ip is in the
             banned list.
         """
-        # Get remote ip and check for ban patterns.
+        # Get remote ip and check for bans.
         remote_ip = get_remote_ip(request)
-        if not (self.banpatterns and remote_ip):
+        if not remote_ip:
             return None
 
-        # We have ban patterns, and a remote ip. Cross-check them,
-        # and raise a 403 if one matches.
-        for banpat in self.banpatterns:
-            if banpat.match(remote_ip):
-                # Return the most basic 403 possible.
-                # Nothing fancy for people I don't even want on my site.
-                self.log.error('Refused banned ip: {}'.format(remote_ip))
-                return HttpResponse('Forbidden.',
-                                    content_type='text/plain',
-                                    status=403,
-                                    reason='Invalid Permissions')
+        if self.banlist.is_banned(remote_ip):
+            # Return the most basic 403 possible.
+            # Nothing fancy for people I don't even want on my site.
+            self.log.error('Refused banned ip: {}'.format(remote_ip))
+            return HttpResponse('Forbidden.',
+                                content_type='text/plain',
+                                status=403,
+                                reason='Invalid Permissions')
 
         self.log.debug('IP okay: {}'.format(remote_ip))
         # Success.
         return None
-
-    def try_compile(self, repatstr):
-        """ Try compiling a regex pattern string,
-            Errors are logged,
-            Returns a <RegEx Pattern> object on success,
-            Returns None on failure.
-        """
-        try:
-            repat = re.compile(repatstr)
-        except Exception as exre:
-            self.log.error('Bad regex pattern: {}\n{}'.format(repatstr, exre))
-            return None
-        return repat
@@ -0,0 +1,21 @@
+""" Welborn Productions - Misc - Sitemap
+    Provides sitemap urls for the sitemaps module.
+"""
+from misc.models import wp_misc
+from wp_main.sitemaps.sitemaps import SitemapUrl
+
+# Saving/deleting these invalidates the cached sitemap for this app.
+models = (wp_misc, )
+
+
+def build_urls(protocol, domain):
+    """ Yields SitemapUrl()s for all misc objects. """
+    for misc in wp_misc.objects.filter(disabled=False).order_by('name'):
+        yield SitemapUrl(
+            rel_location='/misc/{}'.format(misc.alias),
+            protocol=protocol,
+            domain=domain,
+            changefreq='monthly',
+            lastmod=str(misc.publish_date),
+            priority='0.8'
+        )
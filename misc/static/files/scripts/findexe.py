@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 from datetime import datetime
+import json
 import os
 import re
 import sys
@@ -9,7 +10,7 @@ from docopt import docopt
 
 
 NAME = 'FindExe'
-VERSION = '1.3.0'
+VERSION = '1.4.0'
 VERSIONSTR = '{} v. {}'.format(NAME, VERSION)
 SCRIPT = os.path.split(os.path.abspath(sys.argv[0]))[1]
 SCRIPTDIR = os.path.abspath(sys.path[0])
@@ -17,9 +18,11 @@ SCRIPTDIR = os.path.abspath(sys.path[0])
 USAGESTR = """{ver}
 
     Finds executables by looking in known ../bin directories, and $PATH.
+    File names are kept in a cache file ({cachefile}), and
+    directories are only scanned again when they change.
 
     Usage:
-        {script} PATTERN... ([-a] [-0] [-q]) [-e dirs]  [-s]
+        {script} PATTERN... ([-a] [-0] [-q]) [-e dirs] [-r] [-s]
         {script} -d | -p
 
     Options:
@@ -42,11 +45,18 @@ USAGESTR = """{ver}
         -e <dirs>,--exclude <dirs>  : Directories to exclude,
                                       separated by ',' or ':'.
         -p,--path                   : Print all $PATH directories.
+        -r,--rescan                 : Scan all directories, instead of using
+                                      the cache for unchanged directories.
         -s,--sort                   : Always sort results.
                                       Results aren't shown as they're found.
         -q,--quote                  : Quote paths when argstyle is used.
         -v,--version                : Show {name} version and exit.
-""".format(name=NAME, ver=VERSIONSTR, script=SCRIPT)
+""".format(
+    name=NAME,
+    ver=VERSIONSTR,
+    script=SCRIPT,
+    cachefile='$XDG_CACHE_HOME/findexe.json',
+)
 
 # Usual directories for executables...
 PATH = set(os.environ.get('PATH', '').split(':'))
@@ -71,6 +81,15 @@ DIRS.update(PATH)
 # Set by parse_dirs().
 INVALIDPATHS = set()
 
+# File for the executable index, see ExeIndex().
+CACHEFILE = os.path.join(
+    os.environ.get('XDG_CACHE_HOME', None) or os.path.expanduser('~/.cache'),
+    'findexe.json'
+)
+# Directories modified less than this many seconds before they were scanned
+# are scanned again next time, in case they changed within the same mtime.
+RACYSECS = 2
+
 
 def main(argd):
     """ main entry point, expects arguments from docopt. """
@@ -93,8 +112,12 @@ def main(argd):
 
     # Results are printed as they are found without -a or -s.
     printer = _noop if (argd['--argstyle'] or argd['--sort']) else print
-    # Start searching
-    results = search_dirs(dirs, repat, reporter=printer)
+    # Start searching, using names from the cache for unchanged dirs.
+    index = ExeIndex(CACHEFILE)
+    if not argd['--rescan']:
+        index.load()
+    results = search_dirs(dirs, repat, reporter=printer, index=index)
+    index.save()
     exitcode = 0 if results.get('exes', None) else 1
 
     if argd['--argstyle'] or argd['--sort']:
@@ -136,7 +159,7 @@ def parse_dirs(excludedirs=None):
     global INVALIDPATHS
     excluded = parse_excludes(excludedirs)
     gooddirs = {
-        s for s in PATH
+        s for s in DIRS
         if os.path.isdir(s)
     }
     INVALIDPATHS = PATH.difference(gooddirs)
@@ -265,13 +288,16 @@ def print_results(
     return 0 if exes else 1
 
 
-def search_dirs(dirs, repat, reporter=None):
+def search_dirs(dirs, repat, reporter=None, index=None):
     """ Search a list of directories for executables. Returns a list of exes.
         Arguments:
             dirs      : A list of directories to search in.
             repat     : Compiled regex pattern to search with.
             reporter  : A function to report when an exe is found.
                         It is called with the path to the exe.
+            index     : ExeIndex() to get file names from.
+                        A new (empty) one is used if not given, which scans
+                        every directory.
 
         Returns a dict with search info:
             {
@@ -282,23 +308,23 @@ def search_dirs(dirs, repat, reporter=None):
     """
     if reporter is None:
         reporter = _noop
+    if index is None:
+        index = ExeIndex()
 
     relevantdirs = set()
     starttime = datetime.now()
     # place for --argstyle output (otherwise exes are printed as found)
     exes = set()
     try:
-        for sdir in dirs:
-            # walk this directory.
-            for root, dirs, files in os.walk(sdir):
-                for filename in files:
-                    rematch = repat.search(filename)
-                    if rematch:
-                        # Either print the exe, or add it to argstyle output.
-                        foundexe = os.path.join(root, filename)
-                        exes.add(foundexe)
-                        reporter(foundexe)
-                        relevantdirs.add(root)
+        for root, files in index.iter_dirs(dirs):
+            for filename in files:
+                rematch = repat.search(filename)
+                if rematch:
+                    # Either print the exe, or add it to argstyle output.
+                    foundexe = os.path.join(root, filename)
+                    exes.add(foundexe)
+                    reporter(foundexe)
+                    relevantdirs.add(root)
 
         stoptime = datetime.now()
     except (IOError, OSError) as exio:
@@ -324,6 +350,128 @@ def quote(s):
     return '{c}{p}{c}'.format(c=char, p=s)
 
 
+class ExeIndex(object):
+    """ File names for each executable directory (and its sub-directories),
+        saved to a cache file between runs.
+        A directory's mtime changes when files are added, removed, or
+        renamed in it, so only directories with a new mtime are scanned.
+        Unchanged directories cost one stat() call.
+    """
+    # Cache file format version, older cache files are ignored.
+    version = 1
+
+    def __init__(self, filename=None):
+        self.filename = filename
+        # {dirpath: {'mtime_ns': int, 'files': [...], 'subdirs': [...]}}
+        self.dirs = {}
+        self.changed = False
+
+    def get_dir(self, dirpath):
+        """ Return the index entry for a directory, scanning it if it is not
+            indexed or has changed. Returns None if it can't be read.
+        """
+        try:
+            mtime = os.stat(dirpath).st_mtime_ns
+        except OSError:
+            mtime = None
+        entry = self.dirs.get(dirpath, None)
+        if (mtime is not None) and entry and (entry['mtime_ns'] == mtime):
+            return entry
+
+        entry = self.scan_dir(dirpath, mtime) if mtime is not None else None
+        if entry is None:
+            if self.dirs.pop(dirpath, None) is not None:
+                self.changed = True
+            return None
+        self.dirs[dirpath] = entry
+        self.changed = True
+        return entry
+
+    def iter_dirs(self, dirs):
+        """ Yield (dirpath, files) for each directory, and all of their
+            sub-directories (like os.walk(), symlinked sub-directories are
+            not followed).
+        """
+        pending = list(reversed(dirs))
+        while pending:
+            dirpath = pending.pop()
+            entry = self.get_dir(dirpath)
+            if entry is None:
+                continue
+            yield dirpath, entry['files']
+            pending.extend(
+                os.path.join(dirpath, s)
+                for s in reversed(entry['subdirs'])
+            )
+
+    def load(self):
+        """ Load the index from the cache file. A missing or bad cache file
+            is ignored, and everything will be scanned.
+        """
+        if not self.filename:
+            return self
+        try:
+            with open(self.filename, 'r') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return self
+        if isinstance(cache, dict) and (cache.get('version') == self.version):
+            self.dirs = cache.get('dirs', None) or {}
+        return self
+
+    def save(self):
+        """ Save the index to the cache file, if anything changed.
+            Returns True on success.
+        """
+        if not (self.filename and self.changed):
+            return True
+        tmpfile = '{}.{}.tmp'.format(self.filename, os.getpid())
+        try:
+            os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+            with open(tmpfile, 'w') as f:
+                json.dump(
+                    {'version': self.version, 'dirs': self.dirs},
+                    f,
+                    separators=(',', ':')
+                )
+            os.replace(tmpfile, self.filename)
+        except OSError as ex:
+            print_err('Unable to save cache file: {}\n{}'.format(
+                self.filename,
+                ex
+            ))
+            if os.path.exists(tmpfile):
+                os.remove(tmpfile)
+            return False
+        self.changed = False
+        return True
+
+    @staticmethod
+    def scan_dir(dirpath, mtime):
+        """ Scan a single directory, returning an index entry.
+            Returns None if the directory can't be read.
+        """
+        files = []
+        subdirs = []
+        try:
+            with os.scandir(dirpath) as entries:
+                for entry in entries:
+                    try:
+                        isdir = entry.is_dir()
+                    except OSError:
+                        isdir = False
+                    if not isdir:
+                        files.append(entry.name)
+                    elif not entry.is_symlink():
+                        subdirs.append(entry.name)
+        except OSError:
+            return None
+        if (datetime.now().timestamp() - (mtime / 1e9)) < RACYSECS:
+            # Changed too recently to trust the mtime, scan again next time.
+            mtime = None
+        return {'mtime_ns': mtime, 'files': files, 'subdirs': subdirs}
+
+
 class InvalidArg(ValueError):
     """ Raised when the user has used an invalid argument. """
     def __init__(self, msg=None):
@@ -6,6 +6,7 @@
     gets the pid of a known process name,
     or searches all processes for part of name, returns possible pids.
     ..like `pgrep`.
+    Requires procsnap.py, from the same place as this script.
     Christopher Welborn
 """
 from __future__ import print_function
@@ -16,8 +17,10 @@ import sys
 
 from docopt import docopt
 
+import procsnap
+
 NAME = 'PidName'
-__VERSION__ = '1.3.4'
+__VERSION__ = '1.4.0'
 VERSIONSTR = '{} v. {}'.format(NAME, __VERSION__)
 SCRIPT = os.path.split(sys.argv[0])[-1]
 
@@ -26,6 +29,7 @@ usage_str = """{versionstr}
     Usage:
         {script} -h
         {script} -l [-e <excluded>]
+        {script} -w [<name>] [-e <excluded>] [-i secs] [-n]
         {script} (-k | -K) <name> [-e <excluded>] [-f] [-F] [-n] [-q]
         {script} <name> [-a | -A] [-f] [-n | -p] [-s]
         {script} <name> -e <excludename> [-a | -A] [-f] [-n | -p] [-s]
@@ -47,6 +51,8 @@ usage_str = """{versionstr}
         -f,--first                : Use only the first process found.
         -F,--force                : When killing processes, use SIGKILL (-9)
                                     instead of SIGTERM.
+        -i secs,--interval secs   : Seconds between checks for --watch.
+                                    [default: 1]
         -K,--KILL                 : Kill the processes found.
                                     (dangerous, no questions asked.)
         -k,--kill                 : Kill the processes found.
@@ -62,10 +68,17 @@ usage_str = """{versionstr}
                                     with another program. multiple pids are
                                     separated by a comma.
         -v,--version              : Show {script} version.
+        -w,--watch                : Print processes as they start and exit,
+                                    until Ctrl + C is pressed. Only
+                                    processes matching <name> are printed,
+                                    when it is given.
 
 
 """.format(versionstr=VERSIONSTR, script=SCRIPT)
 
+# Number of threads used to read /proc, or None to read in the main thread.
+READ_WORKERS = None
+
 # Python 2/3 compatibily
 if sys.version_info.major < 3:
     # py2
@@ -80,6 +93,18 @@ def main(argd):
         print_allprocs(exclude=argd['--exclude'])
         return 0
 
+    # catch process --watch command.
+    if argd['--watch']:
+        try:
+            interval = float(argd['--interval'])
+        except ValueError:
+            print_fail('Invalid interval: {}'.format(argd['--interval']))
+        return print_watch(
+            pname=argd['<name>'],
+            exclude=argd['--exclude'],
+            interval=interval,
+            noargsearch=argd['--noargsearch'])
+
     # Get name query from docopt args.
     pname = argd['<name>']
 
@@ -145,57 +170,52 @@ def confirm(msg):
 
 def get_processes(skipthisscript=True):
     """ Returns all processes running from /proc,
-        Returns Dict of {"pid": {"name": "blah", "args": "blah -a"}}
+        Returns Dict of {pid: procsnap.ProcInfo()}, with integer pids.
+        Each ProcInfo() has a 'name' and 'args' attribute.
 
         If keyword 'skipthisscript' is True, the python process currently
         running this script is omitted. [Default: True]
     """
+    # Processes that exit while reading are skipped (not printed).
+    snap = procsnap.snapshot(
+        skippids=(os.getpid(), ) if skipthisscript else None,
+        workers=READ_WORKERS)
+    return {
+        proc.pid: proc
+        for proc in snap
+        # Skip this script's parent process (not caught by pid).
+        if not (skipthisscript and (SCRIPT in proc.args))
+    }
+
+
+def match_proc(proc, pnamepat, excludepat=None, noargsearch=False):
+    """ Match a ProcInfo() by name, or by args.
+        Returns (matched, used_args).
 
-    # build list of running process ids using /proc
-    # get pid for this script, in case I want to skip it.
-    thispid = str(os.getpid())
-    if skipthisscript:
-        # don't inlcude this process (the python proc running this script)
-        pids = [pid for pid in os.listdir('/proc')
-                if (pid.isdigit() and pid != thispid)]
-    else:
-        # all proc pids (string), including this one.
-        pids = [pid for pid in os.listdir('/proc') if pid.isdigit()]
-    # Formatted read-error message.
-    fmt_readerror = (
-        'Read error for {path}, pid: {pid} (may have been killed)'.format
-    )
-    # grab info from processes
-    processes = {}
-    for pid in pids:
-        # dict to hold info about this process
-        processinfo = {}
-
-        # Try getting command info from /proc, skip it on failure.
-        # Name
-        cmdnamepath = os.path.join('/proc', pid, 'comm')
-        processinfo['name'] = try_fileread(cmdnamepath)
-        if processinfo['name'] is None:
-            print(fmt_readerror(path='/proc/comm', pid=pid))
-
-        # Args
-        cmdargspath = os.path.join('/proc', pid, 'cmdline')
-        processinfo['args'] = try_fileread(cmdargspath)
-        if processinfo['args'] is None:
-            print(fmt_readerror(path='/proc/cmdline', pid=pid))
-        elif skipthisscript and (SCRIPT in processinfo['args']):
-            # Skip this script's parent process (not caught by pid earlier).
-            continue
-        else:
-            # Separate the null-delimited args.
-            processinfo['args'] = ' '.join(
-                processinfo['args'].split('\x00')).strip()
+        Arguments:
+            proc        : ProcInfo() from get_processes().
+            pnamepat    : Pre-compiled regex pattern for the name.
+            excludepat  : Pre-compiled regex pattern to exclude names.
+            noargsearch : don't search args at all if True.
+    """
+    pname = proc.name or ''
+    pargs = proc.args or ''
+    if not (pname or pargs):
+        return False, False
 
-        # Save info for this pid, if it didn't fail completely.
-        if processinfo['name'] or processinfo['args']:
-            processes[pid] = processinfo
+    # exclude process if name matches excluded (when excluded is used)
+    if excludepat and excludepat.search(pname):
+        return False, False
 
-    return processes
+    # try matching command name first.
+    if pnamepat.search(pname) is not None:
+        return True, False
+
+    if noargsearch:
+        return False, False
+    # try matching args (unless --noargsearch is enabled)
+    usedargs = pnamepat.search(pargs) is not None
+    return usedargs, usedargs
 
 
 def get_searchpid(pnamepat, exclude=None, firstonly=False, noargsearch=False):
@@ -219,9 +239,9 @@ def get_searchpid(pnamepat, exclude=None, firstonly=False, noargsearch=False):
     # Function to make a Result using only a pid and used_args.
     make_result = (
         lambda pid, used_args: Result(
-            pid=int(pid),
-            name=procs[pid]['name'],
-            args=procs[pid]['args'],
+            pid=pid,
+            name=procs[pid].name,
+            args=procs[pid].args,
             used_args=used_args)
     )
 
@@ -230,39 +250,24 @@ def get_searchpid(pnamepat, exclude=None, firstonly=False, noargsearch=False):
     # If the user passed an integer (possibly pid), check to see if the
     # pid exists, and use it's info if available.
     try:
-        int(pnamepat.pattern)
         # was an integer, save the pattern for procs key use.
-        pidnum = pnamepat.pattern
+        pidnum = int(pnamepat.pattern)
     except (ValueError, TypeError):
         pidnum = None
     else:
-        if pidnum in procs.keys():
+        if pidnum in procs:
             # User passed a valid pid number.
             results.append(make_result(pidnum, False))
             if firstonly:
                 return tuple(results)
 
-    for pid in sorted(procs, key=lambda k: int(k)):
-        # grab info from this pid. (defaults to empty string if read failed.)
-        pname = procs[pid]['name'] or ''
-        pargs = procs[pid]['args'] or ''
-        if not (pname or pargs):
-            continue
-
-        # exclude process if name matches excluded (when excluded is used)
-        if excludepat and excludepat.search(pname):
-            continue
-
-        # try matching command name first.
-        namematch = pnamepat.search(pname)
-        usedargs = False
-
-        if (namematch is None) and (not noargsearch):
-            # try matching args (unless --noargsearch is enabled)
-            namematch = pnamepat.search(pargs)
-            usedargs = namematch is not None
-
-        if namematch is not None:
+    for pid in sorted(procs):
+        namematch, usedargs = match_proc(
+            procs[pid],
+            pnamepat,
+            excludepat=excludepat,
+            noargsearch=noargsearch)
+        if namematch:
             results.append(make_result(pid, usedargs))
             if firstonly:
                 break
@@ -329,18 +334,16 @@ def print_allprocs(exclude=None):
 
     procs = get_processes()
     # sort pids by integer value
-    procids = sorted([int(p) for p in procs.keys()])
+    procids = sorted(procs)
     proclen = len(procids)
     listed = 0
     runningmsg = 'Running processes: ({})'.format(proclen)
     print(runningmsg)
     argpad = ' ' * 10
     # cycle thru integer pids (a list comp would've added another loop)
-    for pidint in procids:
-        pid = str(pidint)
-        # defaults to empty string if read failed during get_processes()
-        pidname = procs[pid]['name'] or ''
-        pidargs = procs[pid]['args'] or ''
+    for pid in procids:
+        pidname = procs[pid].name or ''
+        pidargs = procs[pid].args or ''
         if excludepat and excludepat.search(pidname):
             continue
         listed += 1
@@ -424,6 +427,51 @@ def print_notfound(query=None, exclude=None):
             print('Excluding: {}'.format(exclude))
 
 
+def print_watch(
+        pname=None, exclude=None, interval=1, noargsearch=False):
+    """ Print processes as they start (+) and exit (-), until the user
+        presses Ctrl + C. Only new processes are read from /proc on each
+        check.
+        Arguments:
+            pname       : Name/pattern to filter processes, or None for
+                          all processes.
+            exclude     : Pattern to exclude names.
+            interval    : Seconds between checks.
+            noargsearch : Don't search args at all if True.
+    """
+    try:
+        pnamepat = re.compile(pname or '')
+        excludepat = re.compile(exclude) if exclude else None
+    except re.error as ex:
+        print_fail('Invalid pattern: {}\n{}'.format(pname, ex))
+
+    argpad = ' ' * 12
+    snaps = procsnap.watch(
+        interval=interval,
+        skippids=(os.getpid(), ),
+        workers=READ_WORKERS)
+    try:
+        snap, _, _ = next(snaps)
+        print('Watching {} processes...'.format(len(snap)))
+        for snap, started, exited in snaps:
+            for sign, procs in (('-', exited), ('+', started)):
+                for proc in procs:
+                    namematch, _ = match_proc(
+                        proc,
+                        pnamepat,
+                        excludepat=excludepat,
+                        noargsearch=noargsearch)
+                    if not namematch:
+                        continue
+                    print('{} {:>7} : {}'.format(sign, proc.pid, proc.name))
+                    if proc.args and (sign == '+'):
+                        print('{}{}'.format(argpad, proc.args))
+            sys.stdout.flush()
+    except KeyboardInterrupt:
+        print('')
+    return 0
+
+
 def print_pids(results, pidonly=False, used_args=False, forceargs=False):
     """ prints results from pid getters. """
 
@@ -451,19 +499,6 @@ def print_pids(results, pidonly=False, used_args=False, forceargs=False):
     return 0
 
 
-def try_fileread(filename):
-    """ Returns data from a file, returns None on failure """
-
-    try:
-        with open(filename, 'r') as fread:
-            return fread.read().replace('\n', '')
-    except EnvironmentError:
-        return None
-    except Exception as ex:
-        # General programming error.
-        print_fail('Error in try_readfile(): {}'.format(ex))
-
-
 class Result(object):
 
     """ A single search result with a pid, name, args (if any), and
@@ -3,6 +3,7 @@
 
 """ pidnet.py
     Shows network/open-file info for a pid.
+    Requires procsnap.py, from the same place as this script.
     -Christopher Welborn 04-04-2016
 """
 
@@ -20,10 +21,12 @@ from colr import (
 )
 from docopt import docopt
 
+import procsnap
+
 colr_auto_disable()
 
 NAME = 'pidnet.py'
-VERSION = '0.2.1'
+VERSION = '0.3.0'
 VERSIONSTR = '{} v. {}'.format(NAME, VERSION)
 SCRIPT = os.path.split(os.path.abspath(sys.argv[0]))[1]
 SCRIPTDIR = os.path.abspath(sys.path[0])
@@ -158,53 +161,25 @@ def debug(*args, **kwargs):
 
 def get_processes(skipthisscript=True):
     """ Returns all processes running from /proc,
-        Returns Dict of {"pid": {"name": "blah", "args": "blah -a"}}
+        Returns Dict of {pid: procsnap.ProcInfo()}, with integer pids.
+        Each ProcInfo() has a 'name' and 'args' attribute.
 
         If keyword 'skipthisscript' is True, the python process currently
         running this script is omitted. [Default: True]
     """
-
-    # build list of running process ids using /proc
-    thispid = str(os.getpid())
-    if skipthisscript:
-        # don't inlcude this process (the python proc running this script)
-        pids = [pid for pid in os.listdir('/proc')
-                if (pid.isdigit() and pid != thispid)]
-    else:
-        # all proc pids (string), including this one.
-        pids = [pid for pid in os.listdir('/proc') if pid.isdigit()]
-
-    # grab info from processes
-    processes = {}
-    for pid in pids:
-        # dict to hold info about this process
-        processinfo = {}
-
-        # Try getting command info from /proc, skip it on failure.
-        # Name
-        cmdnamepath = os.path.join('/proc', pid, 'comm')
-        processinfo['name'] = try_fileread(cmdnamepath)
-        if processinfo['name'] is None:
-            print_err('Read error for /proc/comm, pid: {}'.format(pid))
-
-        # Args
-        cmdargspath = os.path.join('/proc', pid, 'cmdline')
-        processinfo['args'] = try_fileread(cmdargspath)
-        if processinfo['args'] is None:
-            print_err('Read error for /proc/cmdline: pid: {}'.format(pid))
-        elif skipthisscript and (SCRIPT in processinfo['args']):
-            # Skip this script's parent process (not caught by pid earlier).
-            continue
-        else:
-            # Separate the null-delimited args.
-            processinfo['args'] = ' '.join(
-                processinfo['args'].split('\x00')).strip()
-
-        # Save info for this pid, if it didn't fail completely.
-        if processinfo['name'] or processinfo['args']:
-            processes[pid] = processinfo
-
-    return processes
+    snap = procsnap.snapshot(
+        skippids=(os.getpid(), ) if skipthisscript else None
+    )
+    if snap.errors:
+        debug('Processes exited while reading /proc: {}'.format(
+            snap.errors
+        ))
+    return {
+        proc.pid: proc
+        for proc in snap
+        # Skip this script's parent process (not caught by pid).
+        if not (skipthisscript and (SCRIPT in proc.args))
+    }
 
 
 def get_procinfo(pid, net_info=True, file_info=False):
@@ -263,9 +238,8 @@ def get_searchpid(
     # If the user passed an integer (possibly pid), check to see if the
     # pid exists, and use it's info if available.
     try:
-        int(pnamepat.pattern)
         # was an integer, save the pattern for procs key use.
-        pidnum = pnamepat.pattern
+        pidnum = int(pnamepat.pattern)
     except (ValueError, TypeError):
         pidnum = None
     else:
@@ -277,10 +251,9 @@ def get_searchpid(
             if firstonly:
                 return results
 
-    for pid in sorted(procs, key=lambda k: int(k)):
-        # grab info from this pid. (defaults to empty string if read failed.)
-        pname = procs[pid]['name'] or ''
-        pargs = procs[pid]['args'] or ''
+    for pid in sorted(procs):
+        pname = procs[pid].name or ''
+        pargs = procs[pid].args or ''
         if not (pname or pargs):
             continue
 
@@ -341,21 +314,6 @@ def read_stdin():
     return sys.stdin.read()
 
 
-def try_fileread(filename):
-    """ Returns data from a file, returns None on failure """
-
-    try:
-        with open(filename, 'r') as f:
-            return f.read().strip()
-    except EnvironmentError:
-        print_err('Unable to read file: {}'.format(filename))
-        return None
-    except Exception as ex:
-        # General programming error.
-        print_err('Error in try_readfile(): {}'.format(ex))
-        raise
-
-
 class InvalidArg(ValueError):
     """ Raised when the user has used an invalid argument. """
     def __init__(self, msg=None):
@@ -435,9 +393,9 @@ class ProcResult(object):
             with info from get_processes().
         """
         return cls(
-            pid=int(pid),
-            name=procs[pid]['name'],
-            args=procs[pid]['args'],
+            pid=pid,
+            name=procs[pid].name,
+            args=procs[pid].args,
             used_args=used_args
         )
 
@@ -0,0 +1,272 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" procsnap.py
+    Takes snapshots of the running processes from /proc, for pidname.py
+    and pidnet.py.
+
+    Each process costs two small reads (/proc/<pid>/stat and
+    /proc/<pid>/cmdline) done with os.open()/os.read(), instead of the
+    open/fstat/ioctl/seek calls that open() adds. The reads can be spread
+    over a thread pool. Processes that exit during a snapshot are
+    skipped, and counted in ProcSnapshot.errors instead of printed.
+
+    A snapshot can be updated, which only reads the stat file for processes
+    that were already running, to tell a reused pid from the old process:
+        snap = procsnap.snapshot()
+        ...
+        newsnap = snap.update()
+        started, exited = snap.diff(newsnap)
+"""
+from __future__ import print_function
+import os
+import time
+from multiprocessing.pool import ThreadPool
+
+try:
+    from os import scandir
+except ImportError:
+    # Python 2, or 3.4.
+    scandir = None
+
+__VERSION__ = '0.1.0'
+
+PROCDIR = '/proc'
+# Size for each os.read() call on /proc files.
+READSIZE = 4096
+
+
+def iter_pids(procdir=PROCDIR):
+    """ Yield the pid (int) for each process directory in /proc. """
+    if scandir is None:
+        names = os.listdir(procdir)
+    else:
+        names = (entry.name for entry in scandir(procdir))
+    for name in names:
+        if name.isdigit():
+            yield int(name)
+
+
+def read_procfile(path):
+    """ Read a whole /proc file, returning bytes.
+        Raises EnvironmentError if the file can't be read (the process
+        has exited, or permission was denied).
+    """
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        chunks = []
+        while True:
+            chunk = os.read(fd, READSIZE)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            if len(chunk) < READSIZE:
+                # /proc files are generated in one go, this was the end.
+                break
+    finally:
+        os.close(fd)
+    return b''.join(chunks)
+
+
+def parse_stat(stat):
+    """ Split the bytes in /proc/<pid>/stat into (name, fields), where
+        fields starts with the state (field 3 in proc(5)).
+    """
+    # The name is in parentheses, and may contain spaces or ')'.
+    namestart = stat.find(b'(')
+    nameend = stat.rfind(b')')
+    return stat[namestart + 1:nameend], stat[nameend + 2:].split()
+
+
+def read_proc(pid, procdir=PROCDIR):
+    """ Read info for a single pid, returning a ProcInfo(),
+        or None if it can't be read.
+    """
+    piddir = os.path.join(procdir, str(pid))
+    try:
+        stat = read_procfile(os.path.join(piddir, 'stat'))
+        cmdline = read_procfile(os.path.join(piddir, 'cmdline'))
+    except EnvironmentError:
+        return None
+    return ProcInfo.from_proc(pid, stat, cmdline)
+
+
+def snapshot(skippids=None, workers=None, procdir=PROCDIR):
+    """ Take a snapshot of the running processes.
+        Arguments:
+            skippids : Pids to leave out.
+            workers  : Number of threads used for reading, or None to
+                       read in this thread.
+            procdir  : Directory to read processes from.
+    """
+    return ProcSnapshot(procdir=procdir).update(
+        skippids=skippids,
+        workers=workers,
+    )
+
+
+def watch(interval=1, skippids=None, workers=None, procdir=PROCDIR):
+    """ Yield (snapshot, started, exited) every `interval` seconds,
+        forever. The first snapshot lists every process as started.
+        See ProcSnapshot.update() for what is read each time.
+    """
+    snap = ProcSnapshot(procdir=procdir)
+    while True:
+        newsnap = snap.update(skippids=skippids, workers=workers)
+        started, exited = snap.diff(newsnap)
+        yield newsnap, started, exited
+        snap = newsnap
+        time.sleep(interval)
+
+
+class ProcInfo(object):
+    """ Info for a single process. `args` is the command line, with
+        arguments separated by spaces. `starttime` is the process start
+        time in clock ticks after boot, which tells a reused pid apart
+        from the process that had it before.
+    """
+    __slots__ = ('pid', 'name', 'args', 'state', 'ppid', 'starttime')
+
+    def __init__(
+            self, pid=None, name=None, args=None, state=None, ppid=None,
+            starttime=None):
+        self.pid = pid
+        self.name = name
+        self.args = args
+        self.state = state
+        self.ppid = ppid
+        self.starttime = starttime
+
+    def __eq__(self, other):
+        if not isinstance(other, ProcInfo):
+            return NotImplemented
+        return (
+            (self.pid == other.pid) and
+            (self.starttime == other.starttime)
+        )
+
+    def __ne__(self, other):
+        eq = self.__eq__(other)
+        return eq if eq is NotImplemented else not eq
+
+    def __hash__(self):
+        return hash((self.pid, self.starttime))
+
+    def __repr__(self):
+        return '{}(pid={!r}, name={!r}, args={!r})'.format(
+            type(self).__name__,
+            self.pid,
+            self.name,
+            self.args,
+        )
+
+    @classmethod
+    def from_proc(cls, pid, stat, cmdline):
+        """ Build a ProcInfo from the bytes in /proc/<pid>/stat and
+            /proc/<pid>/cmdline.
+        """
+        name, fields = parse_stat(stat)
+        return cls(
+            pid=pid,
+            name=name.decode('utf-8', 'replace'),
+            args=b' '.join(cmdline.split(b'\x00')).decode(
+                'utf-8',
+                'replace'
+            ).strip(),
+            state=fields[0].decode() if fields else None,
+            # Fields 4 and 22 in proc(5), counting the pid and name.
+            ppid=int(fields[1]) if len(fields) > 1 else None,
+            starttime=int(fields[19]) if len(fields) > 19 else None,
+        )
+
+
+class ProcSnapshot(object):
+    """ A snapshot of running processes, as {pid: ProcInfo()}. """
+
+    def __init__(self, procs=None, procdir=PROCDIR):
+        self.procs = procs or {}
+        self.procdir = procdir
+        # Processes that exited (or were unreadable) while reading.
+        self.errors = 0
+        self.time = time.time()
+
+    def __contains__(self, pid):
+        return pid in self.procs
+
+    def __iter__(self):
+        """ Iterate over the ProcInfo()s, sorted by pid. """
+        return (self.procs[pid] for pid in sorted(self.procs))
+
+    def __len__(self):
+        return len(self.procs)
+
+    def diff(self, other):
+        """ Returns (started, exited), the ProcInfo()s that are only in a
+            newer snapshot, and the ones that are only in this one.
+            Both are sorted by pid.
+        """
+        started = [
+            proc for proc in other
+            if self.procs.get(proc.pid, None) != proc
+        ]
+        exited = [
+            proc for proc in self
+            if other.procs.get(proc.pid, None) != proc
+        ]
+        return started, exited
+
+    def get(self, pid, default=None):
+        return self.procs.get(pid, default)
+
+    def update(self, skippids=None, workers=None):
+        """ Returns a new ProcSnapshot for the running processes.
+            New processes are fully read. For pids in this snapshot, only
+            the stat file is read again, and the old ProcInfo() is reused
+            when its start time matches. A pid that was reused by a new
+            process is read again.
+        """
+        skippids = set(skippids or ())
+        pids = [
+            pid for pid in iter_pids(self.procdir)
+            if pid not in skippids
+        ]
+
+        if workers and (len(pids) > 1):
+            pool = ThreadPool(workers)
+            try:
+                newprocs = pool.map(self.refresh_proc, pids)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            newprocs = [self.refresh_proc(pid) for pid in pids]
+
+        snap = ProcSnapshot(procdir=self.procdir)
+        for proc in newprocs:
+            if proc is None:
+                snap.errors += 1
+            else:
+                snap.procs[proc.pid] = proc
+        return snap
+
+    def read_proc(self, pid):
+        return read_proc(pid, procdir=self.procdir)
+
+    def refresh_proc(self, pid):
+        """ Returns the ProcInfo() in this snapshot for `pid` if it is
+            still the same process, or a newly read ProcInfo() if the pid
+            is new or was reused. Returns None if it can't be read.
+        """
+        proc = self.procs.get(pid, None)
+        if proc is None:
+            return self.read_proc(pid)
+        piddir = os.path.join(self.procdir, str(pid))
+        try:
+            stat = read_procfile(os.path.join(piddir, 'stat'))
+            _, fields = parse_stat(stat)
+            if len(fields) > 19 and int(fields[19]) == proc.starttime:
+                return proc
+            cmdline = read_procfile(os.path.join(piddir, 'cmdline'))
+        except EnvironmentError:
+            return None
+        return ProcInfo.from_proc(pid, stat, cmdline)
@@ -1,13 +1,20 @@
-#!/usr/bin/pypy
+#!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
 """searchpat.py
 
-   Uses stackless to search for regex patterns in files or stdin input.
-   There are seperate tasks for grabbing filenames and saerching content/name.
+   Searches for regex patterns in files or stdin input.
+   Directories are walked with os.scandir, and file contents are searched
+   by a pool of worker processes in batches. Results are streamed back
+   in the order the files were found.
+   Large files (and stdin) are not read into memory. They are scanned in
+   chunks through mmap, or streamed line by line.
 
-   Gets faster times with stackless vs. pypy.
-   ...if you can 'import stackless' then it should work.
+   The first versions of this script used stackless channels, with
+   seperate tasks for grabbing filenames and searching content/name.
+   They all ran in a single thread, with a special interpreter.
+   The old single-process engine is still used with `--jobs 1`, and
+   `--benchmark` compares the two.
 
    Before this script blew up several experiments were done to find the
    fastest method for walking a directory and "grepping" it's files.
@@ -26,28 +33,33 @@
 """
 from __future__ import print_function
 import datetime    # for basic timing of things
-import magic       # for determining binary/text files.
+import io          # decoding file content.
+import locale      # decoding mmapped file content.
+import mmap        # scanning large files.
+import multiprocessing  # worker processes for searching file content.
 import os          # file/dir io
 import re          # pattern matching
+import signal      # ignoring SIGINT in worker processes.
 import subprocess  # shell bash code
 import sys         # args, python version
 
+# Ring buffers for context lines when streaming.
+from collections import deque
 # Helper for sending stdin to subprocess.Popen
 from tempfile import SpooledTemporaryFile
 
 try:
-    import stackless
-except ImportError as exnostackless:
-    print('\nThis script requires stackless-python, or stackless pypy!\n')
-    print('Error:\n{}\n'.format(exnostackless))
-    sys.exit(1)
+    # Faster directory walking (python 3.5+).
+    from os import scandir
+except ImportError:
+    scandir = None
 
 # Docopt for arg parsing. :)
 from docopt import docopt
 
 # App Info
 NAME = 'SearchPat'
-VERSION = '3.7.2'
+VERSION = '4.1.0'
 VERSIONSTR = '{} v. {}'.format(NAME, VERSION)
 # Save actual script filename, and use it as the name in help.
 SCRIPTFILE = os.path.split(sys.argv[0])[1]
@@ -95,35 +107,112 @@ for ext, names in DEFAULT_FILE_EXTS.items():
             FILETYPES[n].add(ext)
 
 
-# Workers --------------------------------------------------------------------
-def filler_run(startpath, filetypes, channel_=None, excludepat=None):
-    """ task to start finding files,
-        sends to searcher_run tasklet via channel.
+# Number of bytes read before checking for binary content (--excludebinary).
+READ_CHUNKSIZE = 8192
+# Files at least this size (in bytes) are scanned in chunks (through mmap),
+# or streamed line by line, instead of being read into memory.
+STREAM_MINSIZE = 32 * 1024 * 1024
+# Approximate size of each chunk when scanning an mmapped file.
+MMAP_CHUNKSIZE = 4 * 1024 * 1024
+# Regex pattern parts that stop a pattern from being used to scan whole
+# chunks of text (see get_scan_pattern()).
+SCAN_UNSAFE = (
+    '[^', '(?s', '\\0', '\\a', '\\A', '\\b-', '\\D', '\\n', '\\N',
+    '\\s', '\\t-', '\\u', '\\U', '\\W', '\\x', '\\Z',
+)
+# Number of files sent to each worker process at a time.
+SEARCH_BATCHSIZE = 32
+# Number of times each engine is timed with --benchmark.
+BENCHMARK_ROUNDS = 3
+# Search options for worker processes, set by init_search_worker().
+SEARCH_WORKER = {}
 
-        This is used in get_dir_matches() to get filenames to search.
+
+# Workers --------------------------------------------------------------------
+def init_search_worker(searchpat, kw_args):
+    """ Initializer for the worker processes in iter_search().
+        Saves the search options, so they are only sent once per worker.
+        Interrupts are left to the main process.
 
         Arguments:
-            startpath  : Starting dir to get file names from.
-            filetypes  : File types to search.
-            channel_   : Stackless channel for communication.
-            excludepat : Compiled regex, file names that match are excluded.
+            searchpat : Precompiled regex pattern to search with.
+            kw_args   : kwargs for get_file_matches.
     """
-    for fullpath in iter_walkdir(startpath, filetypes, excludepat=excludepat):
-        channel_.send(fullpath)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    SEARCH_WORKER['searchpat'] = searchpat
+    SEARCH_WORKER['kw_args'] = kw_args
+
+
+def search_worker(filename):
+    """ Search a single file in a worker process, using the options from
+        init_search_worker(). Returns a MatchInfo, or None.
+    """
+    return get_file_matches(
+        filename,
+        SEARCH_WORKER['searchpat'],
+        **SEARCH_WORKER['kw_args']
+    )
 
-    channel_.send('!FINISHED')
 
+def iter_search(filenames, searchpat, kw_args, **kwargs):
+    """ Search file names or content, yielding a MatchInfo (or None) for
+        each file name, in the same order as `filenames`.
+        File content is searched by a pool of worker processes, in batches.
 
-def searcher_run(searchpat, kw_args, **kwargs):  # noqa
-    """ Receive file names from filler tasklet, and search them.
         Arguments:
+            filenames   : Iterable of file names to search.
             searchpat   : Precompiled regex pattern to search with.
             kw_args     : kwargs for get_file_matches/get_filename_matches
 
+        Keyword Arguments:
+            names_only  : Search file names only, not content.
+                          This never uses the worker processes.
+            jobs        : Number of worker processes to use.
+                          If 1 is used, all files are searched in this
+                          process.
+                          Default: os.cpu_count()
+            batchsize   : Number of files to send to a worker at a time.
+                          Default: SEARCH_BATCHSIZE
+    """
+    names_only = kwargs.get('names_only', False)
+    jobs = kwargs.get('jobs', None) or multiprocessing.cpu_count()
+    batchsize = kwargs.get('batchsize', SEARCH_BATCHSIZE)
+
+    if names_only or (jobs == 1):
+        get_matches = get_filename_matches if names_only else get_file_matches
+        for filename in filenames:
+            yield get_matches(filename, searchpat, **kw_args)
+        return
+
+    pool = multiprocessing.Pool(
+        processes=jobs,
+        initializer=init_search_worker,
+        initargs=(searchpat, kw_args)
+    )
+    try:
+        for filematch in pool.imap(
+                search_worker,
+                filenames,
+                chunksize=batchsize):
+            yield filematch
+        pool.close()
+    finally:
+        # Stops the workers early on errors/KeyboardInterrupt.
+        pool.terminate()
+        pool.join()
+
+
+def searcher_run(results, **kwargs):  # noqa
+    """ Receive search results from iter_search(), and report them.
+        Returns the MatchCollection with the results.
+
+        Arguments:
+            results     : Iterable of MatchInfo/None, one for each file
+                          searched.
+
         Keyword Arguments:
             matches     : MatchesCollection to add to.
             colors      : ColorCodes() class to use (or None for no color)
-            channel_    : Channel for task communications.
             linenums    : Whether to print line numbers.
                           Default: True
             linestrip   :  Whether to strip leading whitespace for matching
@@ -138,9 +227,7 @@ def searcher_run(searchpat, kw_args, **kwargs):  # noqa
                           replace more than one occurrence.
             urlmode     : Print names as urls.
     """
-    matches = kwargs.get('matches', None)
     colors = kwargs.get('colors', None)
-    channel_ = kwargs.get('channel_', None)
     linenums = kwargs.get('linenums', True)
     linestrip = kwargs.get('linestrip', True)
     names_only = kwargs.get('names_only', False)
@@ -167,126 +254,54 @@ def searcher_run(searchpat, kw_args, **kwargs):  # noqa
         codefmt = None
 
     namefmt = 'file://{}'.format if urlmode else '{}'.format
-    if names_only:
-        # Searching file names only, not content.
-        get_matches = get_filename_matches
-
+    if names_only or no_lines:
+        # Searching file names only, or only listing names.
         def format_name(s):
             """ Format filename for name-only searching/listing. """
             return '\n{}'.format(namefmt(s))
     else:
-        # Searching content, possibly only listing names.
-        get_matches = get_file_matches
-        if no_lines:
-            def format_name(s):
-                """ Format filename for content-search, name-only listing. """
-                return '\n{}'.format(namefmt(s))
-        else:
-            def format_name(s):
-                """ Format filename for content search/listing. """
-                return '\n{}:'.format(namefmt(s))
-
-    # Loop until channel_ receives '!FINISHED',
-    # expects data to be a valid filename.
-    # searches the file, and reports matches.
-    # also, updates the MatchesCollection() (matches).
-    stay = True
-    while stay:
-        data = channel_.receive()
-        if data == '!FINISHED':
-            stay = False
-            break
-
-        # Search file
-        filename = data
-        filematch = get_matches(filename, searchpat, **kw_args)
-        matches.searched += 1
-        if filematch:
-            # save this match for counts/info
-            matches.additem(filematch)
-            # print results as we go, colorize filename if applicable.
-            if colors:
-                filepath = colors.word(
-                    filename,
-                    style='bright',
-                    fore='blue')
-            else:
-                filepath = filename
-
-            if no_lines and shell_code:
-                # Run shell code including the file name.
-                out = RunProcess().shell_code(codefmt(filename))
-                if out:
-                    print(out)
-            else:
-                # Printing the file name, with or without lines.
-                print(format_name(filepath))
-            if not no_lines:
-                # Lines are highlighted in get_file_matches()
-                # if colors was passed.
-                for matchline in filematch.iterlines():
-                    print(matchline.formatted(
-                        linenums=linenums,
-                        linestrip=linestrip,
-                    ))
-
-
-def targets_run(targets, filetypes=None, channel_=None, excludepat=None):  # noqa
-    """ tasklet that sends targets to searcher_run tasklet via channel
-        targets is a predetermined list of filenames.
+        def format_name(s):
+            """ Format filename for content search/listing. """
+            return '\n{}:'.format(namefmt(s))
 
-        Arguments:
-            startpath  : Starting dir to get file names from.
-            filetypes  : List of file types (extensions) to search.
-            channel_   : Stackless channel for communication.
-            excludepat : Compiled regex, file names that match are excluded.
-    """
+    # Report each file's matches as they come in,
+    # and update the MatchesCollection() (matches).
+    matches = kwargs.get('matches', None)
+    if matches is None:
+        matches = MatchCollection()
+    for filematch in results:
+        matches.searched += 1
+        if not filematch:
+            continue
+        # save this match for counts/info
+        matches.additem(filematch)
+        filename = filematch.filename
+        # print results as we go, colorize filename if applicable.
+        if colors:
+            filepath = colors.word(
+                filename,
+                style='bright',
+                fore='blue')
+        else:
+            filepath = filename
 
-    if filetypes:
-        # Files validated by extension (has to be found in filetypes)
-        for target in targets:
-            # Target is a file, and is a valid extension
-            if os.path.isfile(target) and (file_ext(target) in filetypes):
-                # Excludes.
-                if excludepat and excludepat.search(target):
-                    continue
-                channel_.send(target)
-            # Target is a directory, walk it.
-            elif os.path.isdir(target):
-                for root, dirs, files in os.walk(target):
-                    # Exclude dir name also.
-                    if excludepat and excludepat.search(root):
-                        continue
-                    for filename in files:
-                        # Excludes.
-                        if excludepat and excludepat.search(filename):
-                            continue
-                        # Check extension before sending
-                        if file_ext(filename) in filetypes:
-                            fullpath = os.path.join(root, filename)
-                            channel_.send(fullpath)
-    else:
-        # ALL FILES ALLOWED
-        for target in targets:
-            # Excludes.
-            if excludepat and excludepat.search(target):
-                continue
-            # Target is a file, send it.
-            if os.path.isfile(target):
-                channel_.send(target)
-            # Target is a directory, walk it and send filenames.
-            elif os.path.isdir(target):
-                for root, dirs, files in os.walk(target):
-                    # Exclude dirs..
-                    if excludepat and excludepat.search(root):
-                        continue
-                    for filename in files:
-                        if excludepat and excludepat.search(filename):
-                            continue
-                        fullpath = os.path.join(root, filename)
-                        channel_.send(fullpath)
-
-    channel_.send('!FINISHED')
+        if no_lines and shell_code:
+            # Run shell code including the file name.
+            out = RunProcess().shell_code(codefmt(filename))
+            if out:
+                print(out)
+        else:
+            # Printing the file name, with or without lines.
+            print(format_name(filepath))
+        if not no_lines:
+            # Lines are highlighted in get_file_matches()
+            # if colors was passed.
+            for matchline in filematch.iterlines():
+                print(matchline.formatted(
+                    linenums=linenums,
+                    linestrip=linestrip,
+                ))
+    return matches
 
 
 # Functions ------------------------------------------------------------------
@@ -299,8 +314,12 @@ def addfile_maxlen(
         maxlength flag in get_file_matches.
     """
     if length < maxlength:
-        before = (MatchLine(t, n) for n, t in before) if before else None
-        after = (MatchLine(t, n) for n, t in after) if after else None
+        before = (
+            tuple(MatchLine(t, n) for n, t in before) if before else None
+        )
+        after = (
+            tuple(MatchLine(t, n) for n, t in after) if after else None
+        )
         info.lines.append(
             MatchLine(
                 text=text, lineno=lineno, before=before, after=after))
@@ -315,14 +334,76 @@ def addfile_normal(
         This is one of two methods for adding files, determined by the
         maxlength flag in get_file_matches.
     """
-    before = (MatchLine(t, n) for n, t in before) if before else None
-    after = (MatchLine(t, n) for n, t in after) if after else None
+    before = tuple(MatchLine(t, n) for n, t in before) if before else None
+    after = tuple(MatchLine(t, n) for n, t in after) if after else None
     info.lines.append(
         MatchLine(
             text=text, lineno=lineno, before=before, after=after))
     return None
 
 
+def benchmark_search(get_filenames, searchpat, kw_args):
+    """ Time iter_search() with a single process walking with os.walk
+        (the way the old stackless engine searched), and with the worker
+        processes walking with iter_walkdir(). Matches are not printed.
+        The best of BENCHMARK_ROUNDS runs is reported for each.
+        Returns a MatchCollection from the last run with worker processes.
+
+        Arguments:
+            get_filenames : Function that accepts an iter_walkdir()
+                            function, and returns an iterable of file
+                            names to search.
+            searchpat     : Pre-compiled regex pattern to search with.
+            kw_args       : kwargs from get_dir_matches/get_multi_matches.
+    """
+    colors = kw_args.get('colors', None)
+    names_only = kw_args.get('names_only', False)
+    jobs = kw_args.get('jobs', None) or multiprocessing.cpu_count()
+    engines = (
+        ('single process (os.walk)', iter_walkdir_oswalk, 1),
+        (
+            '{} worker processes'.format(jobs),
+            iter_walkdir,
+            1 if names_only else jobs
+        ),
+    )
+    results = []
+    for name, walkdir, enginejobs in engines:
+        besttime = None
+        for _ in range(BENCHMARK_ROUNDS):
+            matches = MatchCollection()
+            starttime = datetime.datetime.now()
+            for filematch in iter_search(
+                    get_filenames(walkdir),
+                    searchpat,
+                    kw_args,
+                    names_only=names_only,
+                    jobs=enginejobs):
+                matches.searched += 1
+                matches.additem(filematch)
+            runtime = (datetime.datetime.now() - starttime).total_seconds()
+            if (besttime is None) or (runtime < besttime):
+                besttime = runtime
+        results.append((
+            name,
+            besttime,
+            (matches.searched, len(matches), matches.total_lines())
+        ))
+        timestr = '{:0.3f} seconds'.format(besttime)
+        if colors:
+            timestr = colors.word(timestr, style='bright', fore='cyan')
+        print_header('{}:'.format(name), timestr)
+
+    if results[0][2] != results[-1][2]:
+        msg = 'The engines found different matches: {}'.format(
+            ', '.join('{} {!r}'.format(n, counts) for n, _, counts in results)
+        )
+        if colors:
+            msg = colors.word(msg, fore='red', style='bright')
+        print_warning(msg)
+    return matches
+
+
 def file_ext(fname):
     """ Gets file extension from filename,
         If no extension is present,
@@ -385,7 +466,7 @@ def get_context_before(lst, index, count, _transfunc=str.rstrip):
 
 
 def get_dir_matches(startpath, searchpat, **kwargs):
-    """ searches all files in a directory, uses multiple threads.
+    """ searches all files in a directory, uses worker processes.
         Arguments:
             startpath     : Directory to walk for files to search.
             searchpat     : Pre-compiled regex pattern to search with.
@@ -415,48 +496,26 @@ def get_dir_matches(startpath, searchpat, **kwargs):
             after         : Number of context lines to show after a match.
             no_lines      : Print only file names, not matching lines.
             urlmode       : Print names as urls.
+            jobs          : Number of worker processes to search with.
+                            Default: os.cpu_count()
+            benchmark     : Time the search engines with benchmark_search()
+                            instead of printing matches.
     """
-
-    filetypes = kwargs.get('filetypes', None)
     debug = kwargs.get('debug', False)
-    colors = kwargs.get('colors', None)
-    names_only = kwargs.get('names_only', False)
-    excludepat = kwargs.get('excludepat', None)
-    linenums = kwargs.get('linenums', True)
-    linestrip = kwargs.get('linestrip', True)
-    no_lines = kwargs.get('no_lines', False)
-    shell_code = kwargs.get('shell_code', None)
-    urlmode = kwargs.get('urlmode', False)
     if debug:
         printobj(kwargs, label='get_dir_matches kwargs')
 
-    # Communications Channel
-    channel = stackless.channel()
-    # Matches Collection
-    matches = MatchCollection()
-    # Tasks for filling filename/searching files
-    fillertask = stackless.tasklet(filler_run)(  # noqa
-        startpath,
-        filetypes,
-        channel,
-        excludepat=excludepat)
-    searchertask = stackless.tasklet(searcher_run)(  # noqa
-        searchpat,
-        kwargs,
-        matches=matches,
-        colors=colors,
-        channel_=channel,
-        linenums=linenums,
-        linestrip=linestrip,
-        names_only=names_only,
-        no_lines=no_lines,
-        shell_code=shell_code,
-        urlmode=urlmode)
-    try:
-        stackless.run()
-    except KeyboardInterrupt:
-        print_cancelled(colors)
+    def get_filenames(walkdir=iter_walkdir):
+        return walkdir(
+            startpath,
+            kwargs.get('filetypes', None),
+            excludepat=kwargs.get('excludepat', None)
+        )
 
+    if kwargs.get('benchmark', False):
+        matches = benchmark_search(get_filenames, searchpat, kwargs)
+    else:
+        matches = search_files(get_filenames(), searchpat, kwargs)
     if debug:
         print('\nFinished searching.')
 
@@ -466,6 +525,12 @@ def get_dir_matches(startpath, searchpat, **kwargs):
 def get_file_matches(filename, searchpat, **kwargs):  # noqa
     """ Searches a single file for a match. returns single MatchInfo()
 
+        Files smaller than STREAM_MINSIZE are read into a list of lines.
+        Larger files are scanned through an mmap with iter_mmap_matches(),
+        or streamed line by line with iter_stream_matches() (for --reverse,
+        or patterns that can't be scanned across lines).
+        Stdin is always streamed.
+
         Arguments:
             filename      :  File to open and search
             searchpat     :  Pre-compiled regex pattern to search with.
@@ -498,13 +563,6 @@ def get_file_matches(filename, searchpat, **kwargs):  # noqa
     colors = kwargs.get('colors', None)
     nobinary = kwargs.get('nobinary', False)
 
-    # Skip all binary files if --excludebinary is used.
-    if nobinary and is_binary(filename):
-        if print_status:
-            fname = '<stdin>' if filename == '-' else filename
-            print('    skipped binary file: {}'.format(fname))
-        return None
-
     # Style for highlighting matches
     highlight_args = {'style': 'bright', 'fore': 'red'}
     if print_status:
@@ -513,43 +571,97 @@ def get_file_matches(filename, searchpat, **kwargs):  # noqa
     # Predetermine functions to use,
     # moves several if statements OUTSIDE of the loop.
     add_func = addfile_maxlen if maxlength else addfile_normal
-    # Normal match or reverse?
-    match_func = is_none if reverse else is_not_none
-    # Whether or not to grab context lines.
-    if before > 0:
-        get_before = get_context_before
-    else:
-        def get_before(lst, index, cnt, _transfunc=None):
-            return None
-    if after > 0:
-        get_after = get_context_after
-    else:
-        def get_after(lst, index, cnt, _transfunc=None):
-            return None
-
     # preload strip()
     linetransfunc = str.rstrip
     # preload replace()
     strreplace = str.replace
-    # preload searchpat.search()
-    search_func = searchpat.search
     # predetermine color use
     usecolors = (colors and (not reverse))
+    # Arguments for the iter_*_matches functions.
+    matchargs = {'before': before, 'after': after, 'reverse': reverse}
 
     # Initialize blank match information.
     file_info = MatchInfo()
     # Set the filename for this matchinfo, or use 'stdin'
     file_info.filename = 'stdin' if filename == '-' else filename
 
-    # Read file/or use stdin.
+    def add_matches(records):
+        """ Add all matching lines from one of the iter_*_matches functions
+            to the MatchInfo.
+        """
+        for lineno, line, re_match, beforelines, afterlines in records:
+            line = linetransfunc(line)
+            # Save the raw line length for maxlength.
+            rawlen = len(line)
+            # Highlight match text if ColorCodes() class was passed.
+            if usecolors:
+                highlight_txt = re_match.group()
+                if highlight_txt:
+                    line = strreplace(
+                        line,
+                        highlight_txt,
+                        colors.word(highlight_txt, **highlight_args))
+
+            # Add this match and all of it's info to the MatchInfo.
+            add_func(
+                info=file_info,
+                text=line,
+                lineno=lineno,
+                length=rawlen,
+                maxlength=maxlength,
+                before=beforelines,
+                after=afterlines)
+
+    # Read file/or use stdin, and SEARCH FILE.
     try:
         if filename == '-':
-            # Use stdin.
-            filelines = sys.stdin.readlines()
+            # Use stdin, one line at a time.
+            add_matches(iter_stream_matches(sys.stdin, searchpat, **matchargs))
         else:
             # Use a file.
-            with open(filename, 'r') as fread:
-                filelines = fread.readlines()
+            with open(filename, 'rb') as fread:
+                chunk = fread.read(READ_CHUNKSIZE)
+                # Skip all binary files if --excludebinary is used.
+                if nobinary and is_binary(chunk):
+                    if print_status:
+                        print('    skipped binary file: {}'.format(filename))
+                    return None
+                filesize = os.fstat(fread.fileno()).st_size
+                scanpat = None
+                if (filesize >= STREAM_MINSIZE) and (not reverse):
+                    scanpat = get_scan_pattern(searchpat)
+
+                if filesize < STREAM_MINSIZE:
+                    data = chunk + fread.read()
+                    # Decoded the same way as open(filename, 'r').
+                    filelines = io.TextIOWrapper(io.BytesIO(data)).readlines()
+                    add_matches(
+                        iter_line_matches(filelines, searchpat, **matchargs)
+                    )
+                elif scanpat is None:
+                    fread.seek(0)
+                    add_matches(
+                        iter_stream_matches(
+                            io.TextIOWrapper(fread),
+                            searchpat,
+                            **matchargs)
+                    )
+                else:
+                    filemap = mmap.mmap(
+                        fread.fileno(),
+                        0,
+                        access=mmap.ACCESS_READ)
+                    try:
+                        add_matches(
+                            iter_mmap_matches(
+                                filemap,
+                                searchpat,
+                                scanpat,
+                                before=before,
+                                after=after)
+                        )
+                    finally:
+                        filemap.close()
     except EnvironmentError:
         print('Can\'t read file, skipping: {}'.format(filename))
         return None
@@ -562,61 +674,6 @@ def get_file_matches(filename, searchpat, **kwargs):  # noqa
         print('Error reading from: {}\n{}'.format(file_info.filename, exio))
         return None
 
-    # SEARCH FILE
-    # Use indexes to track line numbers while iterating the lines.
-
-    for lineindex, line in enumerate(filelines):
-        beforelines, afterlines = None, None
-        # try match
-        re_match = search_func(line)
-        # use the pre-determined matching function (normal/reverse)
-        if not match_func(re_match):
-            continue
-
-        line = linetransfunc(line)
-        # Save the raw line length for maxlength.
-        rawlen = len(line)
-        # Highlight match text if ColorCodes() class was passed.
-        if not reverse:
-            highlight_txt = re_match.group()
-            if usecolors and highlight_txt:
-                line = strreplace(
-                    line,
-                    highlight_txt,
-                    colors.word(highlight_txt, **highlight_args))
-
-        # Grab context before/after this match (if before/after was set).
-        beforelines = get_before(
-            filelines,
-            lineindex,
-            before,
-            _transfunc=linetransfunc
-        )
-        afterlines = get_after(
-            filelines,
-            lineindex,
-            after,
-            _transfunc=linetransfunc
-        )
-
-        # Instead of using add_func/addfile_normal just do this:!
-        # The function call takes longer than the if statement!
-        # before = (MatchLine(t, n) for n, t in before) if before else None
-        # after = (MatchLine(t, n) for n, t in after) if after else None
-        # info.lines.append(
-        #    MatchLine(
-        #        text=text, lineno=lineno, before=before, after=after))
-
-        # Add this match and all of it's info to the MatchInfo.
-        add_func(
-            info=file_info,
-            text=line,
-            lineno=lineindex + 1,
-            length=rawlen,
-            maxlength=maxlength,
-            before=beforelines,
-            after=afterlines)
-
     # Finished.
     matching_file = bool(file_info.lines)
     if reversenames:
@@ -712,55 +769,61 @@ def get_multi_matches(targets, searchpat, **kwargs):
             after         : Number of context lines to show after a match.
             no_lines      : Print only file names, not matching lines.
             urlmode       : Print names as urls.
+            jobs          : Number of worker processes to search with.
+                            Default: os.cpu_count()
+            benchmark     : Time the search engines with benchmark_search()
+                            instead of printing matches.
     """
-
-    filetypes = kwargs.get('filetypes', [])
     debug = kwargs.get('debug', False)
-    colors = kwargs.get('colors', None)
-    linenums = kwargs.get('linenums', True)
-    linestrip = kwargs.get('linestrip', True)
-    names_only = kwargs.get('names_only', False)
-    excludepat = kwargs.get('excludepat', None)
-    no_lines = kwargs.get('no_lines', False)
-    shell_code = kwargs.get('shell_code', None)
-    urlmode = kwargs.get('urlmode', False)
-
     if debug:
-        printobj(kwargs, label='get_file_matches kwargs')
-
-    # Communications channel (sends filenames from targettask to searcher)
-    channel = stackless.channel()
-    # Matches Collection (The searcher task will modify this while running.)
-    matches = MatchCollection()
-    # Tasks for reporting targets/searching
-    targettask = stackless.tasklet(targets_run)(  # noqa
-        targets,
-        filetypes,
-        channel,
-        excludepat=excludepat)
-    searchertask = stackless.tasklet(searcher_run)(  # noqa
-        searchpat,
-        kwargs,
-        matches=matches,
-        colors=colors,
-        channel_=channel,
-        linenums=linenums,
-        linestrip=linestrip,
-        names_only=names_only,
-        no_lines=no_lines,
-        shell_code=shell_code,
-        urlmode=urlmode)
-    try:
-        stackless.run()
-    except KeyboardInterrupt:
-        print_cancelled(colors)
+        printobj(kwargs, label='get_multi_matches kwargs')
+
+    def get_filenames(walkdir=iter_walkdir):
+        return iter_targets(
+            targets,
+            kwargs.get('filetypes', None),
+            excludepat=kwargs.get('excludepat', None),
+            walkdir=walkdir
+        )
 
+    if kwargs.get('benchmark', False):
+        matches = benchmark_search(get_filenames, searchpat, kwargs)
+    else:
+        matches = search_files(get_filenames(), searchpat, kwargs)
     if debug:
         print('\nFinished searching.')
 
     return matches
 
 
+def get_scan_pattern(searchpat):
+    """ Get a pattern for iter_mmap_matches() to scan whole chunks of text
+        with. Lines with a match for `searchpat` always have a match for
+        the scan pattern that starts in the line.
+        Returns None if the pattern can't be used that way.
+
+        Arguments:
+            searchpat  : Pre-compiled regex pattern, or TextPattern.
+    """
+    if isinstance(searchpat, TextPattern):
+        if '\n' in searchpat.pattern:
+            return None
+        return re.compile(
+            re.escape(searchpat.pattern),
+            flags=re.IGNORECASE if searchpat.ignorecase else 0)
+    if searchpat.flags & re.DOTALL:
+        return None
+    pattern = searchpat.pattern
+    if any(s in pattern for s in SCAN_UNSAFE):
+        # This pattern might match newlines, or the start/end of each line
+        # (where line-by-line searching sees the start/end of the string).
+        return None
+    if any(ord(c) < 32 for c in pattern):
+        return None
+    # ^ and $ should match at the start/end of each line.
+    return re.compile(pattern, searchpat.flags | re.MULTILINE)
+
+
 def get_target_str(target, colors=None):
     """ Get a human friendly string for status about the search target/s.
         like: '1 file' or '38 files/directories' or '../myfile.py'
@@ -789,23 +852,11 @@ def get_target_str(target, colors=None):
     return '{} {}'.format(lenstr, typestr)
 
 
-def is_binary(filename):
-    """ Determine whether a file is binary or text. """
-    if filename == '-':
-        # stdin (magic.from_buffer doesn't always work for this)
-        # This may return false positives, but it's better than skipping
-        # valid files.
-        return False
-
-    path = readlink(filename)
-    try:
-        mimetype = magic.from_file(path, mime=True)
-    except (IOError, OSError):
-        # IOError happened once when a file was deleted during execution.
-        # OSError could be a permissions error.
-        # This may return false positives. Assumes errors are binary files.
-        return True
-    return not mimetype.startswith(b'text')
+def is_binary(chunk):
+    """ Determine whether a file is binary or text, from the first chunk
+        of bytes read from it. Like grep, files with NUL bytes are binary.
+    """
+    return b'\x00' in chunk
 
 
 def is_none(obj):
@@ -826,10 +877,306 @@ def is_not_none(obj):
     return (obj is not None)
 
 
-def iter_walkdir(startpath=None, filetypes=None, excludepat=None):  # noqa
-    """ Iterates over os.walk starting with 'startpath'.
+def iter_line_matches(filelines, searchpat, before=0, after=0, reverse=False):
+    """ Search a list of lines, yielding a tuple of
+        (lineno, line, re_match, before_context, after_context) for each
+        matching line. Context is an iterable of (lineno, line), or None.
+
+        Arguments:
+            filelines  : List of lines to search.
+            searchpat  : Pre-compiled regex pattern to search with.
+            before     : Number of context lines before a match.
+            after      : Number of context lines after a match.
+            reverse    : If True, lines that DONT match are yielded.
+    """
+    # Normal match or reverse?
+    match_func = is_none if reverse else is_not_none
+    # Whether or not to grab context lines.
+    if before > 0:
+        get_before = get_context_before
+    else:
+        def get_before(lst, index, cnt, _transfunc=None):
+            return None
+    if after > 0:
+        get_after = get_context_after
+    else:
+        def get_after(lst, index, cnt, _transfunc=None):
+            return None
+    # preload strip()
+    linetransfunc = str.rstrip
+    # preload searchpat.search()
+    search_func = searchpat.search
+
+    # Use indexes to track line numbers while iterating the lines.
+    for lineindex, line in enumerate(filelines):
+        # try match
+        re_match = search_func(line)
+        # use the pre-determined matching function (normal/reverse)
+        if not match_func(re_match):
+            continue
+        yield (
+            lineindex + 1,
+            line,
+            re_match,
+            # Grab context before/after this match (if before/after was set).
+            get_before(filelines, lineindex, before, _transfunc=linetransfunc),
+            get_after(filelines, lineindex, after, _transfunc=linetransfunc),
+        )
+
+
+def iter_mmap_matches(filemap, searchpat, scanpat, before=0, after=0):  # noqa
+    """ Search an mmap of a file in chunks of about MMAP_CHUNKSIZE bytes,
+        ending on a line boundary. Each decoded chunk is scanned with
+        `scanpat` (see get_scan_pattern()), and lines are only split out
+        around the match offsets. The line holding the match is checked
+        with `searchpat`, so matching is the same as iter_line_matches().
+        Memory use depends on the chunk size, not the file size.
+
+        Yields the same tuples as iter_line_matches().
+
+        Arguments:
+            filemap   : mmap.mmap of the file to search.
+            searchpat : Pre-compiled regex pattern to search with.
+            scanpat   : Pattern from get_scan_pattern(searchpat).
+            before    : Number of context lines before a match.
+            after     : Number of context lines after a match.
+    """
+    encoding = locale.getpreferredencoding(False)
+    linetransfunc = str.rstrip
+    search_func = searchpat.search
+    scan_func = scanpat.search
+    size = len(filemap)
+    # Context lines from the end of previous chunks, as (lineno, line).
+    beforebuf = deque(maxlen=before)
+    # Matches that are still waiting on lines of context after them,
+    # as [lineno, line, re_match, before_context, after_context].
+    pending = deque()
+    # Byte offset, and line number for the start of the current chunk.
+    start = 0
+    chunklineno = 1
+    while start < size:
+        end = start + MMAP_CHUNKSIZE
+        if end >= size:
+            end = size
+        else:
+            end = filemap.find(b'\n', end - 1)
+            end = size if end == -1 else end + 1
+        text = filemap[start:end].decode(encoding)
+        if '\r' in text:
+            # Universal newlines, like open(filename, 'r').
+            text = text.replace('\r\n', '\n').replace('\r', '\n')
+        textlen = len(text)
+
+        if pending:
+            # Finish context for matches at the end of the last chunk.
+            lines = iter_text_lines(
+                text,
+                0,
+                chunklineno,
+                after - len(pending[-1][4]))
+            for linenum, line in lines:
+                for match in pending:
+                    if len(match[4]) < after:
+                        match[4].append((linenum, linetransfunc(line)))
+            while pending and (len(pending[0][4]) == after):
+                yield tuple(pending.popleft())
+
+        # Position of the next scan, and the last line number counted.
+        pos = 0
+        counted = 0
+        lineno = chunklineno
+        while pos < textlen:
+            scan_match = scan_func(text, pos)
+            if (scan_match is None) or (scan_match.start() == textlen):
+                # No more matches (an empty match at the end is no line).
+                break
+            linestart = text.rfind('\n', 0, scan_match.start()) + 1
+            lineend = text.find('\n', scan_match.start())
+            lineend = textlen if lineend == -1 else lineend + 1
+            pos = lineend
+            line = text[linestart:lineend]
+            re_match = search_func(line)
+            if re_match is None:
+                # Scan matched across lines, but this line doesn't match.
+                continue
+            lineno += text.count('\n', counted, linestart)
+            counted = linestart
+
+            beforelines = None
+            if before:
+                beforelines = list(iter_text_lines_before(
+                    text,
+                    linestart,
+                    lineno,
+                    before))
+                missing = before - len(beforelines)
+                if missing and beforebuf:
+                    beforelines[:0] = list(beforebuf)[-missing:]
+                beforelines = [(n, linetransfunc(t)) for n, t in beforelines]
+            afterlines = None
+            if after:
+                afterlines = [
+                    (n, linetransfunc(t))
+                    for n, t in iter_text_lines(
+                        text,
+                        lineend,
+                        lineno + 1,
+                        after)
+                ]
+            match = [lineno, line, re_match, beforelines, afterlines]
+            if pending or (after and (len(afterlines) < after)):
+                pending.append(match)
+            else:
+                yield tuple(match)
+
+        # Line number for the start of the next chunk.
+        lineno += text.count('\n', counted, textlen)
+        if before:
+            # Save the last lines of this chunk for the next chunk.
+            beforebuf.extend(iter_text_lines_before(
+                text,
+                textlen,
+                lineno,
+                before))
+        chunklineno = lineno
+        start = end
+
+    # End of the file, these matches have all of the context there is.
+    while pending:
+        yield tuple(pending.popleft())
+
+
+def iter_stream_matches(lines, searchpat, before=0, after=0, reverse=False):
+    """ Search an iterable of lines (like stdin) one line at a time,
+        without keeping the lines around. Context before a match is kept in
+        a ring buffer, so memory use stays constant.
+
+        Yields the same tuples as iter_line_matches().
+
+        Arguments:
+            lines      : Iterable of lines to search.
+            searchpat  : Pre-compiled regex pattern to search with.
+            before     : Number of context lines before a match.
+            after      : Number of context lines after a match.
+            reverse    : If True, lines that DONT match are yielded.
+    """
+    match_func = is_none if reverse else is_not_none
+    linetransfunc = str.rstrip
+    search_func = searchpat.search
+    # The last `before` lines, as (lineno, line).
+    beforebuf = deque(maxlen=before)
+    # Matches that are still waiting on lines of context after them,
+    # as [lineno, line, re_match, before_context, after_context].
+    pending = deque()
+    for lineindex, line in enumerate(lines):
+        lineno = lineindex + 1
+        if pending:
+            stripped = linetransfunc(line)
+            for match in pending:
+                match[4].append((lineno, stripped))
+            if len(pending[0][4]) == after:
+                yield tuple(pending.popleft())
+
+        re_match = search_func(line)
+        if match_func(re_match):
+            match = [
+                lineno,
+                line,
+                re_match,
+                tuple(beforebuf) if before else None,
+                [] if after else None,
+            ]
+            if after:
+                pending.append(match)
+            else:
+                yield tuple(match)
+        if before:
+            beforebuf.append((lineno, linetransfunc(line)))
+
+    # End of the input, these matches have all of the context there is.
+    while pending:
+        yield tuple(pending.popleft())
+
+
+def iter_targets(targets, filetypes=None, excludepat=None, walkdir=None):
+    """ Iterate over file names from a list of targets (files or dirs).
+        Directories are walked with iter_walkdir().
+
+        Arguments:
+            targets    : List of file and directory names.
+            filetypes  : List of file types (extensions) to search.
+            excludepat : Compiled regex, file names that match are excluded.
+            walkdir    : Function to walk directories with.
+                         Default: iter_walkdir
+
+        Yields: A file path (string) for each file to search.
+    """
+    walkdir = walkdir or iter_walkdir
+    for target in targets:
+        if os.path.isfile(target):
+            # Target is a file, check the extension.
+            if filetypes and (file_ext(target) not in filetypes):
+                continue
+            # Excludes.
+            if excludepat and (excludepat.search(target) is not None):
+                continue
+            yield target
+        elif os.path.isdir(target):
+            # Target is a directory, walk it.
+            for fullpath in walkdir(
+                    target,
+                    filetypes,
+                    excludepat=excludepat):
+                yield fullpath
+
+
+def iter_text_lines(text, pos, lineno, count):
+    """ Yield up to `count` lines from `text`, starting at `pos`,
+        as (lineno, line).
+
+        Arguments:
+            text    : Text to get lines from.
+            pos     : Offset for the start of the first line.
+            lineno  : Line number for the first line.
+            count   : Maximum number of lines to yield.
+    """
+    textlen = len(text)
+    for n in range(count):
+        if pos >= textlen:
+            return
+        end = text.find('\n', pos)
+        end = textlen if end == -1 else end + 1
+        yield (lineno + n, text[pos:end])
+        pos = end
+
+
+def iter_text_lines_before(text, pos, lineno, count):
+    """ Yield up to `count` lines from `text` that come before `pos`,
+        in order, as (lineno, line).
+
+        Arguments:
+            text    : Text to get lines from.
+            pos     : Offset for the start of the line after the lines.
+            lineno  : Line number for the line at `pos`.
+            count   : Maximum number of lines to yield.
+    """
+    lines = []
+    while pos and (len(lines) < count):
+        linestart = text.rfind('\n', 0, pos - 1) + 1
+        lines.append(text[linestart:pos])
+        pos = linestart
+    lines.reverse()
+    firstlineno = lineno - len(lines)
+    for n, line in enumerate(lines):
+        yield (firstlineno + n, line)
+
+
+def iter_walkdir(startpath=None, filetypes=None, excludepat=None):
+    """ Walks directories starting with 'startpath'.
         If `filetypes` is given (list of extensions), files are only
         yielded when it's extension is in the list of extensions.
+        Directories are walked top-down, like os.walk(), using os.scandir()
+        when it is available.
 
         Arguments:
             startpath  : Dir to walk from.
@@ -840,33 +1187,77 @@ def iter_walkdir(startpath=None, filetypes=None, excludepat=None):  # noqa
 
         Yields: A full filepath (string) as the directories are walked.
     """
-    if filetypes:
-        valid_types = {ext: True for ext in filetypes}
-        # Walk the directory, yielding filtered file paths
-        for root, dirs, files in os.walk(startpath):
-            # Exclude dirs also.
-            if excludepat and (excludepat.search(root) is not None):
+    if scandir is None:
+        return iter_walkdir_oswalk(
+            startpath,
+            filetypes=filetypes,
+            excludepat=excludepat)
+    return iter_walkdir_scandir(
+        startpath,
+        filetypes=filetypes,
+        excludepat=excludepat)
+
+
+def iter_walkdir_oswalk(startpath=None, filetypes=None, excludepat=None):
+    """ Iterates over os.walk starting with 'startpath'.
+        This is the os.walk() version of iter_walkdir().
+    """
+    valid_types = set(filetypes or ())
+    # Walk the directory, yielding filtered file paths
+    for root, dirs, files in os.walk(startpath):
+        # Exclude dirs also.
+        if excludepat and (excludepat.search(root) is not None):
+            continue
+        for filename in files:
+            # Excludes.
+            if excludepat and (excludepat.search(filename) is not None):
                 continue
-            for filename in files:
-                # Excludes.
-                if excludepat and (excludepat.search(filename) is not None):
-                    continue
-                # Valid file extension.
-                if valid_types.get(file_ext(filename), False):
-                    yield os.path.join(root, filename)
-    else:
-        # Walk the directory, yielding ALL files
-        # (it's not really good to search binary files though)
-        for root, dirs, files in os.walk(startpath):
-            # Exclude dirs also..
-            if excludepat and (excludepat.search(root) is not None):
+            # Valid file extension (or all files).
+            if valid_types and (file_ext(filename) not in valid_types):
                 continue
-            for filename in files:
-                # Excludes.
-                if excludepat and (excludepat.search(filename) is not None):
-                    continue
-                # Good filename.
-                yield os.path.join(root, filename)
+            yield os.path.join(root, filename)
+
+
+def iter_walkdir_scandir(startpath=None, filetypes=None, excludepat=None):
+    """ Walks directories with os.scandir starting with 'startpath'.
+        This is the os.scandir() version of iter_walkdir(). File types are
+        known from the directory entries, so no stat() calls are needed for
+        most files.
+    """
+    valid_types = set(filetypes or ())
+    # Directories left to walk, the next one is last.
+    dirstack = [startpath]
+    while dirstack:
+        root = dirstack.pop()
+        try:
+            entries = list(scandir(root))
+        except OSError:
+            # Like os.walk, unreadable directories are skipped.
+            continue
+        subdirs = []
+        # Exclude dirs also (sub-directories are still walked).
+        skipfiles = excludepat and (excludepat.search(root) is not None)
+        for entry in entries:
+            try:
+                isdir = entry.is_dir()
+            except OSError:
+                isdir = False
+            if isdir:
+                # Symlinked directories are not followed, like os.walk.
+                if not entry.is_symlink():
+                    subdirs.append(entry.path)
+                continue
+            if skipfiles:
+                continue
+            # Excludes.
+            if excludepat and (excludepat.search(entry.name) is not None):
+                continue
+            # Valid file extension (or all files).
+            if valid_types and (file_ext(entry.name) not in valid_types):
+                continue
+            yield entry.path
+        # Walk sub-directories in order, top-down.
+        dirstack.extend(reversed(subdirs))
 
 
 def make_block(text, blocksize=60, spaces=False):
@@ -1244,15 +1635,42 @@ def printobj(obj, indent=0, label=None):
         print('{}{}'.format(space, obj))
 
 
-def readlink(path, parentdir=None):
-    """ Read all symlinks until the end target is reached. """
-    basedir, _ = os.path.split(path)
+def search_files(filenames, searchpat, kw_args):
+    """ Search and report matches for several file names, using
+        iter_search() and searcher_run(). Returns a MatchCollection.
+        On KeyboardInterrupt, the matches found so far are returned.
+
+        Arguments:
+            filenames : Iterable of file names to search.
+            searchpat : Pre-compiled regex pattern to search with.
+            kw_args   : kwargs from get_dir_matches/get_multi_matches.
+    """
+    colors = kw_args.get('colors', None)
+    names_only = kw_args.get('names_only', False)
+    matches = MatchCollection()
+    results = iter_search(
+        filenames,
+        searchpat,
+        kw_args,
+        names_only=names_only,
+        jobs=kw_args.get('jobs', None))
     try:
-        linkto = os.readlink(path)
-        fullpath = os.path.abspath(os.path.join(basedir, linkto))
-    except OSError:
-        return path if not parentdir else os.path.join(parentdir, path)
-    return readlink(fullpath, parentdir=basedir)
+        searcher_run(
+            results,
+            matches=matches,
+            colors=colors,
+            linenums=kw_args.get('linenums', True),
+            linestrip=kw_args.get('linestrip', True),
+            names_only=names_only,
+            no_lines=kw_args.get('no_lines', False),
+            shell_code=kw_args.get('shell_code', None),
+            urlmode=kw_args.get('urlmode', False))
+    except KeyboardInterrupt:
+        print_cancelled(colors)
+    finally:
+        # Stop any worker processes.
+        results.close()
+    return matches
 
 
 def strip_chars(s, chars):
@@ -1327,6 +1745,12 @@ def main(argd):  # noqa
         'Invalid number for context/after: {}',
         minimum=0)
 
+    # Get the number of worker processes (0 means one per cpu).
+    jobs = parse_int(
+        argd['--jobs'] or 0,
+        'Invalid number of jobs: {}',
+        minimum=0)
+
     # Colorize search type info, or use normal strings
     targetstr = get_target_str(target, colors=colors)
 
@@ -1455,6 +1879,8 @@ def main(argd):  # noqa
             urlmode=argd['--urlnames'],
             linenums=not argd['--nolinenums'],
             linestrip=not argd['--nolinestrip'],
+            jobs=jobs,
+            benchmark=argd['--benchmark'],
         )
 
         # Matches are printed as they are found, per file
@@ -1495,6 +1921,8 @@ def main(argd):  # noqa
             urlmode=argd['--urlnames'],
             linenums=not argd['--nolinenums'],
             linestrip=not argd['--nolinestrip'],
+            jobs=jobs,
+            benchmark=argd['--benchmark'],
         )
         # Matches are printed as they are found, per file
         printmatchlines = False
@@ -1647,15 +2075,16 @@ class ErrorOutput(Output):
 class MatchLine(object):
 
     """ single line in a MatchInfo() """
-    __slots__ = ('after', 'before', 'lineno_len', 'lineno', 'text')
+    __slots__ = ('after', 'before', 'lineno', 'text')
     # Level of indention for line numbers when represented as a string.
     # (if the len(str(lineno)) > lineno_len formatting will be wrong!)
     lineno_len = 4
 
     def __init__(self, text=None, lineno=None, before=None, after=None):
-        # Lines of context after this match line (iterable of MatchLine).
+        # Lines of context after this match line (tuple of MatchLine).
+        # Generators can't be sent back from the worker processes.
         self.after = after
-        # Lines of context before this match line (iterable of MatchLine).
+        # Lines of context before this match line (tuple of MatchLine).
         self.before = before
 
         # Text for this line match.
@@ -1960,6 +2389,7 @@ class TextPattern(object):
     def __init__(self, pattern, ignorecase=False):
         self.pattern = pattern
         self.pattern_lower = pattern.lower()
+        self.ignorecase = ignorecase
         if ignorecase:
             self.search = self.search_nocase
         else:
@@ -2034,6 +2464,10 @@ USAGESTR = """{filename} v. {version}
                                     even binary files, which is not good.
         -a num,--after num        : Lines of context to show after a match.
         -b num,--before num       : Lines of context to show before a match.
+        -B,--benchmark            : Time the search with a single process,
+                                    and with worker processes, without
+                                    printing matches. Only directories and
+                                    multiple targets are benchmarked.
         -c num,--context num      : Like using 'after' and 'before', both
                                     with the same number.
         -D,--debug                : Print more debug info.
@@ -2043,6 +2477,10 @@ USAGESTR = """{filename} v. {version}
                                     not content.
         -h,--help                 : Show this message.
         -i,--ignorecase           : Make the search query case insensitive.
+        -j num,--jobs num         : Number of worker processes used to search
+                                    file content. 1 searches everything in
+                                    a single process.
+                                    Default: {cpus}
         -l n,--maxlength n        : Maximum length for each line,
                                     lines longer than this are not included.
                                     Default: 0 (no maximum length)
@@ -2110,14 +2548,18 @@ USAGESTR = """{filename} v. {version}
             If {filename} sees a directory in the TARGET,
             it walks all sub-directories of it.
 
-        Stackless:
-            This script is setup to run with stackless-python
-            (/usr/bin/stackless), but you could probably use any python
-            executable that will successfully do 'import stackless'.
+        Worker processes:
+            When searching directories or multiple targets, file content
+            is searched by worker processes, {batchsize} files at a time.
+            Matches are still printed in the order the files were found.
+            Single files, stdin, and --filenames searches use a single
+            process.
 
 """.format(filename=SCRIPTFILE,
            version=VERSION,
            filetypes=USAGE_FILETYPES,
+           cpus=multiprocessing.cpu_count(),
+           batchsize=SEARCH_BATCHSIZE,
            cwd=os.getcwd())
 
 
@@ -2129,7 +2571,7 @@ if __name__ == '__main__':
     try:
         main_ret = main(main_argd)
     except KeyboardInterrupt:
-        # This still happens when not using stackless (single-file searches).
+        # This still happens for single-file searches.
         if main_argd['--nocolors'] or (not sys.stdout.isatty()):
             colors = None
         else:
@@ -11,9 +11,10 @@ import logging
 import pickle
 import os
 import re
+import time
 
 __module_name__ = 'xhighlights'
-__module_version__ = '1.0.0'
+__module_version__ = '1.1.0'
 __module_description__ = (
     'Highlights URLs, nicks, and custom patterns in the chat window.')
 VERSIONSTR = '{} v. {}'.format(__module_name__, __module_version__)
@@ -134,6 +135,63 @@ link_re = re.compile(linkpattern)
 EMITTING = False
 
 
+class ChannelUsers(object):
+
+    """ Holds a set of nicks for each channel, so message_filter() doesn't
+        have to build a user list for every message.
+        A channel's set is built from xchat.get_list('users') the first
+        time it is needed, and kept up to date with join/part/quit/kick/nick
+        events, see: users_event()
+    """
+
+    def __init__(self):
+        # {(network, channel): {nick, ...}}
+        self.channels = {}
+
+    @staticmethod
+    def channel_key():
+        """ Key for the current context's channel. """
+        network = xchat.get_info('network') or xchat.get_info('server')
+        return network, xchat.get_info('channel')
+
+    def add(self, nick):
+        users = self.channels.get(self.channel_key(), None)
+        if users is not None:
+            users.add(nick)
+
+    def clear(self, current=False):
+        """ Forget the sets for all channels, or only the current one.
+            They are built again when needed.
+        """
+        if current:
+            self.channels.pop(self.channel_key(), None)
+        else:
+            self.channels.clear()
+
+    def get(self):
+        """ Return the set of nicks for the current channel. """
+        key = self.channel_key()
+        users = self.channels.get(key, None)
+        if users is None:
+            users = {u.nick for u in xchat.get_list('users')}
+            self.channels[key] = users
+        return users
+
+    def remove(self, nick):
+        users = self.channels.get(self.channel_key(), None)
+        if users is not None:
+            users.discard(nick)
+
+    def rename(self, oldnick, newnick):
+        users = self.channels.get(self.channel_key(), None)
+        if (users is not None) and (oldnick in users):
+            users.discard(oldnick)
+            users.add(newnick)
+
+
+channel_users = ChannelUsers()
+
+
 def add_custom_pattern(cmdargs):
     """ Add a custom pattern to highlight/replace.
         Based on user arguments from --add command.
@@ -199,6 +257,64 @@ def add_custom_pattern(cmdargs):
     return None
 
 
+def benchmark_highlights(chan=None, repeat=3):
+    """ Time highlighting by replaying a channel's scrollback file,
+        using the cached user set and building a user list for every msg
+        (like xhighlights < 1.1 did).
+        The best time out of `repeat` runs is printed for each.
+    """
+    network = xchat.get_info('network') or xchat.get_info('server')
+    chan = chan or xchat.get_info('channel')
+    chanfile = os.path.join(
+        xchat.get_info('configdir'),
+        'scrollback',
+        network,
+        '{}.txt'.format(chan).replace('[', '{').replace(']', '}'))
+    try:
+        with open(chanfile, 'r') as f:
+            lines = f.readlines()
+    except EnvironmentError as ex:
+        print_error(
+            'Unable to open scrollback: {}'.format(chanfile),
+            exc=ex,
+            boldtext=chanfile)
+        return False
+    # Parse once, only the highlighting is timed.
+    msgs = []
+    for line in lines:
+        nick, msg = parse_scrollback_line(line)
+        if nick and msg:
+            msgs.append((nick, msg))
+    if not msgs:
+        print_error('No messages to replay in: {}'.format(chanfile))
+        return False
+
+    usernick = xchat.get_info('nick')
+
+    def replay(getusers):
+        starttime = time.time()
+        for nick, msg in msgs:
+            highlight_message(
+                msg,
+                getusers(),
+                usernick,
+                ownmsg=(nick == usernick))
+        return time.time() - starttime
+
+    timings = (
+        ('User set', channel_users.get),
+        ('User list', lambda: [u.nick for u in xchat.get_list('users')]),
+    )
+    print_status('Replayed {} msgs from: {}'.format(len(msgs), chanfile))
+    for label, getusers in timings:
+        duration = min(replay(getusers) for _ in range(repeat))
+        print('{:>9}: {:0.4f}s ({:0.2f}us per msg)'.format(
+            label,
+            duration,
+            (duration / len(msgs)) * 1000000))
+    return True
+
+
 def build_color_table():
     """ Builds a dict of {colorname: colorcode} and returns it. """
     start = ''
@@ -247,6 +363,7 @@ def cmd_xhighlights(word, word_eol, userdata):
     word, argd = get_flag_args(
         word, [
             ('-a', '--add', False),
+            ('-b', '--benchmark', False),
             ('-c', '--colors', False),
             ('-h', '--help', False),
             ('-l', '--link', False),
@@ -261,6 +378,11 @@ def cmd_xhighlights(word, word_eol, userdata):
         add_custom_pattern(cmdargsraw)
         return xchat.EAT_ALL
 
+    # Time highlighting with a channel's scrollback.
+    if argd['--benchmark']:
+        benchmark_highlights(cmdargsraw)
+        return xchat.EAT_ALL
+
     # Remove a custom pattern.
     if argd['--remove']:
         remove_custom_pattern(cmdargs)
@@ -520,6 +642,64 @@ def highlight_custom(word, patterninfo):
     return colorize(template.format(word))
 
 
+def highlight_message(msg, users, usernick, normalmsg=True, ownmsg=False):
+    """ Highlight links, nicks, and custom patterns in a message.
+        Arguments:
+            msg       : The actual message.
+            users     : Set of nicks in the channel.
+            usernick  : The users own nick.
+            normalmsg : False for 'Msg Hilight' events, where nicks are not
+                        highlighted.
+            ownmsg    : Whether this is the users own message.
+        Returns the highlighted message, or None if nothing was changed.
+    """
+    # Words in the actual message.
+    msgwords = msg.split(' ')
+    highlighted = False
+    for i, eachword in enumerate(msgwords):
+        # Nicks are matched before custom patterns change the word.
+        # Word is users own nick name?
+        ownnick = (eachword == usernick) or (eachword[:-1] == usernick)
+        # Word is any user name?
+        nickword = (eachword in users) or (eachword[:-1] in users)
+
+        # Custom patterns.
+        for custompat in Codes.custom:
+            if custompat['pattern'].match(eachword):
+                msgwords[i] = highlight_custom(eachword, custompat)
+                # Set eachword to the newly highlighted custom pattern
+                # If it was turned into a link, it will be highlighted.
+                eachword = msgwords[i]
+                highlighted = True
+                break
+
+        # Link highlighting
+        linkmatch = link_re.search(eachword)
+        if linkmatch is not None:
+            # Highlight it
+            msgwords[i] = highlight_word(
+                eachword,
+                'link',
+                ownmsg=ownmsg
+            )
+            highlighted = True
+            continue
+
+        # Nick highlighting
+        # (Don't highlight your own nick, thats for Channel Msg Hilight)
+        if (normalmsg and (not ownnick)) and nickword:
+            msgwords[i] = highlight_word(
+                eachword,
+                'nick',
+                ownmsg=ownmsg
+            )
+            highlighted = True
+
+    if highlighted:
+        return ' '.join(msgwords)
+    return None
+
+
 def highlight_word(s, style='link', ownmsg=False):
     """ Highlight a single word (string) in the prefferred style
         s:
@@ -607,70 +787,25 @@ def message_filter(word, word_eol, userdata):
         return xchat.EAT_NONE
     _log.debug('Filtering message type: {}'.format(userdata))
 
-    # Get list of nicks.
-    userslist = [u.nick for u in xchat.get_list('users')]
-
     # Get nick for message, and current users nick
-    msgnick = word[0]
-
-    # The actual message.
-    msg = word[1]
-    # Words in the actual message.
-    msgwords = msg.split(' ')
-    # Flag for when messsages are modified
-    # (otherwise we don't emit or EAT anything.)
-    highlighted = False
-
-    if userdata and ('Msg Hilight' in userdata):
-        normalmsg = False
-    else:
-        normalmsg = True
-
     usernick = (xchat.get_context()).get_info('nick')
     msgnick = remove_mirc_color(word[0])
     # Determine if this is the users own message
     # (changes highlight_word() settings)
     userownmsg = (usernick == msgnick)
 
-    for i, eachword in enumerate(msgwords):
-        # Word is users own nick name?
-        ownnick = (eachword == usernick) or (eachword[:-1] == usernick)
-        # Word is any user name?
-        nickword = (eachword in userslist) or (eachword[:-1] in userslist)
-
-        # Custom patterns.
-        for custompat in Codes.custom:
-            if custompat['pattern'].match(eachword):
-                msgwords[i] = highlight_custom(eachword, custompat)
-                # Set eachword to the newly highlighted custom pattern
-                # If it was turned into a link, it will be highlighted.
-                eachword = msgwords[i]
-                highlighted = True
-                break
-
-        # Link highlighting
-        linkmatch = link_re.search(eachword)
-        if linkmatch is not None:
-            # Highlight it
-            msgwords[i] = highlight_word(
-                eachword,
-                'link',
-                ownmsg=userownmsg
-            )
-            highlighted = True
-
-        # Nick highlighting
-        # (Don't highlight your own nick, thats for Channel Msg Hilight)
-        elif (normalmsg and (not ownnick)) and nickword:
-            msgwords[i] = highlight_word(
-                eachword,
-                'nick',
-                ownmsg=userownmsg
-            )
-            highlighted = True
-
-    # Replace old message.
-    word[1] = ' '.join(msgwords)
+    normalmsg = not (userdata and ('Msg Hilight' in userdata))
+    newmsg = highlight_message(
+        word[1],
+        channel_users.get(),
+        usernick,
+        normalmsg=normalmsg,
+        ownmsg=userownmsg)
+    # Flag for when messsages are modified
+    # (otherwise we don't emit or EAT anything.)
+    highlighted = newmsg is not None
+    if highlighted:
+        word[1] = newmsg
 
     # Print to the chat window.
     if highlighted:
@@ -683,6 +818,24 @@ def message_filter(word, word_eol, userdata):
         return xchat.EAT_NONE
 
 
+def parse_scrollback_line(line):
+    """ Parse a channel msg from an xchat scrollback file.
+        Returns (nick, msg), or (None, None) for other lines.
+    """
+    # Channel msgs look like: T <timestamp> <Nick>\tMessage
+    # ..with the nick wrapped in color/hidden codes.
+    parts = line.rstrip('\n').split(' ', 2)
+    if (len(parts) < 3) or (parts[0] != 'T'):
+        return None, None
+    nickpart, sep, msg = parts[2].partition('\t')
+    if not sep:
+        nickpart, sep, msg = parts[2].partition('> ')
+        if not sep:
+            return None, None
+    nick = remove_mirc_color(nickpart).strip('\x02\x08\x0f\x1d\x1f <>')
+    return (nick or None), (msg or None)
+
+
 def parse_styles(txt):
     """ Parses comma - separated styles. """
     return [s.strip() for s in txt.split(',')]
@@ -1014,6 +1167,34 @@ def set_style(userstyle, stylename=None, silent=False):
     return True
 
 
+def users_event(word, word_eol, userdata):
+    """ Keep the channel user sets up to date with join/part events.
+        Arguments:
+            word:
+                Print event data, the nick is first.
+            word_eol:
+                Not used.
+            userdata:
+                The event name.
+    """
+    if userdata == 'Join':
+        channel_users.add(word[0])
+    elif userdata in ('Part', 'Part with Reason', 'Quit'):
+        channel_users.remove(word[0])
+    elif userdata == 'Kick':
+        # Kicker, kicked nick, channel, reason.
+        channel_users.remove(word[1])
+    elif userdata in ('Change Nick', 'Your Nick Changing'):
+        channel_users.rename(word[0], word[1])
+    elif userdata in ('You Join', 'You Part', 'You Part with Reason',
+                      'You Kicked'):
+        # Rebuilt from the user list when needed.
+        channel_users.clear(current=True)
+    elif userdata in ('Connected', 'Disconnected'):
+        channel_users.clear()
+    return xchat.EAT_NONE
+
+
 def try_stylecodes(styles):
     """ Trys to retrieve multiple style codes, and returns a string
         containing them.
@@ -1057,6 +1238,7 @@ cmd_help = {
         'Usage: /XHIGHLIGHTS [-n [style] | -l [style]]\n'
         '       /XHIGHLIGHTS -a <pattern> <style> [template]\n'
         '       /XHIGHLIGHTS -r <index>\n'
+        '       /XHIGHLIGHTS -b [channel]\n'
         'Options:\n'
         '    -a p s t,--add p s t   : Add a custom pattern/word to\n'
         '                             highlight. Its needs a pattern or\n'
@@ -1068,6 +1250,9 @@ cmd_help = {
         '                             "http://google.com?q={}"\n'
         '                             If the { or } characters must be used,\n'
         '                             they should be doubled ({{ and }}).\n'
+        '    -b [chan],--benchmark  : Time highlighting by replaying the\n'
+        '                             scrollback for a channel, or the\n'
+        '                             current one.\n'
         '    -c,--colors            : Show available styles.\n'
         '    -h,--help              : Show this message.\n'
         '                             (and some debugging info)\n'
@@ -1148,6 +1333,20 @@ for eventname in ('Channel Message', 'Channel Msg Hilight', 'Your Message'):
     )
     _log.debug('Initially hooked event: {}'.format(eventhookname))
 
+for eventname in (
+        'Join', 'Part', 'Part with Reason', 'Quit', 'Kick', 'Change Nick',
+        'Your Nick Changing', 'You Join', 'You Part', 'You Part with Reason',
+        'You Kicked', 'Connected', 'Disconnected'):
+    eventhookname = 'users_event.{}'.format(
+        eventname.lower().replace(' ', '')
+    )
+    event_hooks[eventhookname] = xchat.hook_print(
+        eventname,
+        users_event,
+        userdata=eventname
+    )
+    _log.debug('Initially hooked event: {}'.format(eventhookname))
+
 
 # Print status
 print(color_text('blue', '{} loaded.'.format(VERSIONSTR)))
@@ -28,10 +28,11 @@ from datetime import datetime
 import os
 import re
 import sys
+import time
 from threading import Thread
 # XChat style version info.
 __module_name__ = 'xtools'
-__module_version__ = '0.3.8'
+__module_version__ = '0.3.9'
 __module_description__ = 'Various commands for extending HexChat or XChat...'
 # Convenience version str for help commands.
 VERSIONSTR = '{} v. {}'.format(__module_name__, __module_version__)
@@ -49,6 +50,83 @@ except ImportError:
         sys.exit(1)
 
 
+class PatternMatcher(object):
+
+    """ Searches a string with a whole dict of patterns at once.
+        The patterns come from a config dict like xtools.msg_catchers,
+        {text: {'index': 0, 'pattern': repattern}}, and are compiled into
+        one alternation so a message only needs one search().
+        Patterns that would change meaning when combined (back-references,
+        named groups, inline flags) are searched one at a time.
+        The matcher must be rebuilt when the dict changes,
+        see: build_matchers()
+    """
+    # Back-references, named back-references, and conditional groups.
+    backref_pat = re.compile(r'\\[1-9]|\(\?P=|\(\?\(')
+
+    def __init__(self, patterndict=None, combine=True):
+        self.combined = None
+        self.separate = []
+        # When False, every pattern is searched one at a time.
+        self.combine = combine
+        if patterndict:
+            self.build(patterndict)
+
+    def __bool__(self):
+        return (self.combined is not None) or bool(self.separate)
+
+    # Python 2 version of __bool__.
+    __nonzero__ = __bool__
+
+    def build(self, patterndict):
+        """ Compile the combined pattern from a config dict. """
+        combinable = []
+        self.separate = []
+        for patinfo in patterndict.values():
+            repat = patinfo['pattern']
+            if self.combine and self.is_combinable(repat):
+                combinable.append(repat.pattern)
+            else:
+                self.separate.append(repat)
+
+        self.combined = None
+        if not combinable:
+            return self
+        try:
+            self.combined = re.compile('|'.join(
+                '(?:{})'.format(p) for p in combinable
+            ))
+        except (re.error, OverflowError, RuntimeError):
+            # Too many groups, or something else the pieces didn't catch.
+            self.separate = [
+                patinfo['pattern'] for patinfo in patterndict.values()
+            ]
+        return self
+
+    @classmethod
+    def is_combinable(cls, repat):
+        """ Returns True if this compiled pattern can be safely joined with
+            others.
+        """
+        if repat.flags & ~re.UNICODE:
+            # Inline flags would apply to every pattern.
+            return False
+        if repat.groupindex:
+            # Names would clash with other patterns.
+            return False
+        # Group numbers shift when combined.
+        return cls.backref_pat.search(repat.pattern) is None
+
+    def search(self, s):
+        """ Returns True if any of the patterns match. """
+        if (self.combined is not None) and self.combined.search(s):
+            return True
+        for repat in self.separate:
+            if repat.search(s):
+                return True
+        return False
+
+
 class XToolsConfig(object):
 
     """ Class for global configuration and session-settings container """
@@ -79,6 +157,13 @@ class XToolsConfig(object):
         self.max_caught_msgs = 250
         self.caught_msgs = {}
         self.msg_filters = {'nicks': {}, 'filters': {}}
+        # Combined patterns for the lists above, see: build_matchers()
+        self.matchers = {
+            'catchers': PatternMatcher(),
+            'ignored': PatternMatcher(),
+            'nicks': PatternMatcher(),
+            'filters': PatternMatcher(),
+        }
         # When redirected, these are updated to be the latest maximum needed.
         self.format_settings = {'chanspace': 7, 'nickspace': 3}
 # Global settings/containers
@@ -491,10 +576,62 @@ def bool_mode(modestr):
     return mode
 
 
+def benchmark_filters(chan, repeat=3):
+    """ Time the msg filters by replaying a channel's scrollback file,
+        with the combined patterns and with one pattern at a time.
+        The best time out of `repeat` runs is printed for each.
+    """
+    chanfile = get_scrollback_file(chan)
+    try:
+        with open(chanfile, 'r') as fread:
+            lines = fread.readlines()
+    except (OSError, IOError) as exio:
+        print_error('Unable to open: {}'.format(chanfile),
+                    exc=exio,
+                    boldtext=chanfile)
+        return False
+
+    # Parse once, only the filters are timed.
+    msgs = []
+    for line in lines:
+        timedate, nick, text = parse_scrollback_line(line)
+        if (nick is None) or (text is None):
+            continue
+        msgs.append((nick, text.strip('@').strip()))
+    if not msgs:
+        print_error('No messages to replay in: {}'.format(chanfile),
+                    boldtext=chanfile)
+        return False
+
+    timings = []
+    for combine in (True, False):
+        besttime = None
+        for _ in range(repeat):
+            starttime = time.time()
+            counts = replay_msgs(msgs, combine=combine)
+            duration = time.time() - starttime
+            if (besttime is None) or (duration < besttime):
+                besttime = duration
+        timings.append(besttime)
+
+    print_status('Replayed {} msgs from: {}'.format(
+        colorstr('blue', counts['msgs'], bold=True),
+        chanfile))
+    print_status('Ignored: {ignored}, Caught: {caught}, '
+                 'Filtered: {filtered}'.format(**counts))
+    for label, duration in zip(('Combined', 'One at a time'), timings):
+        print_status('{:>13}: {:0.4f}s ({:0.2f}us per msg)'.format(
+            label,
+            duration,
+            (duration / counts['msgs']) * 1000000))
+    return True
+
+
 def build_catcher_indexes():
     """ Builds indexes for msg catchers. """
     for index, msg in enumerate(sorted(xtools.msg_catchers.keys())):
         xtools.msg_catchers[msg]['index'] = index
+    build_matchers('catchers')
 
 
 def build_filter_indexes():
@@ -502,12 +639,24 @@ def build_filter_indexes():
     for ftype in ('nicks', 'filters'):
         for index, msg in enumerate(sorted(xtools.msg_filters[ftype].keys())):
             xtools.msg_filters[ftype][msg]['index'] = index
+    build_matchers('nicks', 'filters')
 
 
 def build_ignored_indexes():
     """ Builds indexes for ignored nicks. """
     for index, nick in enumerate(sorted(xtools.ignored_nicks.keys())):
         xtools.ignored_nicks[nick]['index'] = index
+    build_matchers('ignored')
+
+
+def build_matchers(*names):
+    """ Rebuilds the combined patterns for message filtering.
+        Names are keys in xtools.matchers, all are rebuilt if none are
+        given.
+    """
+    patterndicts = get_pattern_dicts()
+    for name in (names or patterndicts):
+        xtools.matchers[name] = PatternMatcher(patterndicts[name])
 
 
 def build_color_table():
@@ -554,6 +703,7 @@ def clear_catchers():
         return False
 
     xtools.msg_catchers = {}
+    build_matchers('catchers')
     if save_catchers() and save_prefs():
         return True
     return False
@@ -578,6 +728,7 @@ def clear_filters(fornick=False):
         return False
 
     xtools.msg_filters[filtertype] = {}
+    build_matchers(filtertype)
     if save_filters() and save_prefs():
         return True
     return False
@@ -591,6 +742,7 @@ def clear_ignored_nicks():
         return False
 
     xtools.ignored_nicks = {}
+    build_matchers('ignored')
     if save_ignored_nicks() and save_prefs():
         return True
     return False
@@ -903,6 +1055,31 @@ def get_pref(opt):
     return None
 
 
+def get_pattern_dicts():
+    """ Returns the pattern config dicts used for xtools.matchers. """
+    return {
+        'catchers': xtools.msg_catchers,
+        'ignored': xtools.ignored_nicks,
+        'nicks': xtools.msg_filters['nicks'],
+        'filters': xtools.msg_filters['filters'],
+    }
+
+
+def get_scrollback_file(chan, network=None):
+    """ Returns the scrollback file name for a channel.
+        The current network is used if none is given.
+    """
+    if network is None:
+        network = xchat.get_info('network')
+    scrollbackbase = os.path.join(xtools.xchat_dir, 'scrollback', network)
+    chanfile = os.path.join(
+        os.path.expanduser(scrollbackbase),
+        '{}.txt'.format(chan))
+    if ('[' in chanfile) or (']' in chanfile):
+        chanfile = chanfile.replace(']', '}').replace('[', '{')
+    return chanfile
+
+
 def get_window(tabtitle, focus=True):
     """ Open a tab, and wait for it to be available.
         Returns the tab's context (unless it times out, then None)
@@ -955,16 +1132,13 @@ def indentlines(s, padding=8, maxlength=40):
 
 def is_filtered_msg(msginfo):
     """ Return True if the msg filters catch this message. """
-    nick = remove_mirc_color(msginfo['nick'])
-    for ftxt, nickfilter in xtools.msg_filters['nicks'].items():
-        if nickfilter['pattern'].search(nick):
+    if xtools.matchers['nicks']:
+        nick = remove_mirc_color(msginfo['nick'])
+        if xtools.matchers['nicks'].search(nick):
             return True
 
-    for ftxt, msgfilter in xtools.msg_filters['filters'].items():
-        if msgfilter['pattern'].search(msginfo['msg']):
-            return True
-    # Passed
-    return False
+    # Passed if the msg filters don't match.
+    return xtools.matchers['filters'].search(msginfo['msg'])
 
 
 def load_catchers():
@@ -1093,6 +1267,26 @@ def longest(lst):
     return len(max(lst, key=len))
 
 
+def match_chanmsg(msgnick, msg):
+    """ Find the ignored-nick or msg-catcher pattern for a channel msg.
+        The combined patterns rule out most msgs with a single search,
+        the patterns are only searched one by one to get the match.
+        Returns:
+            ('ignore', match), ('catch', match), or (None, None)
+    """
+    if xtools.matchers['ignored'].search(msgnick):
+        nickmatch = search_patterns(xtools.ignored_nicks, msgnick)
+        if nickmatch:
+            return 'ignore', nickmatch
+
+    if xtools.matchers['catchers'].search(msg):
+        msgmatch = search_patterns(xtools.msg_catchers, msg)
+        if msgmatch:
+            return 'catch', msgmatch
+
+    return None, None
+
+
 def parse_scrollback_line(line):
     """ Parses info out of a xchat scrollback.txt.
         Returns:
@@ -1803,6 +1997,37 @@ def remove_mirc_color(text):
     return text
 
 
+def replay_msgs(msgs, combine=True):
+    """ Run (nick, msg) tuples through the msg filters, like
+        filter_chanmsg would, without saving or ignoring anything.
+        If combine is False, all patterns are searched one at a time.
+        Returns a dict of counts:
+            {'msgs': 0, 'ignored': 0, 'caught': 0, 'filtered': 0}
+    """
+    counts = {'msgs': 0, 'ignored': 0, 'caught': 0, 'filtered': 0}
+    if not combine:
+        matchers = xtools.matchers
+        xtools.matchers = {
+            name: PatternMatcher(patterndict, combine=False)
+            for name, patterndict in get_pattern_dicts().items()
+        }
+    try:
+        for nick, msg in msgs:
+            counts['msgs'] += 1
+            action, match = match_chanmsg(nick, msg)
+            if action == 'ignore':
+                counts['ignored'] += 1
+            elif action == 'catch':
+                if is_filtered_msg({'nick': nick, 'msg': msg}):
+                    counts['filtered'] += 1
+                else:
+                    counts['caught'] += 1
+    finally:
+        if not combine:
+            xtools.matchers = matchers
+    return counts
+
+
 def save_catchers():
     """ Save msg-catchers in preferences. """
 
@@ -1866,6 +2091,18 @@ def save_prefs():
         return False
 
 
+def search_patterns(patterndict, s):
+    """ Search a string with each pattern in a config dict
+        (like xtools.msg_catchers), one at a time.
+        Returns the first match, or None.
+    """
+    for patinfo in patterndict.values():
+        match = patinfo['pattern'].search(s)
+        if match:
+            return match
+    return None
+
+
 def toggle_redirect_msgs(newtab=False):
     """ Toggle the 'redirect_msgs' setting,
         print it's status (to the xtools tab if newtab=True)
@@ -2203,11 +2440,7 @@ def cmd_findtext(word, word_eol, userdata=None):  # noqa
     for chan in channelnames:
         # Open chan file
         chandata = []
-        chanfile = os.path.join(scrollbackdir, '{}.txt'.format(chan))
-
-        if ('[' in chanfile) or (']' in chanfile):
-            chanfile = chanfile.replace(']', '}').replace('[', '{')
-
+        chanfile = get_scrollback_file(chan, network=network)
         if os.path.isfile(chanfile):
             try:
                 with open(chanfile, 'r') as fread:
@@ -2601,6 +2834,7 @@ def cmd_xtools(word, word_eol, userdata=None):
     """ Shows info about xtools. """
 
     cmdname, cmdargs, argd = get_cmd_args(word_eol, (('-v', '--version'),
+                                                     ('-b', '--benchmark'),
                                                      ('-d', '--desc'),
                                                      ('-h', '--help'),
                                                      ('-cd', '--colordemo'),
@@ -2610,6 +2844,12 @@ def cmd_xtools(word, word_eol, userdata=None):
         print_version()
         return xchat.EAT_ALL
 
+    # Time the msg filters with a channel's scrollback.
+    elif argd['--benchmark']:
+        chan = cmdargs or xchat.get_context().get_info('channel')
+        benchmark_filters(chan)
+        return xchat.EAT_ALL
+
     # Command description or descriptions.
     elif argd['--desc']:
         print_cmddesc(cmdargs)
@@ -2633,35 +2873,27 @@ def cmd_xtools(word, word_eol, userdata=None):
 def filter_chanmsg(word, word_eol, userdata=None):
     """ Filter Channel Messages. """
 
-    # Ignoring messages is easy, just save it and return EAT_ALL.
     msgnick = word[0]
     msg = ' '.join(word[1:]).strip('@').strip()
-    for nickkey in xtools.ignored_nicks.keys():
-        nickpat = xtools.ignored_nicks[nickkey]['pattern']
-        nickmatch = nickpat.search(msgnick)
-        if nickmatch:
-            # Ignore this message.
-            add_message(xtools.ignored_msgs.append,
-                        msgnick,
-                        msg,
-                        msgtype=userdata,
-                        matchlist=nickmatch.groups() or [nickmatch.group()],
-                        filtertype='nick')
-            return xchat.EAT_ALL
-
-    # Caught msgs, needs add_caught_msg because of other scripts emitting
-    # duplicate msgs. The add_caught_msg function handles this.
-    for catchmsg in xtools.msg_catchers.keys():
-        msgpat = xtools.msg_catchers[catchmsg]['pattern']
-        msgmatch = msgpat.search(msg)
-        if msgmatch:
-            add_message(add_caught_msg,
-                        msgnick,
-                        msg,
-                        msgtype=userdata,
-                        matchlist=msgmatch.groups() or [msgmatch.group()],
-                        filtertype='nick')
-            return xchat.EAT_NONE
+    action, match = match_chanmsg(msgnick, msg)
+    if action == 'ignore':
+        # Ignoring messages is easy, just save it and return EAT_ALL.
+        add_message(xtools.ignored_msgs.append,
+                    msgnick,
+                    msg,
+                    msgtype=userdata,
+                    matchlist=match.groups() or [match.group()],
+                    filtertype='nick')
+        return xchat.EAT_ALL
+    elif action == 'catch':
+        # Caught msgs, needs add_caught_msg because of other scripts
+        # emitting duplicate msgs. The add_caught_msg function handles this.
+        add_message(add_caught_msg,
+                    msgnick,
+                    msg,
+                    msgtype=userdata,
+                    matchlist=match.groups() or [match.group()],
+                    filtertype='nick')
     # Nothing will be done to this message.
     return xchat.EAT_NONE
 
@@ -2866,9 +3098,14 @@ commands = {
         'enabled': True,
         'help': (
             'Usage: /XTOOLS [-v] | [[-d | -h] <cmdname>]\n'
+            '       /XTOOLS -b [channel]\n'
             'Options:\n'
             '    <cmdname>               : Show help for a command.\n'
             '                              (same as /help cmdname)\n'
+            '    -b [chan],--benchmark [chan]\n'
+            '                            : Time the msg filters by\n'
+            '                              replaying the scrollback for a\n'
+            '                              channel, or the current one.\n'
             '    -d [cmd],--desc [cmd]   : Show description for a command,\n'
             '                              or all commands.\n'
             '    -h [cmd],--help [cmd]   : Show help for a command,\n'
@@ -0,0 +1,228 @@
+""" Welborn Productions - Projects - Catalog
+    An in-process catalog of enabled projects, for routing and
+    'did you mean' matches without querying/scanning the projects table.
+
+    The catalog holds alias, name, and id maps, the sorted menu list, and
+    a trigram index over the searchable strings (name, alias, description,
+    and id). It is rebuilt when the catalog generation changes. Saving or
+    deleting a wp_project starts a new generation in the shared cache, so
+    every process picks up the change on its next request. Saves that only
+    update view/download counters are ignored.
+
+    Projects in the catalog are shared between requests, and must not be
+    modified.
+"""
+import logging
+import threading
+import time
+
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+
+from projects.models import wp_project
+
+log = logging.getLogger('wp.projects.catalog')
+
+# Cache key for the catalog generation.
+GENERATION_KEY = 'wp_projects.catalog.generation'
+# Fields that are updated on every view/download. Saving only these
+# doesn't change anything the catalog uses.
+COUNTER_FIELDS = frozenset(('download_count', 'view_count'))
+# Length for each n-gram in the search index.
+NGRAM_SIZE = 3
+# Last generation seen by this process, for when the cache can't hold it.
+_generation = None
+
+
+def get_catalog():
+    """ Return the ProjectCatalog for the current generation, rebuilding
+        it if any project has changed.
+    """
+    return CATALOG.current()
+
+
+def get_generation():
+    """ Return the current catalog generation. When the cache can't hold
+        it (DummyCache, or an evicted key), the last generation this
+        process knows about is used and stored again.
+    """
+    global _generation
+    generation = cache.get(GENERATION_KEY)
+    if generation is not None:
+        _generation = generation
+        return generation
+    if _generation is None:
+        return invalidate()
+    cache.add(GENERATION_KEY, _generation, None)
+    return _generation
+
+
+def invalidate(**kwargs):
+    """ Start a new catalog generation. This is a signal receiver. """
+    global _generation
+    _generation = '{}'.format(time.time())
+    cache.set(GENERATION_KEY, _generation, None)
+    return _generation
+
+
+def iter_ngrams(s, size=NGRAM_SIZE):
+    """ Yield all n-grams of `size` from a string. """
+    for i in range(len(s) - size + 1):
+        yield s[i:i + size]
+
+
+def match_items(query, items):
+    """ Does 'if query in item or item in query' for each
+        item in items.
+        Ex:
+            matched = match_items('test', ('testing', 'es', 'blah'))
+            # Returns True on 'testing', but would also return true on 'es'
+            # because 'test' is in 'testing', and 'es' is in 'test'.
+    """
+    for item in items:
+        if (query in item) or (item in query):
+            return True
+    return False
+
+
+def project_saved(update_fields=None, **kwargs):
+    """ Start a new catalog generation when a project is saved, unless
+        only view/download counters were updated. This is a signal receiver.
+    """
+    if update_fields and (set(update_fields) <= COUNTER_FIELDS):
+        return None
+    return invalidate()
+
+
+def searchable_strings(project):
+    """ Return the lowered, trimmed strings to search for a project. """
+    return (
+        project.name.lower().replace(' ', ''),
+        project.alias.lower(),
+        project.description.lower().replace(' ', ''),
+        str(project.id)
+    )
+
+
+class ProjectCatalog(object):
+    """ Lookup maps and a search index for a list of enabled projects. """
+
+    def __init__(self, projects, generation=None):
+        self.generation = generation
+        # Projects for the vertical menu, sorted by name.
+        self.projects = sorted(projects, key=lambda p: p.name)
+        self.by_alias = {}
+        self.by_id = {}
+        self.by_name = {}
+        self.by_trimmed_name = {}
+        # Searchable strings, by project id.
+        self.searchable = {}
+        # {ngram: set(project_id, ...)}
+        self.ngrams = {}
+        # Ids for projects with strings too short to have n-grams.
+        self.short = set()
+        for p in self.projects:
+            self.by_alias.setdefault(p.alias, p)
+            self.by_id[p.id] = p
+            self.by_name.setdefault(p.name, p)
+            self.by_trimmed_name.setdefault(
+                p.name.lower().replace(' ', ''),
+                p
+            )
+            strings = searchable_strings(p)
+            self.searchable[p.id] = strings
+            for s in strings:
+                if len(s) < NGRAM_SIZE:
+                    self.short.add(p.id)
+                for ngram in iter_ngrams(s):
+                    self.ngrams.setdefault(ngram, set()).add(p.id)
+
+    def __len__(self):
+        return len(self.projects)
+
+    def get_byalias(self, alias):
+        return self.by_alias.get(alias, None)
+
+    def get_byid(self, _id):
+        try:
+            return self.by_id.get(int(_id), None)
+        except (TypeError, ValueError):
+            return None
+
+    def get_byname(self, name):
+        """ Get a project by exact name, or by the lowered name without
+            spaces.
+        """
+        proj = self.by_name.get(name, None)
+        if proj is not None:
+            return proj
+        return self.by_trimmed_name.get(name.lower().replace(' ', ''), None)
+
+    def search(self, identifiers):
+        """ Returns a set of projects where any word in `identifiers` is in
+            one of the searchable strings, or one of the strings is in the
+            word.
+        """
+        matches = set()
+        for word in identifiers:
+            searchword = str(word).lower()
+            for pid in self.search_candidates(searchword):
+                if match_items(searchword, self.searchable[pid]):
+                    matches.add(self.by_id[pid])
+        return matches
+
+    def search_candidates(self, searchword):
+        """ Return project ids that may match `searchword`, using the
+            n-gram index. Any match shares at least one n-gram with the
+            word, unless the word (or one of the strings) is too short.
+        """
+        if len(searchword) < NGRAM_SIZE:
+            # Not enough to use the index.
+            return self.by_id.keys()
+        candidates = set(self.short)
+        for ngram in iter_ngrams(searchword):
+            candidates.update(self.ngrams.get(ngram, ()))
+        return candidates
+
+
+class CatalogHolder(object):
+    """ Holds the ProjectCatalog for this process, and rebuilds it when
+        the generation changes.
+    """
+
+    def __init__(self):
+        self.catalog = None
+        self.lock = threading.Lock()
+
+    def current(self):
+        generation = get_generation()
+        catalog = self.catalog
+        if (catalog is not None) and (catalog.generation == generation):
+            return catalog
+        with self.lock:
+            if (self.catalog is None) or (
+                    self.catalog.generation != generation):
+                self.catalog = ProjectCatalog(
+                    wp_project.objects.filter(disabled=False),
+                    generation=generation
+                )
+                log.debug('Built project catalog: {} projects'.format(
+                    len(self.catalog)
+                ))
+            return self.catalog
+
+
+CATALOG = CatalogHolder()
+
+post_save.connect(
+    project_saved,
+    sender=wp_project,
+    weak=False,
+    dispatch_uid='wp_projects.catalog.save'
+)
+post_delete.connect(
+    invalidate,
+    sender=wp_project,
+    weak=False,
+    dispatch_uid='wp_projects.catalog.delete'
+)
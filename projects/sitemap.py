@@ -0,0 +1,21 @@
+""" Welborn Productions - Projects - Sitemap
+    Provides sitemap urls for the sitemaps module.
+"""
+from projects.models import wp_project
+from wp_main.sitemaps.sitemaps import SitemapUrl
+
+# Saving/deleting these invalidates the cached sitemap for this app.
+models = (wp_project, )
+
+
+def build_urls(protocol, domain):
+    """ Yields SitemapUrl()s for all project pages. """
+    for proj in wp_project.objects.filter(disabled=False).order_by('name'):
+        yield SitemapUrl(
+            rel_location='/projects/{}'.format(proj.alias),
+            protocol=protocol,
+            domain=domain,
+            changefreq='monthly',
+            lastmod=str(proj.publish_date),
+            priority='0.9'
+        )
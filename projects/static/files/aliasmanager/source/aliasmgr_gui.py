@@ -35,6 +35,8 @@ class winMain():
             os.path.join(sys.path[0], "aliasmgr_main.glade"))
         # File data
         self.lst_data = None
+        # Parsed alias file (amutil.AliasFile()) that lst_data came from.
+        self.aliasmodel = None
 
         # Currently selected itm
         self.selname = None
@@ -1002,135 +1004,19 @@ class winMain():
         if sfilename is None:
             sfilename = settings.get("aliasfile")
         self.printlog("save_file: saving to: " + sfilename)
-        # list for header
-        lst_header = []
-        # Setup shell script
-        lst_header.append("#!/bin/bash\n\n")
-        lst_header.append(
-            "# Generated by " + settings.name + " " + settings.version + '\n')
-        lst_header.append("# -Christopher Welborn\n\n")
-        lst_header.append("# Note to user:\n" +
-                          "#     If you must edit this file manually please stick to this style:\n" +
-                          "#         Use tabs, not spaces.\n" +
-                          "#         No tabs before definitons.\n" +
-                          "#         Seperate lines for curly braces.\n" +
-                          "#         Use 1 tab depth for start of code block in functions.\n" +
-                          "#         Function description is first comment in code block. \n" +
-                          "#         Alias description is comment right side of alias definition.\n" +
-                          "#         \n" +
-                          "#     ...if you use a different style it may or may not\n" +
-                          "#        break the program and I can't help you.\n\n")
 
-        # Write Definitions, Cycle thru main data list
-        # lst_lines.append("\n# Definitions:\n")
-
-        # List for aliases (put'em at the top of the file)
-        lst_aliases = []
-        # List for functions (put'em after aliases)
-        lst_functions = []
-        # List for exports (put at bottom of file)
-        lst_exports = []
-
-        # Cycle thru items in treeAliases (alphabetical already)
-        # This extra step makes the functions print in alphbetical order
-        # ...aliases and exports don't need this method, a simple sorted(set()) works
-        # because they are single lines. multiline functions can't be sorted
-        # like that.
-        treeitm = self.listAliases.get_iter_first()
-        while (treeitm is not None):
-            # Get value for this item
-            treeval = amutil.trim_markup(
-                self.listAliases.get_value(treeitm, 0))
-            # try to get next item
-            treeitm = self.listAliases.iter_next(treeitm)
-
-            # Search data list for this item, and save data to appropriate
-            # list.
-            for itm in self.lst_data:
-                # Name for alias/function
-                sname = itm.name
-                # Match tree name with data name, and retrieve it's info...
-                if treeval == sname:
-                    # Set type based on command length
-                    if len(itm.cmd) > 1:
-                        bfunction = True
-                    else:
-                        bfunction = False
-
-                    # Comments?
-                    scomment = itm.comment
-                    # Append comment char if needed
-                    if (len(scomment) > 0):
-                        if not scomment.startswith("#"):
-                            scomment = "# " + scomment
-                    # WRITE FUNCTION ITEM
-                    if bfunction:
-                        lst_functions.append("\nfunction " + sname + "()\n")
-                        lst_functions.append("{\n")
-                        # comment given?
-                        if len(scomment) > 0:
-                            lst_functions.append('\t' + scomment + '\n')
-                        # Write command section
-                        for scmdline in itm.cmd:
-                            lst_functions.append('\t' + scmdline + '\n')
-                        lst_functions.append("}\n")
-                    else:
-                        # WRITE ALIAS ITEM
-                        # Fix quotes around command
-                        if '"' in itm.cmd[0]:
-                            scmd = "'" + itm.cmd[0] + "'"
-                        else:
-                            scmd = '"' + itm.cmd[0] + '"'
-                        # Comment given?
-                        if len(scomment) > 0:
-                            scmd = scmd + " " + scomment
-                        lst_aliases.append(
-                            "alias " + sname + "=" + scmd + '\n')
-
-        # Save Exports, cycle thru main data list
-        # lst_lines.append("\n# Exports\n")
-        for itm in self.lst_data:
-            if (itm.exported.lower() == "yes"):
-                lst_exports.append("export " + itm.name + '\n')
-
-        # Finished creating, show what we've got
-        # self.printlog("----Generated File:----")
-        # for itm in lst_lines:
-        #    self.printlog(itm)
-        # self.printlog("----END OF FILE----\n")
-
-        # Sort lines
-        lst_aliases = sorted(set(lst_aliases))
-        lst_exports = sorted(set(lst_exports))
-
-        # Write file
-        # save temp file to home dir
-        aliasfiletmp = os.path.join(integrator.home, ".aliasmanager.tmp")
-
-        btmp = False  # @UnusedVariable
-        with open(aliasfiletmp, 'w') as fwrite:
-            fwrite.writelines(lst_header)
-            fwrite.write("\n\n# Aliases:\n")
-            fwrite.writelines(lst_aliases)
-            fwrite.write("\n# Functions:")
-            fwrite.writelines(lst_functions)
-            fwrite.write("\n# Exports:\n")
-            fwrite.writelines(lst_exports)
-            # add new line because its a shell script, needs to end with \n
-            fwrite.write('\n')
-            # self.printlog("Temporary file written: " + aliasfiletmp)
-            btmp = True
-
-        if not btmp:
-            self.stat_text("Unable to write temp file: " +
-                           amutil.filename_safe(aliasfiletmp))
-            self.printlog("Unable to write temp file: " +
-                          aliasfiletmp)
-            # Temp file didn't write, there is no reason to continue.
-            return False
+        aliasmodel = self.aliasmodel
+        if aliasmodel is None:
+            # No file was loaded, start a new one.
+            aliasmodel = amutil.AliasFile(
+                sfilename,
+                contents=self.new_file_header())
+            self.aliasmodel = aliasmodel
 
-        # chmod for tmp file (probably not needed, it doesn't do anything)
-        # os.system("chmod a+rwx " + aliasfiletmp)
+        # Patch added/removed/edited items into the file, everything else
+        # is left alone.
+        patches = aliasmodel.sync(self.lst_data)
+        self.printlog("save_file: patched items: " + str(patches))
 
         try:
             # Backup destination file if it doesn't exist
@@ -1138,17 +1024,16 @@ class winMain():
                     (not os.path.isfile(sfilename + "~"))):
                 os.system("cp " + sfilename + " " + sfilename + "~")
                 self.printlog("Backup created.")
-            # Copy temp file to destination,,,
-            os.system("cp " + aliasfiletmp + " " + sfilename)
-        except Exception as ex:
-            self.stat_settext("Unable to copy to destination: " +
+            if aliasmodel.write(sfilename):
+                self.printlog("Alias file written: " + sfilename)
+            else:
+                self.printlog("Alias file is unchanged: " + sfilename)
+        except (IOError, OSError) as ex:
+            self.stat_settext("Unable to write to destination: " +
                               amutil.filename_safe(sfilename))
-            self.printlog("Unable to copy to destination!")
+            self.printlog("Unable to write to destination!")
             self.printlog("Error: " + str(ex))
             return False
-            dlg.msgbox("Unable to copy to destination: " +
-                       amutil.filename_safe(sfilename), dlg.error)
-        self.printlog("Temp file copied to destination: " + sfilename)
 
         # chmod +x if needed
         schmod_result = amutil.chmod_file(sfilename)
@@ -1157,6 +1042,28 @@ class winMain():
         # Success
         return True
 
+    def new_file_header(self):
+        """ Header for new alias files. """
+        # list for header
+        lst_header = []
+        # Setup shell script
+        lst_header.append("#!/bin/bash\n\n")
+        lst_header.append(
+            "# Generated by " + settings.name + " " + settings.version + '\n')
+        lst_header.append("# -Christopher Welborn\n\n")
+        lst_header.append("# Note to user:\n" +
+                          "#     If you must edit this file manually please stick to this style:\n" +
+                          "#         Use tabs, not spaces.\n" +
+                          "#         No tabs before definitons.\n" +
+                          "#         Seperate lines for curly braces.\n" +
+                          "#         Use 1 tab depth for start of code block in functions.\n" +
+                          "#         Function description is first comment in code block. \n" +
+                          "#         Alias description is comment right side of alias definition.\n" +
+                          "#         \n" +
+                          "#     ...if you use a different style it may or may not\n" +
+                          "#        break the program and I can't help you.\n\n")
+        return ''.join(lst_header)
+
     def load_aliases(self, from_file=True):
         """ Load aliases into treeview using correct markup """
 
@@ -1166,6 +1073,7 @@ class winMain():
         # Get file contents aliases/functions, fix Export info
         if from_file:
             self.lst_data = amutil.readfile()
+            self.aliasmodel = amutil.get_aliasfile()
 
         # failed to load list
         if not self.lst_data:
@@ -9,6 +9,7 @@ import re
 import gtk
 import os
 import sys
+from collections import OrderedDict
 import aliasmgr_integrator
 import aliasmgr_settings
 # For changing file mode when scripts are generated.
@@ -19,6 +20,15 @@ S_RWX = S_IREAD | S_IWRITE | S_IEXEC
 settings = aliasmgr_settings.am_settings()
 integrator = aliasmgr_integrator.am_integrator()
 
+# Alias definitions, this one handles quotes inside of commands better...
+alias_pat = re.compile(r'alias[ ]?(?P<name>[\d\w_\-]+)=(?P<cmdinfo>.+)')
+cmd_comment_pat = re.compile(r'(?P<command>.+)[#](?P<comment>.+)?')
+cmd_nocomment_pat = re.compile(r'(?P<command>.+)')
+export_pat = re.compile(r'export[ ]+?(?P<export>.+)', flags=re.MULTILINE)
+
+# AliasFile()s that have been loaded, by file name.
+aliasfiles = {}
+
 
 # Command/Alias Object ------------------------------------
 class Command():
@@ -290,6 +300,637 @@ class Dialogs():
         self.msgwindow.destroy()
         return response
 
+# Alias File Model ----------------------------------------
+
+
+class Definition(object):
+
+    """ An alias or function definition in an AliasFile().
+        The definition starts at `line` (set when the AliasFile() index
+        is built), and spans `length` lines.
+        `saved` holds the values that were parsed from the file, so edits
+        to the Command() can be detected.
+    """
+    __slots__ = ('kind', 'command', 'length', 'line', 'saved')
+
+    def __init__(self, kind, command, length=1):
+        self.kind = kind
+        self.command = command
+        self.length = length
+        self.line = None
+        self.saved = command_values(command)
+
+    def __repr__(self):
+        return 'Definition({!r}, {!r}, line={}, length={})'.format(
+            self.kind,
+            self.saved[0],
+            self.line,
+            self.length)
+
+    def changed(self):
+        """ Returns True if the Command() has been edited since it was
+            parsed (not counting the exported value).
+        """
+        return command_values(self.command)[:3] != self.saved[:3]
+
+    def edited(self):
+        """ Returns True if any Command() value has been edited. """
+        return command_values(self.command) != self.saved
+
+    def revert(self):
+        """ Set the Command() values back to the parsed values. """
+        name, cmd, comment, exported = self.saved
+        self.command.name = name
+        self.command.cmd = list(cmd)
+        self.command.comment = comment
+        self.command.exported = exported
+
+    def span(self):
+        """ Returns (start, end) line numbers for this definition. """
+        return self.line, self.line + self.length
+
+    def update(self, values):
+        """ Set new parsed values. The Command() is only updated if it
+            hasn't been edited, so edits are not lost.
+        """
+        edited = self.edited()
+        self.saved = values
+        if not edited:
+            self.revert()
+
+    def use_command(self, old):
+        """ Keep the Command() from an older Definition() for the same
+            alias/function, so Command()s handed out by get_commands()
+            are still known after the lines are parsed again.
+        """
+        values = self.saved
+        self.command = old.command
+        self.saved = old.saved
+        self.update(values)
+
+
+class AliasLine(object):
+
+    """ Parse info for a single line in an AliasFile(). """
+    __slots__ = (
+        'alias',
+        'defword',
+        'export',
+        'function',
+        'inside',
+        'open')
+
+    def __init__(self):
+        # Definition() for an alias on this line.
+        self.alias = None
+        # 'alias' or 'function', if the line starts with it.
+        self.defword = None
+        # Exported name on this line.
+        self.export = None
+        # Definition() for a function starting on this line.
+        self.function = None
+        # Whether this line is part of a function.
+        self.inside = False
+        # Whether a function is still open after this line.
+        self.open = False
+
+
+class AliasParser(object):
+
+    """ Parses alias file lines one at a time, keeping the function state
+        between lines, and returns an AliasLine() for each one.
+    """
+
+    def __init__(self, lineno=0, tabdepth=0):
+        # Line number for the next line.
+        self.lineno = lineno
+        # Tab depth for functions, set by the first indented function.
+        self.tabdepth = tabdepth
+        # Line number where the tab depth was set.
+        self.tabline = None
+        self.reset()
+
+    def reset(self):
+        """ Reset the function state. """
+        # Flag for setting if we are inside a function
+        self.bfunction = False
+        # Flag for setting if we found function comments
+        self.bcomment = False
+        self.scomment = ''
+        self.sname = ''
+        # Temporary list for raw function contents
+        self.lst_contents = []
+        # AliasLine() where the current function started.
+        self.startinfo = None
+        self.startline = None
+
+    def parse_line(self, line):
+        """ Parse a single line, returning an AliasLine(). """
+        sline = line[:-1] if line.endswith('\n') else line
+        info = AliasLine()
+        if sline.startswith('alias'):
+            info.defword = 'alias'
+        elif sline.startswith('function'):
+            info.defword = 'function'
+
+        if 'alias' in sline:
+            for name, rawcmd in alias_pat.findall(sline):
+                info.alias = Definition('alias', parse_alias(name, rawcmd))
+        if 'export' in sline:
+            for export in export_pat.findall(sline):
+                info.export = stripchars(export, ' \t\n')
+
+        self.parse_function_line(sline, info)
+        self.lineno += 1
+        return info
+
+    def parse_function_line(self, sline, info):
+        """ Feed a line to the function state, setting info.function when
+            a function is finished.
+        """
+        # Leading whitespace is skipped for the function/comment checks.
+        # This is cheaper than removing all tabs/spaces from the line.
+        slstrip = sline.lstrip('\t ')
+        # Detect Function -------------------------------
+        if (slstrip.startswith('f') and
+                slstrip.replace('\t', '').replace(' ', '').startswith(
+                    "function")):
+            # Grab function name
+            ssplit = sline.split(" ")
+            self.sname = ssplit[1].replace('\n', '').replace("()", "")
+
+            # Find initial tab depth
+            if self.tabdepth == 0:
+                if sline.startswith('\t'):
+                    self.tabdepth, _ = trimcount(sline, '\t')
+                    self.tabline = self.lineno
+
+            # We are now inside a function
+            if not self.bfunction:
+                self.startinfo = info
+                self.startline = self.lineno
+            self.bfunction = True
+
+        if not self.bfunction:
+            return
+
+        # Inside Function ----------------------------------
+        info.inside = True
+        # Detect comment
+        if slstrip.startswith("#"):
+            # First comment only
+            if not self.bcomment:
+                # Found comment
+                scomment = sline.replace('\t', '').replace('\n', '')[1:]
+                self.scomment = scomment.strip(' ')
+                self.bcomment = True
+
+        # Add raw contents (lines have no newlines here)
+        # Skip over function definition if multi-line function
+        if not sline.rstrip(" ").endswith("()"):
+            self.lst_contents.append(sline)
+
+        # Found end of function (could be a single line though)
+        if (sline.strip().endswith(" }")) or (slstrip.rstrip('\t ') == "}"):
+            cmd = Command(
+                name=self.sname,
+                cmd=parse_function_contents(
+                    self.lst_contents,
+                    self.scomment,
+                    self.tabdepth),
+                comment=self.scomment,
+                exported='No')
+            self.startinfo.function = Definition(
+                'function',
+                cmd,
+                length=(self.lineno - self.startline) + 1)
+            self.reset()
+        else:
+            info.open = True
+
+    def parse_lines(self, lines):
+        """ Parse several lines, returning a list of AliasLine()s. """
+        return [self.parse_line(line) for line in lines]
+
+
+class AliasFile(object):
+
+    """ An indexed model of an alias file, built in a single pass.
+        Each line has an AliasLine() with the alias, function, and export
+        info found there, and definitions are indexed by name with their
+        line spans.
+        When lines change, only the changed region is parsed again, and
+        edited Command()s can be patched into the file without touching
+        the other lines.
+        Usage:
+            aliasfile = AliasFile('myaliases.sh', contents)
+            cmds = aliasfile.get_commands()
+            cmds[0].cmd = ['ls -a']
+            aliasfile.sync(cmds)
+            aliasfile.write()
+    """
+
+    def __init__(self, filename=None, contents=None):
+        self.filename = filename
+        # Raw lines, with line endings.
+        self.lines = []
+        # AliasLine() for each line.
+        self.info = []
+        # Number of lines starting with 'alias' or 'function'.
+        self.counts = {'alias': 0, 'function': 0}
+        # Tab depth for functions, and the line number that set it.
+        self.tabdepth = 0
+        self.tabline = None
+        # Whether the lines have changed since they were read/written.
+        self.dirty = False
+        # File size and modification time when the file was read/written.
+        self.filestat = None
+        # Name index, rebuilt when needed.
+        self._index = None
+        # Definition()s by Command() id, rebuilt when needed.
+        self._commands = None
+        if contents is not None:
+            self.set_contents(contents)
+
+    def __len__(self):
+        return len(self.lines)
+
+    def changed(self):
+        """ Returns True if the file has changed since it was read/written,
+            or if it has been patched without being written.
+        """
+        return self.dirty or (self.filestat != get_filestat(self.filename))
+
+    def find(self, command):
+        """ Return the Definition() for a Command() from get_commands(),
+            or None if it's not in this file.
+        """
+        return self.update_lines_index().get(id(command), None)
+
+    def get(self, name):
+        """ Return the Command() for an alias/function name, or None. """
+        definition = self.get_index().get(name, None)
+        return None if definition is None else definition.command
+
+    def get_aliases(self):
+        """ Return all alias Command()s, in file order. """
+        return [info.alias.command for info in self.info if info.alias]
+
+    def get_commands(self):
+        """ Return all aliases and then all functions, as Command()s. """
+        return self.get_aliases() + self.get_functions()
+
+    def get_def_count(self, defword):
+        """ Return the number of lines starting with 'alias' or 'function'.
+        """
+        return self.counts[defword]
+
+    def get_exports(self):
+        """ Return all exported names, in file order. """
+        return [info.export for info in self.info if info.export is not None]
+
+    def get_functions(self):
+        """ Return all function Command()s, in file order. """
+        return [info.function.command for info in self.info if info.function]
+
+    def get_index(self):
+        """ Return an OrderedDict of {name: Definition()} in file order,
+            where later definitions win (like bash).
+        """
+        if self._index is not None:
+            return self._index
+        index = OrderedDict()
+        for definition in self.iter_definitions():
+            index.pop(definition.saved[0], None)
+            index[definition.saved[0]] = definition
+        self._index = index
+        return index
+
+    def insert_line(self, kind):
+        """ Return the line number where a new alias, function, or export
+            should be inserted. They go after the last definition of the
+            same kind, or at the end of the file (outside of any function).
+        """
+        if kind == 'alias':
+            lines = [
+                lineno + 1
+                for lineno, info in enumerate(self.info)
+                if info.alias and not info.inside
+            ]
+        elif kind == 'function':
+            lines = [
+                definition.line + definition.length
+                for definition in self.iter_definitions('function')
+            ]
+        else:
+            lines = [
+                lineno + 1
+                for lineno, info in enumerate(self.info)
+                if (info.export is not None) and (not info.inside) and
+                self.lines[lineno].startswith('export')
+            ]
+        lineno = lines[-1] if lines else len(self.lines)
+        # Don't insert into a function that was never closed.
+        while not self.isboundary(lineno):
+            lineno -= 1
+        return lineno
+
+    def insert_lines(self, lineno, newlines):
+        """ Insert lines at a line number, making sure the line before
+            them is terminated.
+        """
+        if (lineno > 0) and (not self.lines[lineno - 1].endswith('\n')):
+            prevline = '{}\n'.format(self.lines[lineno - 1])
+            self.update_lines(lineno - 1, lineno, [prevline] + newlines)
+        else:
+            self.update_lines(lineno, lineno, newlines)
+
+    def isboundary(self, lineno):
+        """ Returns True if no function is open before this line. """
+        return (lineno == 0) or (not self.info[lineno - 1].open)
+
+    def iter_definitions(self, kind=None):
+        """ Yield Definition()s in file order, with their line set. """
+        self.update_lines_index()
+        for info in self.info:
+            for definition in (info.alias, info.function):
+                if definition is None:
+                    continue
+                if (kind is None) or (definition.kind == kind):
+                    yield definition
+
+    def refresh_exports(self):
+        """ Set the exported value for functions, using the export lines.
+        """
+        exports = set(self.get_exports())
+        for info in self.info:
+            if info.function is None:
+                continue
+            definition = info.function
+            exported = 'Yes' if (definition.saved[0] in exports) else 'No'
+            if definition.saved[3] != exported:
+                definition.update(definition.saved[:3] + (exported,))
+
+    def remove_command(self, command):
+        """ Remove an alias/function from the lines.
+            Returns True if it was removed.
+        """
+        definition = self.find(command)
+        if definition is None:
+            return False
+        start, end = definition.span()
+        if ((definition.kind == 'function') and
+                (start > 0) and
+                (not self.lines[start - 1].strip()) and
+                self.isboundary(start - 1)):
+            # Remove the blank line before the function too.
+            start -= 1
+        self.update_lines(start, end, [])
+        return True
+
+    def revert(self):
+        """ Set all Command()s back to the values parsed from the file. """
+        for definition in self.iter_definitions():
+            if definition.edited():
+                definition.revert()
+
+    def set_command(self, command):
+        """ Patch the lines for a Command(), replacing its definition if
+            it came from this file, or adding a new one.
+            Returns True if the lines were changed.
+        """
+        kind = 'function' if command.isfunction() else 'alias'
+        definition = self.find(command)
+        if ((definition is not None) and
+                (definition.kind != kind) and
+                self.info[definition.line].inside):
+            # An alias inside of a function is becoming a function,
+            # it can't stay there.
+            if not definition.changed():
+                return False
+            self.remove_command(command)
+            definition = None
+        newlines = render_command(command)
+        if definition is None:
+            lineno = self.insert_line(kind)
+            if kind == 'function':
+                newlines.insert(0, '\n')
+            self.insert_lines(lineno, newlines)
+            if kind == 'function':
+                # Skip the blank line.
+                lineno += 1
+        elif not definition.changed():
+            return False
+        else:
+            lineno = definition.line
+            self.update_lines(lineno, lineno + definition.length, newlines)
+
+        # Keep this Command() for the new definition.
+        info = self.info[lineno]
+        newdef = info.function if kind == 'function' else info.alias
+        if newdef is not None:
+            newdef.command = command
+            self._commands = None
+        return True
+
+    def set_contents(self, contents):
+        """ Set new contents for the file, parsing only the lines that
+            changed. Command()s are reverted to the parsed values.
+        """
+        newlines = split_lines(contents)
+        oldlines = self.lines
+        # Skip lines that are the same at the start and end.
+        maxsame = min(len(oldlines), len(newlines))
+        start = 0
+        while (start < maxsame) and (oldlines[start] == newlines[start]):
+            start += 1
+        same = 0
+        while ((same < (maxsame - start)) and
+                (oldlines[-(same + 1)] == newlines[-(same + 1)])):
+            same += 1
+        oldend = len(oldlines) - same
+        newend = len(newlines) - same
+        if (start != oldend) or (start != newend):
+            self.update_lines(start, oldend, newlines[start:newend])
+        self.dirty = False
+        self.revert()
+
+    def set_export(self, name, exported=True):
+        """ Add or remove export lines for a name.
+            Returns True if the lines were changed.
+        """
+        if exported:
+            if name in self.get_exports():
+                return False
+            self.insert_lines(
+                self.insert_line('export'),
+                ['export {}\n'.format(name)])
+            return True
+
+        exportlines = [
+            lineno
+            for lineno, info in enumerate(self.info)
+            if (info.export == name) and
+            self.lines[lineno].lstrip().startswith('export')
+        ]
+        if not exportlines:
+            return False
+        # From the bottom up, so the line numbers stay the same.
+        for lineno in reversed(exportlines):
+            self.update_lines(lineno, lineno + 1, [])
+        return True
+
+    def sync(self, commands):
+        """ Patch the lines to match a list of Command()s (usually from
+            get_commands(), after editing). Only definitions that were
+            added, removed, or edited are rewritten, along with their
+            export lines. Returns the number of patches made.
+        """
+        patches = 0
+        # Names that were in the file, to remove exports for renamed or
+        # removed functions.
+        names = set(d.saved[0] for d in self.iter_definitions())
+        keep = set(id(cmd) for cmd in commands)
+        removed = [
+            definition
+            for definition in self.iter_definitions()
+            if id(definition.command) not in keep
+        ]
+        # From the bottom up, so earlier line numbers stay the same.
+        for definition in reversed(removed):
+            if self.remove_command(definition.command):
+                patches += 1
+
+        # Aliases inside of functions are patched after the functions,
+        # in case the function is rewritten.
+        nested = set()
+        for definition in self.iter_definitions('alias'):
+            if self.info[definition.line].inside:
+                nested.add(id(definition.command))
+        for cmd in sorted(commands, key=lambda cmd: id(cmd) in nested):
+            if self.set_command(cmd):
+                patches += 1
+
+        names.update(cmd.name for cmd in commands)
+        exported = set(
+            cmd.name for cmd in commands if cmd.exported.lower() == 'yes'
+        )
+        exports = set(self.get_exports())
+        for name in sorted(names):
+            if (name in exported) == (name in exports):
+                continue
+            if self.set_export(name, exported=(name in exported)):
+                patches += 1
+        return patches
+
+    def tabdepth_at(self, lineno):
+        """ Return the function tab depth that was set before a line. """
+        if (self.tabline is not None) and (self.tabline < lineno):
+            return self.tabdepth
+        return 0
+
+    def update_lines(self, start, end, newlines):
+        """ Replace lines[start:end] with new lines, and parse only the
+            lines that changed.
+            The region is widened to whole functions, and parsing goes
+            past the end of it until the function state matches the old
+            parse again.
+        """
+        info = self.info
+        total = len(self.lines)
+        # Widen the region to whole functions.
+        rstart = start
+        while not self.isboundary(rstart):
+            rstart -= 1
+        rend = end
+        while (rend < total) and (not self.isboundary(rend)):
+            rend += 1
+
+        region = self.lines[rstart:start] + list(newlines)
+        region.extend(self.lines[end:rend])
+        parser = AliasParser(lineno=rstart, tabdepth=self.tabdepth_at(rstart))
+        newinfo = parser.parse_lines(region)
+        # Keep parsing until the function state is the same as the old one.
+        while (rend < total) and (
+                parser.bfunction or
+                (not self.isboundary(rend)) or
+                (parser.tabdepth != self.tabdepth_at(rend))):
+            region.append(self.lines[rend])
+            newinfo.append(parser.parse_line(self.lines[rend]))
+            rend += 1
+
+        # Keep the Command()s for definitions that were parsed again.
+        olddefs = {}
+        for oldinfo in info[rstart:rend]:
+            if oldinfo.defword is not None:
+                self.counts[oldinfo.defword] -= 1
+            for definition in (oldinfo.alias, oldinfo.function):
+                if definition is not None:
+                    key = (definition.kind, definition.saved[0])
+                    olddefs.setdefault(key, []).append(definition)
+        for newline in newinfo:
+            if newline.defword is not None:
+                self.counts[newline.defword] += 1
+            for definition in (newline.alias, newline.function):
+                if definition is None:
+                    continue
+                key = (definition.kind, definition.saved[0])
+                if olddefs.get(key, None):
+                    definition.use_command(olddefs[key].pop(0))
+
+        # Tab depth for functions.
+        delta = len(region) - (rend - rstart)
+        if parser.tabline is not None:
+            self.tabline = parser.tabline
+            self.tabdepth = parser.tabdepth
+        elif (self.tabline is not None) and (self.tabline >= rend):
+            self.tabline += delta
+        elif (self.tabline is not None) and (self.tabline >= rstart):
+            self.tabline = None
+            self.tabdepth = 0
+
+        self.lines[rstart:rend] = region
+        self.info[rstart:rend] = newinfo
+        self._index = None
+        self._commands = None
+        self.dirty = True
+        self.refresh_exports()
+
+    def update_lines_index(self):
+        """ Set Definition.line for every definition, and return a dict
+            of {id(Command()): Definition()}.
+        """
+        if self._commands is not None:
+            return self._commands
+        commands = {}
+        for lineno, info in enumerate(self.info):
+            if info.alias is not None:
+                info.alias.line = lineno
+                commands[id(info.alias.command)] = info.alias
+            if info.function is not None:
+                info.function.line = lineno
+                commands[id(info.function.command)] = info.function
+        self._commands = commands
+        return commands
+
+    def write(self, filename=None):
+        """ Write the lines to a file, if they have changed.
+            Writing to another file leaves this one unchanged.
+            Returns True if the file was written.
+        """
+        if filename is None:
+            filename = self.filename
+        samefile = (filename == self.filename)
+        if samefile and (not self.dirty) and os.path.isfile(filename):
+            return False
+        with open(filename, 'w') as fwrite:
+            fwrite.writelines(self.lines)
+        if samefile:
+            self.dirty = False
+            self.filestat = get_filestat(filename)
+        return True
+
+
 # Functions ----------------------------------------
 
 
@@ -372,173 +1013,152 @@ def parsealiasline_old(sline):
     return None
 
 
+def parse_alias(name, rawcmd):
+    """ Build a Command() from an alias name and its raw command info. """
+    # use regex for separating comments from command.
+    if '#' in rawcmd:
+        cmdmatch = cmd_comment_pat.search(rawcmd)
+    else:
+        # use normal regex.
+        cmdmatch = cmd_nocomment_pat.search(rawcmd)
+    command, comment = rawcmd, ''
+    if cmdmatch:
+        groups = cmdmatch.groupdict()
+        command = groups['command']
+        comment = groups.get('comment', '')
+
+    return Command(
+        name=stripchars(name, ' \t\n'),
+        cmd=[stripquotes(stripchars(command, ' \t\n'))],
+        comment=stripchars(comment, '# \t\n'),
+        exported='[n/a]')
+
+
 def parse_aliases(filecontents):
     """ parse all aliases from file, return a list of Command() objects """
-
-    # this one handles quotes inside of commands better...
-    name_pat = re.compile(r'alias[ ]?(?P<name>[\d\w_\-]+)=(?P<cmdinfo>.+)')
-    cmd_comment_pat = re.compile(r'(?P<command>.+)[#](?P<comment>.+)?')
-    cmd_nocomment_pat = re.compile(r'(?P<command>.+)')
-
-    lst_commands = []
-    # Get all alias lines, with (name, raw command and comment)
-    aliases = name_pat.findall(filecontents)
-    for name, rawcmd in aliases:
-        # use regex for separating comments from command.
-        if '#' in rawcmd:
-            cmdmatch = cmd_comment_pat.search(rawcmd)
-        else:
-            # use normal regex.
-            cmdmatch = cmd_nocomment_pat.search(rawcmd)
-        if cmdmatch:
-            groups = cmdmatch.groupdict()
-            command = groups['command']
-            comment = groups.get('comment', '')
-
-        # Add alias to list as a Command() object...
-        lst_commands.append(
-            Command(
-                name=stripchars(name, ' \t\n'),
-                cmd=[stripquotes(stripchars(command, ' \t\n'))],
-                comment=stripchars(comment, '# \t\n'),
-                exported='[n/a]'))
-    return lst_commands
+    return AliasFile(contents=filecontents).get_aliases()
 
 
 def parse_exports(filecontents):
     """ parse all exports from file contents, return a list of exported names.
     """
 
-    exportpat = re.compile(r'export[ ]+?(?P<export>.+)', flags=re.MULTILINE)
-    exports = exportpat.findall(filecontents)
+    exports = export_pat.findall(filecontents)
     if exports:
         exports = [stripchars(e, ' \t\n') for e in exports]
     return exports
 
 
+def parse_function_contents(lst_contents, scomment, tabdepth):
+    """ Decide which raw function lines to keep for a Command().
+        Braces, the definition, and the function comment are removed,
+        and lines are trimmed to 1 tab past `tabdepth`.
+        returns: list of lines
+    """
+    lst_keep = []
+    for itm in lst_contents:
+        # Save trimmed version of line
+        strim = itm.replace('\t', '').replace(
+            ' ', '').replace('\n', '')
+        snotabs = itm.replace('\t', '').replace('\n', '')
+        # Figure out which contents to keep. No Braces.
+        # and (not strim.startswith("#")):
+        if (strim != "{") and (strim != "}"):
+            # Trim single line definition
+            if "()" in itm:
+                itm = itm[itm.index("()") + 2:]
+                snotabs = itm.replace('\t', '').replace('\n', '')
+                strim = snotabs.replace(' ', '')
+                if strim.startswith("{"):
+                    snotabs = snotabs[snotabs.index("{") + 1:]
+                    if snotabs.endswith("}"):
+                        snotabs = snotabs[:snotabs.index("}")]
+                    itm = snotabs
+            # Trim leading { and following }...
+            if snotabs.startswith("{"):
+                snotabs = snotabs[1:]
+                if snotabs.endswith("}"):
+                    snotabs = snotabs[:len(snotabs) - 1]
+                itm = snotabs
+            # Trim initial tabdepth from itm
+            if itm.startswith('\t'):
+
+                itm = itm[tabdepth:]
+                # Trim one more tab depth
+                if itm.startswith('\t'):
+                    itm = itm[1:]
+
+            # Append Function Contents, don't add initial coment
+            if ((scomment != "") and
+                    (not ((itm.startswith("#")) and (scomment in itm)))):
+                lst_keep.append(itm)
+            elif scomment == "":
+                lst_keep.append(itm)
+    return lst_keep
+
+
 def parse_functions(filecontents):
     """ parse all functions from the alias file. """
+    return AliasFile(contents=filecontents).get_functions()
 
-    # Get all exports from the file
-    exports = parse_exports(filecontents)
 
-    # Parse all functions from the file.
-    # Flag for setting if we are inside a function
-    bfunction = False
-    # Flag for setting if we found function comments
-    bcomment = False
-    scomment = ''
-    # List of parsed Command() objects...
-    commands = []
-    # Temporary list for raw function contents
-    lst_contents = []
+def command_values(command):
+    """ Return a tuple of (name, cmd, comment, exported) for a Command(),
+        for comparing it with parsed values.
+    """
+    return (
+        command.name,
+        tuple(command.cmd),
+        command.comment,
+        command.exported)
 
-    # Initialize Tab Depths
-    tabdepth = 0
-    spacedepth = 0
 
-    for sline in filecontents.split('\n'):
+def get_aliasfile(aliasfile=None):
+    """ Return the AliasFile() that was last loaded for a file name,
+        or None if it hasn't been loaded.
+    """
+    if aliasfile is None:
+        aliasfile = settings.get("aliasfile")
+    return aliasfiles.get(aliasfile, None)
 
-        # Detect Function -------------------------------
-        if sline.replace('\t', '').replace(' ', '').startswith("function"):
-            # Grab function name
-            ssplit = sline.split(" ")
-            sname = ssplit[1].replace('\n', '').replace("()", "")
 
-            # Find initial tab/space depth
-            if tabdepth == 0:
-                if sline.startswith('\t'):
-                    sbuf = sline
-                    tabdepth, sbuf = trimcount(sbuf, '\t')
+def get_filestat(filename):
+    """ Return (size, modified time) for a file, or None if it can't be
+        read.
+    """
+    try:
+        st = os.stat(filename)
+    except (OSError, TypeError):
+        return None
+    return st.st_size, st.st_mtime
 
-            if spacedepth == 0:
-                if sline.startswith(" "):
-                    sbuf = sline
-                    spacedepth, sbuf = trimcount(sbuf, ' ')
 
-            # We are now inside a function
-            bfunction = True
-        # Inside Function ----------------------------------
-        if bfunction:
-            # Detect comment
-            if sline.replace('\t', '').replace(' ', '').startswith("#"):
-                # First comment only
-                if not bcomment:
-                    # Found comment
-                    scomment = sline.replace('\t', '').replace('\n', '')[1:]
-                    scomment = scomment.strip(' ')
-                    # Set flag
-                    bcomment = True
-
-            # Add raw contents
-            # Skip over function definition if multi-line function
-            if not sline.strip(" ").replace('\n', '').endswith("()"):
-                lst_contents.append(sline.replace('\n', ''))
-
-            # Found end of function (could be a single line though)
-            # Parse contents, decide which to keep
-            if ((sline.strip().replace('\n', '').endswith(" }")) or
-                    (sline.replace('\n', '').replace('\t', '').replace(' ', '') == "}")):
-                # End of function
-                bfunction = False
-                # Reset comment finder
-                bcomment = False
-
-                # Keep function contents
-                lst_keep = []
-                for itm in lst_contents:
-                    # Save trimmed version of line
-                    strim = itm.replace('\t', '').replace(
-                        ' ', '').replace('\n', '')
-                    snotabs = itm.replace('\t', '').replace('\n', '')
-                    # Figure out which contents to keep. No Braces.
-                    # and (not strim.startswith("#")):
-                    if (strim != "{") and (strim != "}"):
-                        # Trim single line definition
-                        if "()" in itm:
-                            itm = itm[itm.index("()") + 2:]
-                            snotabs = itm.replace('\t', '').replace('\n', '')
-                            strim = snotabs.replace(' ', '')
-                            if strim.startswith("{"):
-                                snotabs = snotabs[snotabs.index("{") + 1:]
-                                if snotabs.endswith("}"):
-                                    snotabs = snotabs[:snotabs.index("}")]
-                                itm = snotabs
-                        # Trim leading { and following }...
-                        if snotabs.startswith("{"):
-                            snotabs = snotabs[1:]
-                            if snotabs.endswith("}"):
-                                snotabs = snotabs[:len(snotabs) - 1]
-                            itm = snotabs
-                        # Trim initial tabdepth from itm
-                        if itm.startswith('\t'):
-
-                            itm = itm[tabdepth:]
-                            # Trim one more tab depth
-                            if itm.startswith('\t'):
-                                itm = itm[1:]
-
-                        # Append Function Contents, don't add initial coment
-                        if ((scomment != "") and
-                                (not ((itm.startswith("#")) and (scomment in itm)))):
-                            lst_keep.append(itm)
-                        elif scomment == "":
-                            lst_keep.append(itm)
-
-                # Append function name/contents/comment /exported [set with
-                # fixexports()]
-                sexported = 'Yes' if (sname in exports) else 'No'
-                commands.append(Command(name=sname,
-                                        cmd=lst_keep,
-                                        comment=scomment,
-                                        exported=sexported))
-
-                # Reset comment string
-                scomment = ''
-                # Reset contents finder list
-                lst_contents = []
-    # Return finished list
-    return commands
+def load_aliasfile(aliasfile=None):
+    """ Return an AliasFile() for an alias file.
+        The AliasFile() is kept and reused, and when the file changes only
+        the changed lines are parsed again. Command()s are reverted to the
+        values in the file.
+        Returns None on failure.
+    """
+    if aliasfile is None:
+        aliasfile = settings.get("aliasfile")
+
+    model = aliasfiles.get(aliasfile, None)
+    if (model is not None) and (not model.changed()):
+        model.revert()
+        return model
+
+    filestat = get_filestat(aliasfile)
+    filecontents = getfilecontents(aliasfile=aliasfile)
+    if filecontents is None:
+        aliasfiles.pop(aliasfile, None)
+        return None
+    if model is None:
+        model = AliasFile(aliasfile)
+        aliasfiles[aliasfile] = model
+    model.set_contents(filecontents)
+    model.filestat = filestat
+    return model
 
 
 def readfile(aliasfile=None):
@@ -546,20 +1166,17 @@ def readfile(aliasfile=None):
         Returns empty list on failure.
     """
 
-    # Get alias file contents
-    filecontents = getfilecontents(aliasfile=aliasfile)
-    aliaslinecnt = get_def_count(filecontents, 'alias')
-    functionlinecnt = get_def_count(filecontents, 'function')
-
-    commands = []
-    if filecontents is None:
+    # Get the parsed alias file.
+    model = load_aliasfile(aliasfile=aliasfile)
+    if model is None:
         return []
-    # Get all aliases from the file.(also, initialize lst_commands)
-    aliases = parse_aliases(filecontents)
-    commands = commands + aliases
-    # Get all functions form the file (also fills in exported items)
-    functions = parse_functions(filecontents)
-    commands = commands + functions
+    aliaslinecnt = model.get_def_count('alias')
+    functionlinecnt = model.get_def_count('function')
+
+    # Get all aliases and functions (with exported info) from the file.
+    aliases = model.get_aliases()
+    functions = model.get_functions()
+    commands = aliases + functions
     # Validate parsing of aliases/functions
     warnmsg = []
     if aliaslinecnt != len(aliases):
@@ -804,19 +1421,54 @@ def chmod_file(sfilename):
             return ('chmod +x ' + sfilename)
 
 
-def stripchars(original, chars):
-    """ remove chars from beginning and end of string """
-    if hasattr(chars, 'lower'):
-        chars = [c for c in chars]
+def render_command(command):
+    """ Return lines for a Command() in an alias file, using the same
+        style as the GUI.
+        returns: list of lines (with newlines)
+    """
+    scomment = command.comment
+    # Append comment char if needed
+    if scomment and (not scomment.startswith("#")):
+        scomment = "# " + scomment
+
+    if command.isfunction():
+        lines = ["function " + command.name + "()\n", "{\n"]
+        if scomment:
+            lines.append('\t' + scomment + '\n')
+        lines.extend('\t' + scmdline + '\n' for scmdline in command.cmd)
+        lines.append("}\n")
+        return lines
+
+    scmd = command.cmd[0] if command.cmd else ''
+    # Fix quotes around command
+    if '"' in scmd:
+        scmd = "'" + scmd + "'"
+    else:
+        scmd = '"' + scmd + '"'
+    if scomment:
+        scmd = scmd + " " + scomment
+    return ["alias " + command.name + "=" + scmd + '\n']
 
-    if original:
-        while original and (original[0] in chars):
-            original = original[1:]
-    if original:
-        while original and (original[-1] in chars):
-            original = original[:-1]
 
-    return original
+def split_lines(contents):
+    """ Split file contents into lines, keeping the newlines.
+        Only '\n' ends a line, like the parser expects.
+    """
+    lines = [line + '\n' for line in contents.split('\n')]
+    # The last line has no newline (or is empty).
+    lastline = lines.pop()[:-1]
+    if lastline:
+        lines.append(lastline)
+    return lines
+
+
+def stripchars(original, chars):
+    """ remove chars from beginning and end of string """
+    if not original:
+        return original
+    if not hasattr(chars, 'lower'):
+        chars = ''.join(chars)
+    return original.strip(chars)
 
 
 def stripquotes(original):
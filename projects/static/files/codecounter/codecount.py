@@ -41,7 +41,15 @@
 from __future__ import print_function
 import sys          # for argument parsing
 import os           # for listing directory contents, file/path stuff
-#import re           # for trimming spaces from strings
+import re           # for finding inline comments
+import ast          # for the syntax tree backend
+import hashlib      # for the results cache
+import io           # for decoding source files
+import json         # for JSON output
+import multiprocessing  # for counting directories in parallel
+import tokenize     # for the tokenizer backend
+from collections import OrderedDict
+from functools import partial
 
 class codecounter():
     def __init__(self):
@@ -49,7 +57,7 @@ class codecounter():
         # Set App Name
         self.appname = "Code Counter"
         # Set Version
-        self.version = "2.0.1"
+        self.version = "2.1.0"
         # Get script file name
         self.script = sys.argv[0]
         # Set spacing for reports
@@ -77,41 +85,62 @@ class codecounter():
             self.printhelp()
             exit(0)
             
-        # File checker
+        # What type of report do we want?
+        sopt = self.args[0]
+
+        # Results cache, saved next to the file/dir being checked.
         sfile = self.args[1]
+        cache = None
+        if "c" in sopt:
+            cache = resultscache(getcachefile(sfile), self.getengine())
+            cache.load()
+
+        # File checker
         if os.path.isfile(sfile):
             #print("Checking file: " + sfile + "...")
-            res = self.filechecker(self.args[1]) 
-            lst_results = [res]
+            lst_results = self.checkfiles([sfile], cache=cache)
             
         elif os.path.isdir(sfile):
-            # Directory checker
-            lst_results = []
-            
-            lst_files = os.listdir(sfile)
-            lst_py = []
-            for filename in lst_files:
-                if os.path.isfile(os.path.join(sfile, filename)) and filename.endswith(".py"):
-                    lst_py.append(filename)
-                
-            for pyfile in lst_py:
-                spath = os.path.join(sfile, pyfile)
-                res = self.filechecker(spath)
-                lst_results.append(res)
+            # Directory checker (whole tree with -r)
+            lst_results = self.checkfiles(
+                findpyfiles(sfile, "r" in sopt),
+                cache=cache)
                 
         else:
             self.printusage("Invalid file/dir given!: " + self.args[1])
             exit(1)
+
+        if cache is not None:
+            cache.save()
             
-        # Finished gathering results, what type of report do we want?
-        sopt = self.args[0]
-        
+        # Skip files that couldn't be read.
+        lst_results = [res for res in lst_results if res is not None]
+
+        # JSON output, with totals for all files.
+        if "j" in sopt:
+            dict_output = {
+                "files": [res.to_dict() for res in lst_results],
+                "totals": mergeresults(lst_results, sfile).to_dict(),
+            }
+            print(json.dumps(dict_output, indent=4, sort_keys=True))
+            exit(0)
+
         # Cycle thru all results gathered
         if len(lst_results) > 1:
-            print("Found " + str(len(lst_results)) + " files to check...")
+            if cache is None:
+                print("Found " + str(len(lst_results)) + " files to check...")
+            else:
+                print("Found " + str(len(lst_results)) + " files to check (" +
+                      str(cache.ihits) + " cached)...")
         elif len(lst_results) == 0:
             print("No files found to check!")
-            
+
+        # Directory tree, report the totals only.
+        if ("r" in sopt) and lst_results:
+            lst_results = [mergeresults(lst_results, sfile)]
+
+        # Print the full report unless a list/totals was asked for.
+        breport = not [c for c in "iestv" if c in sopt]
         for result in lst_results:
             print("\nResults for " + result.s_file + ":")
             if "i" in sopt:
@@ -125,7 +154,7 @@ class codecounter():
             if "t" in sopt:
                 self.printtotals(result)
                 print("")
-            if sopt == "-":
+            if breport:
                 self.printreport(result)
         
         # Finished
@@ -136,7 +165,7 @@ class codecounter():
     def printusage(self, sreason = None):
         if sreason != None:
             print(sreason + '\n')
-        print("\nUsage: ./" + self.script + " [-htdvie] script_to_analyze.py\n")
+        print("\nUsage: ./" + self.script + " [-htdviejprc] script_or_dir_to_analyze\n")
         
     def printhelp(self):
         print(self.appname +  " v." + self.version + " Help:")
@@ -149,7 +178,14 @@ class codecounter():
         print(" s : Print all docstrings found")
         print(" t : Print only basic totals")
         print(" d : Sorts variable/import lists in the order they were discovered,")
-        print("      ...default is alphabetically.\n")
+        print("      ...default is alphabetically.")
+        print(" r : Count all .py files in a directory tree, and print the totals")
+        print(" j : Print all results and totals as JSON")
+        print(" p : Use the syntax tree checker (slower, but counts strings,")
+        print("      multi-line statements, and comments correctly)")
+        print(" c : Cache results, and only check files that changed since the")
+        print("      last run. The cache is saved in " + CACHE_NAME + ",")
+        print("      or in $" + CACHE_ENV + " if it is set.\n")
  
     def printtotals(self, res):
         """ Prints only the basic totals from results object """
@@ -630,19 +666,723 @@ class codecounter():
         res.ishortest = len(res.s_shortest)
         res.ishortestcomment = len(res.s_shortestcomment)
         
-        # Find Percentage of Code Lines vs. Total
-        res.icodepercent = (res.icode / float(res.itotal)) * 100
-        # Find Percentage of Comment Lines vs. Total
-        res.icommentpercent = (res.icommentline / float(res.itotal)) * 100
-        # Find Percentage of Blank Lines vs. Total
-        res.iblankpercent = (res.iblank / float(res.itotal)) * 100
-        # Find Percentage of DocString Lines vs. Total
-        res.idocpercent = (res.idocstringline / float(res.itotal)) * 100
+        # Find Percentages of Code/Comment/Blank/DocString Lines vs. Total
+        res.calculate()
         
         # Return Results Object
         return res
-        
+
+    def checkfiles(self, lst_files, cache=None):
+        """ Check several files, in parallel across processes.
+            Returns a list of results() objects (None for files that
+            couldn't be read), in the same order as lst_files.
+            If a resultscache() is given, only files that changed since
+            they were cached are checked, and the cache is updated.
+        """
+        blegacy = "p" not in self.args[0]
+        if cache is None:
+            return mapfiles(partial(countfile, blegacy=blegacy), lst_files)
+
+        dict_results = {}
+        lst_changed = []
+        for sfile in lst_files:
+            res = cache.get(sfile)
+            if res is None:
+                lst_changed.append(sfile)
+            else:
+                dict_results[sfile] = res
+        lst_checked = mapfiles(
+            partial(countfilecached, blegacy=blegacy),
+            lst_changed)
+        for sfile, (res, dict_entry) in zip(lst_changed, lst_checked):
+            dict_results[sfile] = res
+            if dict_entry is not None:
+                cache.set(sfile, dict_entry)
+        return [dict_results[sfile] for sfile in lst_files]
+
+    def getengine(self):
+        """ Returns the name of the checker used for these arguments.
+            Cached results are only used with the same checker.
+        """
+        if "p" not in self.args[0]:
+            sengine = "legacy"
+        elif USE_AST:
+            sengine = "ast"
+        else:
+            sengine = "tokenize"
+        return sengine + "-" + self.version
+
+    def sourcechecker(self, sfile):
+        """ Analyze a file with the ast module, in a single pass over the
+            syntax tree and lines. Fills the same results() object as
+            filechecker(), without running dozens of string checks on every
+            line. Files that ast can't parse (like python 2 code) are
+            analyzed with the tokenize module, and filechecker() is used
+            for files that can't be tokenized either.
+        """
+        # Test if valid file
+        if not os.path.isfile(sfile):
+            self.printusage("Invalid file given: " + sfile)
+            exit(1)
+
+        # Get file source (decoded using the coding cookie, if any)
+        try:
+            ssource = readsource(sfile)
+        except (IOError, OSError) as exIO:
+            print("Unable to open file: " + sfile)
+            print("Error: " + str(exIO))
+            return None
+        except (SyntaxError, UnicodeDecodeError):
+            # Bad coding cookie, or wrong encoding.
+            return self.filechecker(sfile)
+
+        res = None
+        if USE_AST:
+            try:
+                res = analyzetree(ssource)
+            except (SyntaxError, ValueError, RecursionError):
+                # Not python 3 code, try the tokenizer.
+                res = None
+        if res is None:
+            try:
+                res = analyzetokens(ssource)
+            except (tokenize.TokenError, SyntaxError):
+                # Unfinished statements or bad indention.
+                return self.filechecker(sfile)
+        res.s_file = sfile
+        return res
+
+# Directory Checking -----------------------
+def countfile(sfile, blegacy=False):
+    """ Check a single file, with the tokenizer or the old line-based
+        checker. Used by codecounter.checkfiles().
+    """
+    cc = codecounter()
+    if blegacy:
+        return cc.filechecker(sfile)
+    return cc.sourcechecker(sfile)
+
+
+def countfilecached(sfile, blegacy=False):
+    """ Check a single file like countfile(), and build a cache entry for
+        it. Returns (results, entry). The entry is None when the file
+        couldn't be read, or changed while it was being checked.
+    """
+    try:
+        dict_stat = statfile(sfile)
+        shash = hashfile(sfile)
+    except (IOError, OSError):
+        return countfile(sfile, blegacy=blegacy), None
+    res = countfile(sfile, blegacy=blegacy)
+    if res is None:
+        return None, None
+    try:
+        if statfile(sfile) != dict_stat:
+            return res, None
+    except (IOError, OSError):
+        return res, None
+    dict_entry = {"sha1": shash, "results": res.to_dict()}
+    dict_entry.update(dict_stat)
+    return res, dict_entry
+
+
+def findpyfiles(sdir, brecursive=False):
+    """ Returns a sorted list of .py files in a directory,
+        or in the whole directory tree if brecursive is True.
+    """
+    if not brecursive:
+        return [
+            os.path.join(sdir, sname)
+            for sname in sorted(os.listdir(sdir))
+            if sname.endswith(".py") and os.path.isfile(os.path.join(sdir, sname))
+        ]
+    lst_files = []
+    for sroot, lst_dirs, lst_names in os.walk(sdir):
+        lst_dirs.sort()
+        for sname in sorted(lst_names):
+            if sname.endswith(".py"):
+                lst_files.append(os.path.join(sroot, sname))
+    return lst_files
+
+
+def mapfiles(func, lst_files):
+    """ Run func(sfile) for each file, in parallel across processes.
+        Returns a list of return values, in the same order as lst_files.
+    """
+    if len(lst_files) < 2:
+        return [func(sfile) for sfile in lst_files]
+    pool = multiprocessing.Pool()
+    try:
+        ichunk = max(1, len(lst_files) // (multiprocessing.cpu_count() * 4))
+        return pool.map(func, lst_files, chunksize=ichunk)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def mergeresults(lst_results, sname):
+    """ Merge several results() objects into a new one for the totals. """
+    res = results()
+    res.s_file = sname
+    return res.merge(*lst_results)
+
+
+# Results Cache ----------------------------
+# Default file name for the results cache.
+CACHE_NAME = ".codecount_cache.json"
+# Environment variable to use a different cache file.
+CACHE_ENV = "CODECOUNT_CACHE"
+
+
+def getcachefile(sfile):
+    """ Returns the cache file to use when checking a file or directory. """
+    scachefile = os.environ.get(CACHE_ENV, "")
+    if scachefile:
+        return scachefile
+    if os.path.isdir(sfile):
+        return os.path.join(sfile, CACHE_NAME)
+    return os.path.join(os.path.dirname(sfile), CACHE_NAME)
+
+
+def hashfile(sfile):
+    """ Returns the sha1 hex digest for a file's content. """
+    with open(sfile, "rb") as fread:
+        return hashlib.sha1(fread.read()).hexdigest()
+
+
+def statfile(sfile):
+    """ Returns the size and modification time (in nanoseconds) for a file,
+        used to tell when it has changed.
+    """
+    st = os.stat(sfile)
+    imtime = getattr(st, "st_mtime_ns", None)
+    if imtime is None:
+        # Python 2.
+        imtime = int(st.st_mtime * 1000000000)
+    return {"size": st.st_size, "mtime_ns": imtime}
+
+
+class resultscache():
+    """ Per-file results, saved to a JSON file between runs.
+        Entries are keyed by absolute path, and hold the file's size,
+        mtime, sha1 hash, and results. A file with the same size and mtime
+        is not read at all. A file with the same size but a new mtime
+        (like after a checkout) is only hashed, and re-checked if the hash
+        changed.
+    """
+    def __init__(self, sfile, sengine):
+        self.s_file = sfile
+        # Checker name/version, results from other checkers are ignored.
+        self.s_engine = sengine
+        self.entries = {}
+        self.ihits = 0
+        self.bchanged = False
+
+    def get(self, sfile):
+        """ Returns cached results() for a file, or None if the file changed
+            or isn't cached.
+        """
+        spath = os.path.abspath(sfile)
+        dict_entry = self.entries.get(spath, None)
+        if dict_entry is None:
+            return None
+        try:
+            dict_stat = statfile(sfile)
+            if dict_stat["size"] != dict_entry["size"]:
+                return None
+            if dict_stat["mtime_ns"] != dict_entry["mtime_ns"]:
+                # Touched, but maybe not changed.
+                if hashfile(sfile) != dict_entry["sha1"]:
+                    return None
+                dict_entry["mtime_ns"] = dict_stat["mtime_ns"]
+                self.bchanged = True
+        except (IOError, OSError):
+            return None
+        self.ihits += 1
+        res = results.from_dict(dict_entry["results"])
+        res.s_file = sfile
+        return res
+
+    def set(self, sfile, dict_entry):
+        """ Cache an entry from countfilecached() for a file. """
+        self.entries[os.path.abspath(sfile)] = dict_entry
+        self.bchanged = True
+
+    def load(self):
+        """ Load entries from the cache file. A missing, unreadable, or
+            outdated cache file is ignored, and the cache starts empty.
+        """
+        try:
+            with open(self.s_file, "r") as fread:
+                dict_cache = json.load(fread)
+        except (IOError, OSError, ValueError):
+            return self
+        if (not isinstance(dict_cache, dict)) or (
+                dict_cache.get("engine", None) != self.s_engine):
+            return self
+        self.entries = dict_cache.get("files", {})
+        return self
+
+    def prune(self):
+        """ Remove entries for files that don't exist anymore. """
+        for spath in [s for s in self.entries if not os.path.isfile(s)]:
+            del self.entries[spath]
+            self.bchanged = True
+        return self
+
+    def save(self):
+        """ Save the cache file, if anything changed. The file is written
+            to a temporary file first, and then moved into place.
+        """
+        self.prune()
+        if not self.bchanged:
+            return True
+        stmpfile = self.s_file + "." + str(os.getpid()) + ".tmp"
+        dict_cache = {"engine": self.s_engine, "files": self.entries}
+        freplace = getattr(os, "replace", os.rename)
+        try:
+            with open(stmpfile, "w") as fwrite:
+                json.dump(dict_cache, fwrite, separators=(",", ":"))
+            freplace(stmpfile, self.s_file)
+        except (IOError, OSError) as exIO:
+            print("Unable to save cache file: " + self.s_file)
+            print("Error: " + str(exIO))
+            if os.path.exists(stmpfile):
+                os.remove(stmpfile)
+            return False
+        self.bchanged = False
+        return True
+
+
+# Syntax Tree Backend ----------------------
+# The syntax tree has the end line for each statement in python 3.8+.
+USE_AST = sys.version_info >= (3, 8)
+# Try statements (python 3.11 added try/except*).
+TRY_NODES = tuple(
+    getattr(ast, sname) for sname in ("Try", "TryStar", "TryExcept")
+    if hasattr(ast, sname)
+)
+# Matches code with an inline comment (# outside of "strings").
+INLINE_COMMENT_PAT = re.compile(
+    r"""(?:[^'"#]|'(?:\\.|[^'\\])*'|"(?:\\.|[^"\\])*")*#"""
+)
+# Statement attributes with lists of child statements.
+STATEMENT_LISTS = ("body", "orelse", "finalbody", "handlers", "cases")
+
+
+def iterstatements(lst_body):
+    """ Yield all statements (and except handlers) in a syntax tree body,
+        in the order they are found. Expressions are not walked.
+    """
+    lst_stack = list(reversed(lst_body))
+    while lst_stack:
+        node = lst_stack.pop()
+        yield node
+        for sattr in STATEMENT_LISTS:
+            lst_children = getattr(node, sattr, None)
+            if lst_children and isinstance(lst_children, list):
+                lst_stack.extend(reversed(lst_children))
+
+
+def exprname(node):
+    """ Returns a name like 'os.path' or '(ValueError, TypeError)' for
+        a Name/Attribute/Tuple node, or None for other nodes.
+    """
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        sbase = exprname(node.value)
+        return None if sbase is None else sbase + "." + node.attr
+    if isinstance(node, ast.Tuple):
+        lst_names = [exprname(elt) or "?" for elt in node.elts]
+        return "(" + ", ".join(lst_names) + ")"
+    return None
+
+
+def addtargets(res, node):
+    """ Add variable names from an assignment target to a results() object.
+        Subscripts (x[0] = 1) are not variables.
+    """
+    if isinstance(node, (ast.Tuple, ast.List)):
+        for elt in node.elts:
+            addtargets(res, elt)
+    elif isinstance(node, ast.Starred):
+        addtargets(res, node.value)
+    else:
+        additem(res.variables, exprname(node))
+
+
+def analyzetree(ssource):
+    """ Analyze python source code with the ast module. The syntax tree
+        is parsed in C, and only statements are walked, once.
+        Raises SyntaxError for code that ast can't parse.
+        Returns a results() object.
+    """
+    tree = ast.parse(ssource)
+    res = results()
+    # Split lines the same way the parser counts them.
+    lst_lines = ssource.split("\n")
+    if lst_lines[-1] == "":
+        lst_lines.pop()
+    # Line numbers for doc strings and "Quote Comments".
+    set_doc = set()
+    set_quote = set()
+
+    for node in iterstatements(tree.body):
+        nodetype = type(node)
+        if nodetype in (ast.FunctionDef, ast.AsyncFunctionDef):
+            res.ifunction += 1
+        elif nodetype is ast.ClassDef:
+            res.iclass += 1
+        elif nodetype in TRY_NODES:
+            res.itry += 1
+        elif nodetype is ast.ExceptHandler:
+            res.iexcept += 1
+            if node.type is not None:
+                additem(res.exceptions, exprname(node.type))
+            additem(res.variables, node.name)
+        elif nodetype is ast.Import:
+            for alias in node.names:
+                additem(res.imports, alias.name)
+        elif nodetype is ast.ImportFrom:
+            sbase = ("." * node.level) + (node.module or "")
+            if not sbase.endswith("."):
+                sbase += "."
+            for alias in node.names:
+                additem(res.imports, sbase + alias.name)
+        elif nodetype is ast.If:
+            res.iif += 1
+            # else: (elif is another If, on its own line)
+            if node.orelse and not (
+                    len(node.orelse) == 1 and
+                    isinstance(node.orelse[0], ast.If) and
+                    lst_lines[node.orelse[0].lineno - 1].lstrip().startswith(
+                        "elif")):
+                res.iif += 1
+        elif nodetype is ast.Assign:
+            res.iassignment += 1
+            for target in node.targets:
+                addtargets(res, target)
+        elif nodetype is ast.AugAssign or (
+                nodetype is ast.AnnAssign and node.value is not None):
+            res.iassignment += 1
+            addtargets(res, node.target)
+        elif nodetype is ast.Expr:
+            value = node.value
+            if isinstance(value, ast.Call):
+                if getattr(value.func, "id", None) == "print":
+                    res.iprint += 1
+            elif isinstance(value, ast.Constant) and isinstance(
+                    value.value, str):
+                # Statement is a bare string.
+                sline = lst_lines[node.lineno - 1].lstrip()
+                if istriplequoted(sline):
+                    res.idocstring += 1
+                    set_doc.update(range(node.lineno, node.end_lineno + 1))
+                    for sline in lst_lines[node.lineno - 1:node.end_lineno]:
+                        if sline.strip() not in ('"""', "'''"):
+                            res.docstrings.append(sline)
+                else:
+                    set_quote.update(range(node.lineno, node.end_lineno + 1))
+
+    # Classify lines: doc strings, then blank, then comments, then code.
+    res.itotal = len(lst_lines)
+    for ilineno, sline in enumerate(lst_lines, 1):
+        sstripped = sline.strip()
+        if ilineno in set_doc:
+            res.idocstringline += 1
+        elif not sstripped:
+            res.iblank += 1
+        elif (sstripped[0] == "#") or (ilineno in set_quote):
+            res.icommentline += 1
+            if len(sstripped) > res.ilongestcomment:
+                res.ilongestcomment = len(sstripped)
+            if 1 < len(sstripped) < res.ishortestcomment:
+                res.ishortestcomment = len(sstripped)
+                res.s_shortestcomment = sstripped
+        else:
+            res.icode += 1
+            if ("#" in sstripped) and INLINE_COMMENT_PAT.match(sstripped):
+                res.icomment += 1
+            if len(sstripped) > res.ilongest:
+                res.ilongest = len(sstripped)
+            if len(sstripped) < res.ishortest:
+                res.ishortest = len(sstripped)
+                res.s_shortest = sstripped
+
+    res.removeduplicates()
+    res.calculate()
+    return res
+
+
+# Tokenizer Backend ------------------------
+# Tokens that are not code.
+NONCODE_TOKENS = (
+    tokenize.COMMENT,
+    tokenize.NL,
+    tokenize.NEWLINE,
+    tokenize.INDENT,
+    tokenize.DEDENT,
+    tokenize.ENDMARKER,
+)
+# Augmented assignment operators.
+ASSIGNMENT_OPS = (
+    "=", "+=", "-=", "*=", "/=", "//=", "%=", "**=", "@=",
+    ">>=", "<<=", "&=", "^=", "|=",
+)
+
+
+def readsource(sfile):
+    """ Read a file's source code, decoded using the coding cookie
+        (or utf-8).
+    """
+    with open(sfile, 'rb') as fread:
+        data = fread.read()
+    detect_encoding = getattr(tokenize, 'detect_encoding', None)
+    if detect_encoding is None:
+        # Python 2, tokenize works on str.
+        return data
+    sencoding, _ = detect_encoding(io.BytesIO(data).readline)
+    return data.decode(sencoding)
+
+
+def istriplequoted(sstring):
+    """ Returns True if a string token is triple-quoted (with or without
+        a prefix like r or u).
+    """
+    return sstring.lstrip("bBfFrRuU")[:3] in ('"""', "'''")
+
+
+def beforeas(lst_tokens):
+    """ Returns the tokens before an 'as' keyword (import x as y). """
+    for i, (toktype, sval) in enumerate(lst_tokens):
+        if toktype == tokenize.NAME and sval == "as":
+            return lst_tokens[:i]
+    return lst_tokens
+
+
+def dottedname(lst_tokens):
+    """ Returns a name like 'os.path' if the tokens are only names and dots,
+        otherwise None.
+    """
+    if not lst_tokens:
+        return None
+    for i, (toktype, sval) in enumerate(lst_tokens):
+        if i % 2 == 0:
+            if toktype != tokenize.NAME:
+                return None
+        elif sval != ".":
+            return None
+    if len(lst_tokens) % 2 == 0:
+        return None
+    return "".join(sval for _, sval in lst_tokens)
+
+
+def splittokens(lst_tokens, ssep):
+    """ Split a list of (type, value) tokens on an operator, ignoring
+        operators inside of brackets.
+    """
+    lst_parts = [[]]
+    idepth = 0
+    for toktype, sval in lst_tokens:
+        if toktype == tokenize.OP:
+            if sval in "([{":
+                idepth += 1
+            elif sval in ")]}":
+                idepth -= 1
+            elif sval == ssep and idepth == 0:
+                lst_parts.append([])
+                continue
+        lst_parts[-1].append((toktype, sval))
+    return lst_parts
+
+
+def stripbrackets(lst_tokens):
+    """ Remove surrounding parentheses/brackets from a list of tokens. """
+    while (len(lst_tokens) > 1 and lst_tokens[0][1] in "([" and
+           lst_tokens[-1][1] in ")]"):
+        lst_tokens = lst_tokens[1:-1]
+    return lst_tokens
+
+
+def additem(lst, sitem):
+    """ Append an item to a list if it is not empty. Duplicates are
+        removed later by results.removeduplicates().
+    """
+    if sitem:
+        lst.append(sitem)
+
+
+def analyzestatement(res, lst_tokens):
+    """ Count a single logical line (statement) in a results() object.
+        lst_tokens is a list of (type, value) for the code tokens in it.
+    """
+    if not lst_tokens:
+        return
+    sfirst = lst_tokens[0][1]
+    if sfirst == "async" and len(lst_tokens) > 1:
+        sfirst = lst_tokens[1][1]
+
+    if sfirst == "def":
+        res.ifunction += 1
+    elif sfirst == "class":
+        res.iclass += 1
+    elif sfirst == "try":
+        res.itry += 1
+    elif sfirst == "except":
+        res.iexcept += 1
+        # except Exception as ex:
+        lst_parts = splittokens(lst_tokens[1:], ":")[0]
+        lst_exc = beforeas(lst_parts)
+        if len(lst_exc) + 1 < len(lst_parts):
+            additem(res.variables, lst_parts[len(lst_exc) + 1][1])
+        sexc = "".join(sval for _, sval in lst_exc).replace(",", ", ")
+        additem(res.exceptions, sexc)
+    elif sfirst == "import":
+        # import os, os.path as p
+        for lst_part in splittokens(lst_tokens[1:], ","):
+            additem(res.imports, dottedname(beforeas(lst_part)))
+    elif sfirst == "from":
+        # from os import path, sep as s
+        for i, (toktype, sval) in enumerate(lst_tokens):
+            if toktype == tokenize.NAME and sval == "import":
+                break
+        sbase = "".join(sval for _, sval in lst_tokens[1:i])
+        if not sbase.endswith("."):
+            sbase += "."
+        lst_names = stripbrackets(lst_tokens[i + 1:])
+        for lst_part in splittokens(lst_names, ","):
+            if lst_part:
+                additem(res.imports, sbase + lst_part[0][1])
+    elif sfirst == "print":
+        res.iprint += 1
+    elif sfirst in ("if", "elif", "else"):
+        res.iif += 1
+    else:
+        # Assignments (x = 1, x += 1, x: int = 1)
+        lst_parts = []
+        lst_current = []
+        idepth = 0
+        for toktype, sval in lst_tokens:
+            if toktype == tokenize.OP:
+                if sval in "([{":
+                    idepth += 1
+                elif sval in ")]}":
+                    idepth -= 1
+                elif idepth == 0 and sval in ASSIGNMENT_OPS:
+                    lst_parts.append(lst_current)
+                    lst_current = []
+                    continue
+            lst_current.append((toktype, sval))
+        if not lst_parts:
+            return
+        res.iassignment += 1
+        # Everything before the last = is a target.
+        for lst_target in lst_parts:
+            # Remove annotations (x: int = 1)
+            lst_target = splittokens(lst_target, ":")[0]
+            for lst_name in splittokens(stripbrackets(lst_target), ","):
+                additem(res.variables, dottedname(stripbrackets(lst_name)))
+
+
+def analyzetokens(ssource):
+    """ Analyze python source code with the tokenize module, in a single
+        pass. Returns a results() object.
+    """
+    res = results()
+    # Split lines the same way the tokenizer counts them.
+    lst_lines = ssource.split("\n")
+    if lst_lines[-1] == "":
+        lst_lines.pop()
+    readline = partial(next, iter([sline + "\n" for sline in lst_lines]), "")
+    # Line numbers for each kind of line.
+    set_code = set()
+    set_doc = set()
+    set_quote = set()
+    # Comments, by line number.
+    dict_comments = {}
+    # Code tokens for the current statement (logical line).
+    lst_statement = []
+    # First/last line for the current statement, and whether it is only
+    # a string (DocString, or "Quote Comment").
+    istart = None
+    stringtok = None
+
+    for toktype, sval, (srow, _), (erow, _), _ in tokenize.generate_tokens(
+            readline):
+        if toktype == tokenize.COMMENT:
+            dict_comments[srow] = sval
+            continue
+        if toktype in (tokenize.NEWLINE, tokenize.ENDMARKER):
+            if lst_statement:
+                if len(lst_statement) == 1 and stringtok is not None:
+                    # Statement is a bare string.
+                    if istriplequoted(stringtok[1]):
+                        res.idocstring += 1
+                        set_doc.update(range(stringtok[0], stringtok[2] + 1))
+                        for sline in lst_lines[stringtok[0] - 1:stringtok[2]]:
+                            if sline.strip() not in ('"""', "'''"):
+                                res.docstrings.append(sline)
+                    else:
+                        set_quote.update(range(stringtok[0], stringtok[2] + 1))
+                else:
+                    for lst_part in splittokens(lst_statement, ";"):
+                        analyzestatement(res, lst_part)
+                    set_code.update(range(istart, erow + 1))
+            lst_statement = []
+            istart = None
+            stringtok = None
+            continue
+        if toktype in NONCODE_TOKENS:
+            continue
+        if istart is None:
+            istart = srow
+            if toktype == tokenize.STRING:
+                stringtok = (srow, sval, erow)
+        lst_statement.append((toktype, sval))
+
+    # Classify lines: code, then doc strings, then comments, then blank.
+    res.itotal = len(lst_lines)
+    for ilineno, sline in enumerate(lst_lines, 1):
+        if ilineno in set_code:
+            res.icode += 1
+            if ilineno in dict_comments:
+                res.icomment += 1
+            scode = sline.strip()
+            if len(scode) > res.ilongest:
+                res.ilongest = len(scode)
+            if scode and (len(scode) < res.ishortest):
+                res.ishortest = len(scode)
+                res.s_shortest = scode
+        elif ilineno in set_doc:
+            res.idocstringline += 1
+        elif (ilineno in set_quote) or (ilineno in dict_comments):
+            res.icommentline += 1
+            scomment = sline.strip()
+            if len(scomment) > res.ilongestcomment:
+                res.ilongestcomment = len(scomment)
+            if 1 < len(scomment) < res.ishortestcomment:
+                res.ishortestcomment = len(scomment)
+                res.s_shortestcomment = scomment
+        else:
+            res.iblank += 1
+
+    res.removeduplicates()
+    res.calculate()
+    return res
+
+
 # ResultsClass -----------------------------
+# Counters that are added together when results are merged.
+COUNTER_ATTRS = (
+    "itotal", "iblank", "icode", "icomment", "icommentline", "idocstring",
+    "idocstringline", "ifunction", "iclass", "iif", "itry", "iprint",
+    "iassignment", "iexcept",
+)
+# Lists of unique items, in the order they were found.
+UNIQUE_ATTRS = ("variables", "imports", "exceptions")
+
+
 class results():
     def __init__(self):
         """ Build blank class for holding results """
@@ -675,6 +1415,66 @@ class results():
         self.exceptions = []
         self.s_shortest = ""
         self.s_shortestcomment = ""
+
+    def calculate(self):
+        """ Calculate percentages, and fix 'shortest' counts when nothing
+            was found.
+        """
+        if self.ishortest == 999:
+            self.ishortest = 0
+        if self.ishortestcomment == 999:
+            self.ishortestcomment = 0
+        if self.itotal == 0:
+            return self
+        self.icodepercent = (self.icode / float(self.itotal)) * 100
+        self.icommentpercent = (self.icommentline / float(self.itotal)) * 100
+        self.iblankpercent = (self.iblank / float(self.itotal)) * 100
+        self.idocpercent = (self.idocstringline / float(self.itotal)) * 100
+        return self
+
+    def merge(self, *others):
+        """ Add the counts from other results() objects to this one. """
+        self.calculate()
+        for other in others:
+            for sattr in COUNTER_ATTRS:
+                setattr(self, sattr, getattr(self, sattr) + getattr(other, sattr))
+            for sattr in UNIQUE_ATTRS:
+                getattr(self, sattr).extend(getattr(other, sattr))
+            self.docstrings.extend(other.docstrings)
+            self.ilongest = max(self.ilongest, other.ilongest)
+            self.ilongestcomment = max(self.ilongestcomment, other.ilongestcomment)
+            # A shortest count of 0 means nothing was found.
+            if other.ishortest and (
+                    (not self.ishortest) or other.ishortest < self.ishortest):
+                self.ishortest = other.ishortest
+                self.s_shortest = other.s_shortest
+            if other.ishortestcomment and (
+                    (not self.ishortestcomment) or
+                    other.ishortestcomment < self.ishortestcomment):
+                self.ishortestcomment = other.ishortestcomment
+                self.s_shortestcomment = other.s_shortestcomment
+        self.removeduplicates()
+        return self.calculate()
+
+    def removeduplicates(self):
+        """ Remove duplicate variables, imports, and exceptions, keeping the
+            order they were found in.
+        """
+        for sattr in UNIQUE_ATTRS:
+            setattr(self, sattr, list(OrderedDict.fromkeys(getattr(self, sattr))))
+        return self
+
+    def to_dict(self):
+        """ Returns a dict with all results, for JSON output. """
+        return dict(self.__dict__)
+
+    @classmethod
+    def from_dict(cls, dct):
+        """ Build a results() object from a to_dict() dict. """
+        res = cls()
+        res.__dict__.update(dct)
+        return res
+
          
 # Start.Of.Script --------------------------
 if __name__ == '__main__':
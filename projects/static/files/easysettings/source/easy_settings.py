@@ -1,11 +1,14 @@
 #!/usr/bin/env python3
+import json
 import os
 import re
+import shutil
 import sys
 import pickle
+import time
 
 # easy settings version
-__version__ = '2.0.4'
+__version__ = '2.1.0'
 
 # Python 3 compatibility flag
 # ...we need this because pickle likes to use bytes in python 3, and strings
@@ -17,8 +20,10 @@ if sys.version_info.major == 3:
     PYTHON3 = True
     # python 3 needs no long() function.
     long = int
+    string_types = (str, )
 else:
     PYTHON3 = False
+    string_types = (basestring, )  # noqa
 
 
 class __NoValue(object):
@@ -33,6 +38,207 @@ class __NoValue(object):
 # Singleton "not set yet" instance.
 NoValue = __NoValue()
 
+# Config file formats, the default is chosen by file extension.
+FORMAT_CONF = 'conf'
+FORMAT_JSONL = 'jsonl'
+# Key for pickled values in JSON-lines files, for non-JSON types:
+#     ["option", {"__es_pickle__": "<pickled str>"}]
+JSONL_PICKLE_KEY = '__es_pickle__'
+# Values of these types can't be modified in place, so they never need to
+# be checked for changes before saving.
+IMMUTABLE_TYPES = (
+    str, bytes, int, long, float, bool, complex, type(None), tuple,
+    frozenset,
+)
+# Values of these types are saved as-is in JSON-lines files.
+JSON_TYPES = tuple(string_types) + (int, long, float, bool, type(None))
+# Decoder for the option names in JSON-lines files.
+_json_decoder = json.JSONDecoder()
+
+
+class _RawValue(object):
+
+    """ A value that has not been decoded from the config file yet.
+        LazySettings decodes it on first access, and it is written back
+        as-is when saving to the same format.
+    """
+    __slots__ = ('fmt', 'text')
+
+    def __init__(self, text, fmt=FORMAT_CONF):
+        self.text = text
+        self.fmt = fmt
+
+    def decode(self):
+        """ Decode the value from its config file text. """
+        if self.fmt == FORMAT_JSONL:
+            return decode_jsonl_value(self.text)
+        return decode_conf_value(self.text)
+
+
+class LazySettings(dict):
+
+    """ The settings dict for EasySettings.
+        Values from the config file are decoded on first access, and
+        memoized. It also keeps track of changes since the settings were
+        loaded or saved, so EasySettings.save() can skip writing when
+        nothing has changed.
+        Undecoded values are never returned, dict(settings), .items(), and
+        .values() all decode them first.
+    """
+
+    def __init__(self, *args, **kwargs):
+        dict.__init__(self, *args, **kwargs)
+        # True when options have been set/removed since the last load/save.
+        self.changed = bool(self)
+        # {option: (fmt, text)} with the config file text for mutable values
+        # at the last load/save, to tell if they were modified in place.
+        self.snapshots = {}
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        self.changed = True
+
+    def __eq__(self, other):
+        self.decode_all()
+        if isinstance(other, LazySettings):
+            other.decode_all()
+        return dict.__eq__(self, other)
+
+    def __getitem__(self, key):
+        value = dict.__getitem__(self, key)
+        if isinstance(value, _RawValue):
+            return self._decode(key, value)
+        return value
+
+    # dicts with a custom __eq__ are not hashable.
+    __hash__ = None
+
+    def __iter__(self):
+        # Having this makes dict(settings) use __getitem__ for values,
+        # instead of copying undecoded values directly.
+        return iter(dict.keys(self))
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __reduce_ex__(self, protocol):
+        self.decode_all()
+        return dict.__reduce_ex__(self, protocol)
+
+    def __repr__(self):
+        self.decode_all()
+        return dict.__repr__(self)
+
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, value)
+        self.changed = True
+
+    def _decode(self, key, rawvalue):
+        """ Decode a value, and replace the _RawValue with it. """
+        value = rawvalue.decode()
+        dict.__setitem__(self, key, value)
+        if not isinstance(value, IMMUTABLE_TYPES):
+            self.snapshots[key] = (rawvalue.fmt, rawvalue.text)
+        return value
+
+    def clear(self):
+        dict.clear(self)
+        self.snapshots.clear()
+        self.changed = True
+
+    def copy(self):
+        """ Return a shallow copy, without decoding anything. """
+        settings = type(self)()
+        dict.update(settings, dict.items(self))
+        settings.changed = self.changed
+        settings.snapshots = self.snapshots.copy()
+        return settings
+
+    def decode_all(self):
+        """ Decode all values that haven't been decoded yet. """
+        for key, value in list(dict.items(self)):
+            if isinstance(value, _RawValue):
+                self._decode(key, value)
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def is_changed(self):
+        """ Returns True if options were set or removed, or if any mutable
+            value was modified in place, since the last load/save.
+        """
+        if self.changed:
+            return True
+        for key, (fmt, text) in self.snapshots.items():
+            value = dict.get(self, key, NoValue)
+            if isinstance(value, _RawValue):
+                continue
+            if (value is NoValue) or (encode_value(value, fmt) != text):
+                return True
+        return False
+
+    def items(self):
+        self.decode_all()
+        return dict.items(self)
+
+    def load_raw(self, rawsettings):
+        """ Add undecoded settings from parse_conf()/parse_jsonl(). """
+        for key in rawsettings:
+            self.snapshots.pop(key, None)
+        dict.update(self, rawsettings)
+        self.changed = True
+
+    def mark_saved(self, fmt=FORMAT_CONF, snapshots=None):
+        """ Mark the current settings as loaded/saved (not changed).
+            Arguments:
+                fmt       : Format the settings were saved in.
+                snapshots : {option: text} with the saved text for
+                            decoded mutable values.
+        """
+        self.changed = False
+        self.snapshots = {
+            key: (fmt, text)
+            for key, text in (snapshots or {}).items()
+        }
+
+    def pop(self, key, *args):
+        value = dict.pop(self, key, *args)
+        self.snapshots.pop(key, None)
+        self.changed = True
+        if isinstance(value, _RawValue):
+            return value.decode()
+        return value
+
+    def popitem(self):
+        key, value = dict.popitem(self)
+        self.snapshots.pop(key, None)
+        self.changed = True
+        if isinstance(value, _RawValue):
+            return key, value.decode()
+        return key, value
+
+    def raw_items(self):
+        """ Return (key, value) pairs without decoding anything.
+            Values may be _RawValue()s.
+        """
+        return dict.items(self)
+
+    def setdefault(self, key, default=None):
+        if key in self:
+            return self[key]
+        self[key] = default
+        return default
+
+    def update(self, *args, **kwargs):
+        dict.update(self, *args, **kwargs)
+        self.changed = True
+
+    def values(self):
+        self.decode_all()
+        return dict.values(self)
+
 
 class EasySettings(object):
 
@@ -81,7 +287,9 @@ class EasySettings(object):
     # Should stay consistent with the strings in self._build_header().
     confpat = re.compile(r'# Configuration for (.+)')
 
-    def __init__(self, sconfigfile=None, name=None, version=None, header=None):
+    def __init__(
+            self, sconfigfile=None, name=None, version=None, header=None,
+            fmt=None):
         """ Creates new settings object to work with.
             Arguments:
                 sconfigfile  : File name to use for config.
@@ -103,6 +311,11 @@ class EasySettings(object):
                 header       : Extra description/text for the config header.
                                This can be multiline text. It is converted to
                                comments if the lines don't start with '#'.
+                fmt          : Config file format, FORMAT_CONF or
+                               FORMAT_JSONL. JSON-lines files have one
+                               ["option", value] array per line, and no
+                               header. Default: FORMAT_JSONL for '.jsonl'
+                               files, otherwise FORMAT_CONF.
         """
         # application info (add your own here, or by accessing object)
         # like settings = easysettings.EasySettings()
@@ -116,6 +329,13 @@ class EasySettings(object):
         # the '# ' will be added to each line if it's not present.
         self.header = header or None
 
+        # Config file format, or None to choose by file extension.
+        self.fmt = fmt or None
+        # Header text, and (path, size, mtime) for the config file at the
+        # last load/save, to tell when save() needs to write it.
+        self._saved_header = None
+        self._saved_file = None
+
         # default config file (better to set your own file)
         # like: settings.configfile = "myfile.config"
         #   or: settings = easysettings.EasySettings("myfile.config")
@@ -128,7 +348,7 @@ class EasySettings(object):
             self.configfile_exists()
 
         # empty setting dictionary
-        self.settings = {}
+        self.settings = LazySettings()
         # load setting from config file
         self.load_file()
 
@@ -169,12 +389,52 @@ class EasySettings(object):
                 parsed.append('# {}'.format(stripped))
         return '\n'.join(parsed)
 
+    def _build_file_header(self, fmt):
+        """ Build all header lines for the config file, as a string with no
+            trailing newline. JSON-lines files have no header.
+        """
+        if fmt == FORMAT_JSONL:
+            return ''
+        msg = self._build_header()
+        header = self._parse_header()
+        if header:
+            return '\n'.join((msg, header))
+        return msg
+
+    def _get_fmt(self, sfile):
+        """ Return the format to use for a config file. """
+        if self.fmt:
+            return self.fmt
+        if sfile and sfile.endswith('.jsonl'):
+            return FORMAT_JSONL
+        return FORMAT_CONF
+
+    def _mark_saved(self, sfile, header, fmt=FORMAT_CONF, snapshots=None):
+        """ Remember the config file state after a load/save. """
+        self._saved_file = _file_key(sfile)
+        self._saved_header = header
+        if isinstance(self.settings, LazySettings):
+            self.settings.mark_saved(fmt=fmt, snapshots=snapshots)
+
+    def _needs_save(self, sfile, header):
+        """ Returns True if the settings, header, or file have changed since
+            the last load/save.
+        """
+        if not isinstance(self.settings, LazySettings):
+            # Replaced with a plain dict, changes can't be tracked.
+            return True
+        if self.settings.is_changed() or (header != self._saved_header):
+            return True
+        filekey = _file_key(sfile)
+        return (filekey is None) or (filekey != self._saved_file)
+
     def clear(self):
         """ Clears all settings without warning, does not save to disk.
             ex: settings.clear()
         """
 
-        self.settings = {}
+        self.settings = LazySettings()
+        self.settings.changed = True
         return True
 
     def clear_values(self, lst_options=None):
@@ -336,11 +596,8 @@ class EasySettings(object):
         if self.configfile is None:
             return False
 
-        msg = self._build_header()
-        header = self._parse_header()
-
+        header = self._build_file_header(self._get_fmt(self.configfile))
         with open(self.configfile, 'w') as f:
-            f.write('{}\n'.format(msg))
             if header:
                 f.write('{}\n'.format(header))
         return True
@@ -373,7 +630,11 @@ class EasySettings(object):
         new_es.name = self.name
         new_es.version = self.version
         new_es.header = self.header
+        new_es.fmt = self.fmt
         new_es.settings = self.settings.copy()
+        if isinstance(new_es.settings, LazySettings):
+            # Nothing has been saved from the copy yet.
+            new_es.settings.changed = True
         return new_es
 
     def es_version(self):
@@ -571,10 +832,22 @@ class EasySettings(object):
         if not os.path.isfile(self.configfile):
             return False
 
-        settings = self.read_file_noset()
+        fmt = self._get_fmt(self.configfile)
+        with open(self.configfile, 'r') as f:
+            text = f.read()
+        if fmt == FORMAT_JSONL:
+            settings, header = parse_jsonl(text), ''
+        else:
+            settings, header = parse_conf(text)
 
-        for k in settings:
-            self.set(k, settings[k])
+        if not isinstance(self.settings, LazySettings):
+            self.settings = LazySettings(self.settings)
+        if self.settings:
+            # Merged with unsaved settings, the file needs to be saved.
+            self.settings.load_raw(settings)
+        else:
+            self.settings.load_raw(settings)
+            self._mark_saved(self.configfile, header)
         return True
 
     def load_pickle(self, spicklefile=None):
@@ -622,37 +895,19 @@ class EasySettings(object):
                 return {}
             sfile = self.configfile
 
-        tmp_dict = {}
-
         if not os.path.isfile(sfile):
-            return tmp_dict
+            return {}
 
         with open(sfile, 'r') as f:
-            # cycle thru lines
-            for sline in f:
-                # Skip comment lines.
-                if sline.lstrip().startswith('#'):
-                    continue
-
-                # actual setting?
-                try:
-                    eqindex = sline.index('=')
-                except ValueError:
-                    continue
-
-                sopt = sline[:eqindex]
-                sval = sline[eqindex + 1:].replace('(es_nl)', '\n')
-
-                try:
-                    # non-string typed value
-                    val = safe_pickle_obj(sval)
-                except Exception:
-                    # normal string value
-                    val = sval.rstrip()
-                # Valid setting.
-                tmp_dict[sopt] = val
-            # success (filled dict)
-            return tmp_dict
+            text = f.read()
+        if self._get_fmt(sfile) == FORMAT_JSONL:
+            rawsettings = parse_jsonl(text)
+        else:
+            rawsettings, _ = parse_conf(text)
+        return {
+            key: value.decode() if isinstance(value, _RawValue) else value
+            for key, value in rawsettings.items()
+        }
 
     def reload_file(self):
         """ same as load_file, except self.configfile must be set already """
@@ -661,10 +916,15 @@ class EasySettings(object):
         else:
             return self.load_file(self.configfile)
 
-    def save(self, sfile=None):
+    def save(self, sfile=None, force=False):
         """ save config file to disk
             if sfile is given then config is saved to sfile.
             otherwise, config is saved to self.configfile
+
+            Nothing is written if the settings, header, and file haven't
+            changed since the last load/save, unless force is True.
+            The file is written to a temporary file first, and then moved
+            into place, so it is never left half-written.
         """
         if sfile is None:
             if self.configfile is None:
@@ -672,34 +932,40 @@ class EasySettings(object):
             else:
                 sfile = self.configfile
 
-        # Set header line (name and version.)
-        msg = self._build_header()
-        header = self._parse_header()
+        # Set header lines (name and version.)
+        fmt = self._get_fmt(sfile)
+        header = self._build_file_header(fmt)
+        if not (force or self._needs_save(sfile, header)):
+            return True
+
+        if isinstance(self.settings, LazySettings):
+            # Undecoded values are written back as-is.
+            items = self.settings.raw_items()
+        else:
+            items = self.settings.items()
+        if fmt == FORMAT_JSONL:
+            linefmt = '[{}, {}]'.format
+            keyfmt = json.dumps
+        else:
+            linefmt = '{}={}'.format
+            keyfmt = str_
+        lines = [header] if header else []
+        # Saved text for mutable values, to tell if they change in place.
+        snapshots = {}
+        for key, val in items:
+            text = encode_value(val, fmt)
+            if not isinstance(val, (_RawValue, ) + IMMUTABLE_TYPES):
+                snapshots[key] = text
+            lines.append(linefmt(keyfmt(key), text))
+        lines.append('')
 
         try:
-            with open(sfile, 'w') as fwrite:
-                fwrite.write('{}\n'.format(msg))
-                if header:
-                    fwrite.write('{}\n'.format(header))
-                for skey in list(self.settings.keys()):
-                    val = self.settings[skey]
-                    if isinstance(val, str):
-                        sval = val.replace('\n', '(es_nl)')
-                    else:
-                        # try:
-                        sval = safe_pickle_str(val).replace('\n', '(es_nl)')
-                        # except:
-                        #    raise esSaveError('Illegal value!: ' + repr(val))
-
-                    fwrite.write(skey + '=' + sval + '\n')
-                fwrite.flush()
-                # success
-                return True
-            return False
+            write_file_atomic(sfile, '\n'.join(lines))
         except Exception as ex:
-            # failed to open file
+            # failed to write the file
             raise esSaveError(ex)
-            return False
+        self._mark_saved(sfile, header, fmt=fmt, snapshots=snapshots)
+        return True
 
     def save_pickle(self, spicklefile=None):
         """ saves easysettings object into pickle file...
@@ -974,6 +1240,146 @@ class esValueError(esError):
     pass
 
 
+def _file_key(filename):
+    """ Returns (path, size, mtime) for a file, to tell if it has changed,
+        or None if it doesn't exist.
+    """
+    try:
+        st = os.stat(filename)
+    except (IOError, OSError):
+        return None
+    return (
+        os.path.abspath(filename),
+        st.st_size,
+        getattr(st, 'st_mtime_ns', st.st_mtime),
+    )
+
+
+def decode_conf_value(text):
+    """ Decode a value from a config file line (the part after '=').
+        Pickled values are unpickled, anything else is a string.
+    """
+    sval = text.replace('(es_nl)', '\n')
+    # Every pickle ends with a STOP opcode ('.'), so strings without one
+    # don't need to be tried.
+    if '.' in sval:
+        try:
+            # non-string typed value
+            return safe_pickle_obj(sval)
+        except Exception:
+            pass
+    # normal string value
+    return sval.rstrip()
+
+
+def decode_jsonl_value(text):
+    """ Decode a JSON value from a JSON-lines config file. """
+    value = json.loads(text)
+    if (type(value) is dict) and (len(value) == 1) and (
+            JSONL_PICKLE_KEY in value):
+        return safe_pickle_obj(value[JSONL_PICKLE_KEY])
+    return value
+
+
+def encode_conf_value(value):
+    """ Encode a value for a config file line (the part after '='). """
+    if isinstance(value, _RawValue):
+        if value.fmt == FORMAT_CONF:
+            return value.text
+        value = value.decode()
+    if isinstance(value, str):
+        return value.replace('\n', '(es_nl)')
+    return safe_pickle_str(value).replace('\n', '(es_nl)')
+
+
+def encode_value(value, fmt=FORMAT_CONF):
+    """ Encode a value for a config file in the given format. """
+    if fmt == FORMAT_JSONL:
+        return encode_jsonl_value(value)
+    return encode_conf_value(value)
+
+
+def encode_jsonl_value(value):
+    """ Encode a value as JSON for a JSON-lines config file.
+        Values that JSON can't hold (tuples, sets, other objects) are
+        pickled.
+    """
+    if isinstance(value, _RawValue):
+        if value.fmt == FORMAT_JSONL:
+            return value.text
+        value = value.decode()
+    if is_json_value(value):
+        return json.dumps(value)
+    return json.dumps({JSONL_PICKLE_KEY: safe_pickle_str(value)})
+
+
+def is_json_value(value):
+    """ Returns True if a value can be saved as JSON, and loaded again
+        with the same types.
+    """
+    valtype = type(value)
+    if valtype in JSON_TYPES:
+        return True
+    if valtype is list:
+        return all(is_json_value(v) for v in value)
+    if valtype is dict:
+        return all(
+            (type(k) in string_types) and is_json_value(v)
+            for k, v in value.items()
+        ) and not ((len(value) == 1) and (JSONL_PICKLE_KEY in value))
+    return False
+
+
+def parse_conf(text):
+    """ Parse the text from a config file in a single pass.
+        Returns ({option: _RawValue}, header), where header is the comment
+        lines at the top of the file.
+    """
+    settings = {}
+    headerlines = []
+    inheader = True
+    for line in text.split('\n'):
+        sopt, sep, sval = line.partition('=')
+        if ('#' in sopt) and sopt.lstrip().startswith('#'):
+            # Comment line.
+            if inheader:
+                headerlines.append(line)
+            continue
+        inheader = False
+        if sep and sopt:
+            settings[sopt] = _RawValue(sval.rstrip('\r\n'))
+    return settings, '\n'.join(headerlines)
+
+
+def parse_jsonl(text):
+    """ Parse the text from a JSON-lines config file in a single pass.
+        Each line is an ["option", value] array. Other lines are skipped.
+        Returns {option: _RawValue}.
+    """
+    settings = {}
+    for line in text.split('\n'):
+        line = line.strip()
+        if not (line.startswith('[') and line.endswith(']')):
+            continue
+        # Decode the option name only, the value is decoded on first use.
+        try:
+            sopt, end = _json_decoder.raw_decode(line, 1)
+        except ValueError:
+            sopt, end = None, 0
+        rest = line[end:-1].lstrip()
+        if (type(sopt) in string_types) and rest.startswith(','):
+            settings[sopt] = _RawValue(rest[1:].strip(), FORMAT_JSONL)
+            continue
+        # Unusual spacing, decode the whole line.
+        try:
+            item = json.loads(line)
+        except ValueError:
+            continue
+        if (len(item) == 2) and (type(item[0]) in string_types):
+            settings[item[0]] = _RawValue(json.dumps(item[1]), FORMAT_JSONL)
+    return settings
+
+
 def pickled_str(pickle_dumps_returned):
     """ Returns Python 2 and 3 safe string for converting pickle.dumps().
         Will always return String, not Bytes like Python3 wants to.
@@ -982,8 +1388,8 @@ def pickled_str(pickle_dumps_returned):
     """
 
     if PYTHON3:
-        byte_array = bytearray(pickle_dumps_returned)
-        return "".join(chr(int(c)) for c in byte_array)
+        # Each byte is one character.
+        return bytes(pickle_dumps_returned).decode('latin-1')
     else:
         return pickle_dumps_returned
 
@@ -998,7 +1404,8 @@ def safe_pickle_obj(string_):
             my_obj2 = safe_pickle_obj(safe_pickle_str(['my','list', 'obj']))
     """
     if PYTHON3:
-        return pickle.loads(bytearray(string_, 'utf-8'))
+        # The reverse of pickled_str().
+        return pickle.loads(string_.encode('latin-1'))
     else:
         return pickle.loads(string_)
 
@@ -1030,11 +1437,79 @@ def version():
     return __version__
 
 
+def write_file_atomic(filename, text):
+    """ Write text to a temporary file, and move it into place when it's
+        done, keeping the permissions of an existing file.
+    """
+    tmpfile = '{}.{}.tmp'.format(filename, os.getpid())
+    try:
+        with open(tmpfile, 'w') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(filename):
+            shutil.copymode(filename, tmpfile)
+        getattr(os, 'replace', os.rename)(tmpfile, filename)
+    except Exception:
+        if os.path.exists(tmpfile):
+            os.remove(tmpfile)
+        raise
+
+
+def _benchmark(count=10000):
+    """ Time loading, getting, setting, and saving `count` options, for
+        both file formats.
+    """
+    import tempfile
+    tmpdir = tempfile.mkdtemp()
+    values = (
+        'a string value',
+        12345,
+        ['a', 'list', 3],
+        {'a': 'dict'},
+        ('a', 'tuple'),
+        True,
+    )
+
+    def timed(label, func):
+        start = time.time()
+        result = func()
+        print('    {:<28} {:>8.2f}ms'.format(
+            label,
+            (time.time() - start) * 1000
+        ))
+        return result
+
+    print('EasySettings v. {}, {} options:'.format(__version__, count))
+    try:
+        for fmt in (FORMAT_CONF, FORMAT_JSONL):
+            print('\n  {}:'.format(fmt))
+            filename = os.path.join(tmpdir, 'bench.{}'.format(fmt))
+            es = EasySettings(filename, name='Benchmark')
+            for i in range(count):
+                es.set('option{}'.format(i), values[i % len(values)])
+            timed('first save', es.save)
+            es = timed('load', lambda: EasySettings(filename, 'Benchmark'))
+            timed('get 100 options', lambda: [
+                es.get('option{}'.format(i)) for i in range(100)
+            ])
+            timed('save, no changes', es.save)
+            es.set('option0', 'changed')
+            timed('save, 1 change', es.save)
+            timed('get all options', es.list_values)
+            timed('save, all decoded', lambda: es.save(force=True))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
 def _print_help():
     print('EasySettings v. {}\n'.format(__version__))
     print('For help with EasySettings open a python interpreter and type:')
     print('    help(\'easysettings\') or help(\'easysettings.EasySettings\')')
 
 if __name__ == '__main__':
+    if (len(sys.argv) > 1) and (sys.argv[1] == '--benchmark'):
+        _benchmark(*(int(a) for a in sys.argv[2:3]))
+        sys.exit(0)
     _print_help()
     sys.exit(1)
@@ -20,7 +20,7 @@ import urllib
 from easysettings import EasySettings
 from twisted.python import log
 
-from pyval_exec import ExecBox, TimedOut
+from pyval_exec import ExecBox, TimedOut, get_pool
 from pyval_util import (
     NAME,
     VERSION,
@@ -527,6 +527,8 @@ class CommandHandler(object):
                                      reactor_=self.reactor,
                                      task_=self.task,
                                      adminhandler=self.admin)
+        # Start the sandbox workers now, instead of on the first eval.
+        get_pool()
 
     def parse_command(self, msg, username=None):
         """ Parse a message, return corresponding command function if found,
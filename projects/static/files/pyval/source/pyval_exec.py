@@ -28,14 +28,28 @@
 
     Even though these errors might occur, it doesn't mean the bot will die.
     Code is evaluated in a subprocess and is timed. It will fail gracefully.
+
+    Worker Pool:
+        ExecBox.execute() sends code to a WorkerPool of pypy-sandbox
+        processes that are already started (pyval_sandbox.py --worker),
+        instead of waiting for a new one to start for every evaluation.
+        Each worker runs a single job and exits, so nothing one evaluation
+        does (to modules, or the interpreter) can leak into the next one.
+        A replacement is started as soon as a worker is taken.
 """
 from __future__ import print_function
 from tempfile import SpooledTemporaryFile
+import atexit
 import inspect
 import multiprocessing
 import os
+import re
+import select
+import signal
 import subprocess
 import sys
+import threading
+import time
 
 from docopt import docopt
 
@@ -155,6 +169,35 @@ else:
     print('Looked in:\n    {}'.format('\n    '.join(PATH)))
     sys.exit(1)
 
+# Number of sandbox workers kept started.
+POOL_SIZE = 2
+# Header sizes for worker jobs/results. These must match pyval_sandbox.
+JOBHEADERSIZE = 11
+RESULTHEADERSIZE = 21
+
+# Black-listed strings, see: ExecBox.blacklist()
+BLACKLIST = {
+    '__bases__': 'too complicated for this bot.',
+    '__import__': 'no __import__ allowed.',
+    '__subclasses__': 'too complicated for this bot.',
+    'builtin': 'no builtins allowed.',
+    'eval(': 'no eval() allowed.',
+    'exec(': 'no exec() allowed.',
+    'exit': 'no exit allowed.',
+    'help(': 'no help() allowed.',
+    'import': 'no imports allowed.',
+    'KABOOM': 'no way.',
+    'kaboom': 'no way.',
+    'open': 'no open() allowed.',
+    'os.': 'no os module allowed.',
+    'self': 'no self allowed.',
+    'super': 'no super() allowed.',
+    'sys': 'no sys allowed.',
+    'SystemExit': 'no SystemExit allowed.',
+}
+# Matches any black-listed string, so clean input is checked in one pass.
+BLACKLIST_PAT = re.compile('|'.join(re.escape(s) for s in BLACKLIST))
+
 
 class ExecBox(object):
 
@@ -193,34 +236,17 @@ class ExecBox(object):
             PyPy Sandbox already does a good job, so this is unnecessary.
             It's left over from early versions, which were not as strong.
         """
-        badstrings = {
-            '__bases__': 'too complicated for this bot.',
-            '__import__': 'no __import__ allowed.',
-            '__subclasses__': 'too complicated for this bot.',
-            'builtin': 'no builtins allowed.',
-            'eval(': 'no eval() allowed.',
-            'exec(': 'no exec() allowed.',
-            'exit': 'no exit allowed.',
-            'help(': 'no help() allowed.',
-            'import': 'no imports allowed.',
-            'KABOOM': 'no way.',
-            'kaboom': 'no way.',
-            'open': 'no open() allowed.',
-            'os.': 'no os module allowed.',
-            'self': 'no self allowed.',
-            'super': 'no super() allowed.',
-            'sys': 'no sys allowed.',
-            'SystemExit': 'no SystemExit allowed.',
-        }
-        return badstrings
+        return BLACKLIST
 
     def check_blacklist(self):
         """ Checks current inputstr for blacklisted strings. """
-        badstrings = self.blacklist()
-        if self.inputtrim:
-            for badstr, msg in badstrings.items():
-                if badstr in self.inputtrim:
-                    return msg
+        if not self.inputtrim:
+            return None
+        if not BLACKLIST_PAT.search(self.inputtrim):
+            return None
+        for badstr, msg in self.blacklist().items():
+            if badstr in self.inputtrim:
+                return msg
         return None
 
     def check_nesting(self, inputstr):
@@ -246,16 +272,8 @@ class ExecBox(object):
 
         self.parsed = self.parse_input(self.inputstr, stringmode=stringmode)
 
-        # Get locations for pypy-sandbox, sandbox dir, pyval_sandbox.
-
-        parentdir = os.path.split(PYVAL_FILE)[0]
-        sandboxdir = os.path.join(parentdir, 'pyval_sandbox')
-        targetfile = '/tmp/pyval_sandbox.py'
         # Setup command args for Popen.
-        cmdargs = [PYPYSANDBOX_EXE,
-                   '--timeout={}'.format(timeout or self.timeout),
-                   '--tmp={}'.format(sandboxdir),
-                   targetfile]
+        cmdargs = sandbox_args(timeout=timeout or self.timeout)
 
         self.printdebug('running sandbox: {}'.format(' '.join(cmdargs)))
 
@@ -273,6 +291,18 @@ class ExecBox(object):
             pipesend.send(output)
         return output
 
+    def _pooled_exec(self, timeout=None):
+        """ Execute self.parsed using a WorkerPool sandbox.
+            Raises TimedOut on timeout, like timed_call().
+        """
+        self.printdebug('_pooled_exec({})'.format(self.parsed))
+        out, err = get_pool().run(
+            to_bytes(self.parsed),
+            timeout=timeout or self.timeout)
+        return self.pick_output(
+            split_output(to_str(out)),
+            split_output(to_str(err)))
+
     def error_return(self, s):
         """ Set output as error str and return it.
             self.lasterror and self.output will be set to the same thing.
@@ -302,6 +332,9 @@ class ExecBox(object):
                                  Default: self.timeout (5)
                 use_blacklist  : Enable the blacklist (forbidden strings).
                                  Default: False
+                use_pool       : Use a WorkerPool sandbox that is already
+                                 started, instead of a new sandbox process.
+                                 Default: True
         """
 
         evalstr = kwargs.get('evalstr', None)
@@ -313,6 +346,7 @@ class ExecBox(object):
         if timeout is None:
             timeout = 0
         use_blacklist = kwargs.get('use_blacklist', False)
+        use_pool = kwargs.get('use_pool', True)
 
         # Reset last error.
         self.lasterror = None
@@ -343,10 +377,16 @@ class ExecBox(object):
 
         # Actually execute it with fingers crossed.
         try:
-            result = self.timed_call(
-                self._exec,
-                kwargs=execargs,
-                timeout=timeout)
+            if use_pool:
+                self.parsed = self.parse_input(
+                    self.inputstr,
+                    stringmode=stringmode)
+                result = self._pooled_exec(timeout=timeout)
+            else:
+                result = self.timed_call(
+                    self._exec,
+                    kwargs=execargs,
+                    timeout=timeout)
             self.output = str(result)
         except TimedOut:
             return self.error_return('Error: Operation timed out.')
@@ -381,6 +421,28 @@ class ExecBox(object):
 
         return s
 
+    def pick_output(self, outlines, errlines):
+        """ Pick stdout or stderr lines for the final output.
+            Used with proc_output() and _pooled_exec().
+        """
+        if outlines:
+            output = '\n'.join(outlines)
+        else:
+            remove_items(errlines, ['', '\'import site\' failed'])
+            if errlines:
+                output = errlines[-1].strip('\n')
+                if output == 'RuntimeError':
+                    output = 'operation not permitted in the sandbox.'
+                elif output == '[Subprocess killed by SIGIOT]':
+                    output = 'crash! the interpreter choked.'
+            else:
+                output = 'No output.'
+
+        if self.debug:
+            debugout = '\n    '.join(output.split('\n'))
+            self.printdebug('final output:\n    {}'.format(debugout))
+        return output.strip('\n')
+
     def pprint(self, s):
         """ No longer used. DELETE ME. """
         s = str(s)
@@ -419,23 +481,7 @@ class ExecBox(object):
         self.printdebug('err lines:\n    {}'.format('\n    '.join(errlines)))
 
         # Pick stdout or stderr.
-        if outlines:
-            output = '\n'.join(outlines)
-        else:
-            remove_items(errlines, ['', '\'import site\' failed'])
-            if errlines:
-                output = errlines[-1].strip('\n')
-                if output == 'RuntimeError':
-                    output = 'operation not permitted in the sandbox.'
-                elif output == '[Subprocess killed by SIGIOT]':
-                    output = 'crash! the interpreter choked.'
-            else:
-                output = 'No output.'
-
-        if self.debug:
-            debugout = '\n    '.join(output.split('\n'))
-            self.printdebug('final output:\n    {}'.format(debugout))
-        return output.strip('\n')
+        return self.pick_output(outlines, errlines)
 
     def safe_output(self, maxlines=None, maxlength=None):
         """ Retrieves output safe for irc. """
@@ -530,6 +576,92 @@ class ExecBox(object):
         return output
 
 
+class SandboxWorker(object):
+
+    """ A pypy-sandbox/pyval_sandbox process started in worker mode,
+        that waits for a single job sent over its stdin.
+        See: pyval_sandbox.run_worker()
+    """
+
+    def __init__(self):
+        self.proc = subprocess.Popen(
+            sandbox_args(worker=True),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            # pypy-sandbox must pass output along as soon as it is written.
+            env=dict(os.environ, PYTHONUNBUFFERED='1'),
+            # The whole group is killed, see: kill()
+            preexec_fn=os.setsid)
+
+    def alive(self):
+        return self.proc.poll() is None
+
+    def kill(self):
+        """ Kill pypy-sandbox, and the pypy-c-sandbox process it started.
+            Killing pypy-sandbox alone would leave pypy-c-sandbox running
+            when it is stuck in a loop.
+        """
+        try:
+            os.killpg(self.proc.pid, signal.SIGKILL)
+        except OSError:
+            # Already gone.
+            pass
+        self.proc.wait()
+        for pipe in (self.proc.stdin, self.proc.stdout, self.proc.stderr):
+            try:
+                pipe.close()
+            except EnvironmentError:
+                pass
+
+    def read_exact(self, size, deadline=None):
+        """ Read `size` bytes of worker output, unless the worker exits.
+            Raises TimedOut if `deadline` passes first.
+        """
+        fd = self.proc.stdout.fileno()
+        chunks = []
+        while size > 0:
+            if deadline is not None:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise TimedOut('Operation timed out.')
+                readable, _, _ = select.select([fd], [], [], remaining)
+                if not readable:
+                    raise TimedOut('Operation timed out.')
+            chunk = os.read(fd, size)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b''.join(chunks)
+
+    def run(self, source, timeout=None):
+        """ Run source (bytes) in the sandbox.
+            Returns (stdout, stderr) as bytes. If the worker dies, stdout
+            is empty and stderr is whatever pypy-sandbox reported.
+            Raises TimedOut after `timeout` seconds, EnvironmentError
+            if the job can't be sent, and ValueError if the source is too
+            long for the job header.
+        """
+        header = '{:0{}d}\n'.format(len(source), JOBHEADERSIZE - 1).encode()
+        if len(header) != JOBHEADERSIZE:
+            raise ValueError('Source is too long: {}'.format(len(source)))
+        deadline = (time.time() + timeout) if timeout else None
+        self.proc.stdin.write(header + source)
+        self.proc.stdin.flush()
+
+        header = self.read_exact(RESULTHEADERSIZE, deadline=deadline)
+        if len(header) == RESULTHEADERSIZE:
+            outlen, errlen = int(header[:10]), int(header[10:20])
+            out = self.read_exact(outlen, deadline=deadline)
+            err = self.read_exact(errlen, deadline=deadline)
+            if len(out) + len(err) == outlen + errlen:
+                return out, err
+        # The worker died during this job.
+        self.proc.wait()
+        return b'', self.proc.stderr.read()
+
+
 class TempInput(object):
 
     def __init__(self, inputstr):
@@ -552,6 +684,79 @@ class TimedOut(Exception):
     pass
 
 
+class WorkerPool(object):
+
+    """ Keeps SandboxWorkers started and waiting for code, so evaluations
+        don't wait for pypy-sandbox to start.
+        Every worker is retired after one job, so each evaluation gets a
+        fresh interpreter. A replacement is started after every job, so
+        the next one can use it.
+    """
+
+    def __init__(self, size=POOL_SIZE):
+        self.size = size
+        self.idle = []
+        self.lock = threading.Lock()
+        self.fill()
+
+    def __len__(self):
+        return len(self.idle)
+
+    def fill(self):
+        """ Start workers until `size` workers are waiting. """
+        with self.lock:
+            while len(self.idle) < self.size:
+                self.idle.append(SandboxWorker())
+
+    def get_worker(self):
+        """ Take a waiting worker, or start one if none are left. """
+        with self.lock:
+            while self.idle:
+                worker = self.idle.pop(0)
+                if worker.alive():
+                    return worker
+                worker.kill()
+        return SandboxWorker()
+
+    def run(self, source, timeout=None):
+        """ Run source (bytes) with a waiting worker.
+            Returns (stdout, stderr), see: SandboxWorker.run()
+            Raises TimedOut after `timeout` seconds.
+        """
+        worker = self.get_worker()
+        try:
+            try:
+                return worker.run(source, timeout=timeout)
+            except EnvironmentError:
+                # Died while waiting, try once more with a new worker.
+                worker.kill()
+                worker = SandboxWorker()
+                return worker.run(source, timeout=timeout)
+        finally:
+            # Workers are never reused.
+            worker.kill()
+            self.fill()
+
+    def stop(self):
+        """ Kill all waiting workers. """
+        with self.lock:
+            while self.idle:
+                self.idle.pop().kill()
+
+
+# Shared WorkerPool, see: get_pool()
+POOL = None
+
+
+def get_pool():
+    """ Return the shared WorkerPool, starting it on first use. """
+    global POOL
+    if POOL is None:
+        POOL = WorkerPool()
+        atexit.register(POOL.stop)
+    return POOL
+
+
 def print_blacklist():
     """ Prints the current black list for ExecBox """
 
@@ -574,6 +779,51 @@ def remove_items(lst, items):
             lst.remove(s)
 
 
+def sandbox_args(timeout=None, worker=False):
+    """ Return Popen args for pypy-sandbox/pyval_sandbox.
+        pypy-sandbox's --timeout counts time spent waiting on stdin, so
+        it isn't used for workers. SandboxWorker.run() enforces the
+        timeout for them instead.
+    """
+    # Get locations for pypy-sandbox, sandbox dir, pyval_sandbox.
+    parentdir = os.path.split(PYVAL_FILE)[0]
+    sandboxdir = os.path.join(parentdir, 'pyval_sandbox')
+    targetfile = '/tmp/pyval_sandbox.py'
+    cmdargs = [PYPYSANDBOX_EXE]
+    if timeout and not worker:
+        cmdargs.append('--timeout={}'.format(timeout))
+    cmdargs.extend(('--tmp={}'.format(sandboxdir), targetfile))
+    if worker:
+        cmdargs.append('--worker')
+    return cmdargs
+
+
+def split_output(s):
+    """ Split output into lines, like readline() would without the
+        newlines.
+    """
+    if not s:
+        return []
+    if s.endswith('\n'):
+        s = s[:-1]
+    return s.split('\n')
+
+
+def to_bytes(s):
+    """ Encode code for a worker, unless it already is bytes. """
+    if isinstance(s, bytes):
+        return s
+    return s.encode('utf-8')
+
+
+def to_str(b):
+    """ Decode worker output on Python 3. On Python 2 it already is a str.
+    """
+    if isinstance(b, str):
+        return b
+    return b.decode('utf-8', 'replace')
+
+
 def main(args):
     """ Main entry point, expects args from sys. """
     # Parse args to return an arg dict like docopt.
@@ -635,7 +885,8 @@ def main(args):
             raw_output=argd['--raw'],
             stringmode=stringmode,
             use_blacklist=argd['--blacklist'],
-            timeout=timeout)
+            timeout=timeout,
+            use_pool=False)
     except TimedOut:
         print('\nOperation timed out. ({}s)'.format(e.timeout))
     except Exception as ex:
@@ -17,14 +17,30 @@
 
     * pyval_exec._exec() is an example of raw unprotected use.
     * pyval_exec.execute() is an example of blacklisted input use.
+
+    Worker mode (pyval_sandbox.py --worker):
+        Runs a single job, so pyval_exec.WorkerPool can start the sandbox
+        before the job is ready. The job is sent as an 11-byte length
+        header ('%010d\\n'), and then the source. The result is sent back
+        as a header with the stdout and stderr lengths ('%010d%010d\\n'),
+        and then both outputs.
+        A worker is never reused, so one job can't change what another
+        job sees.
 """
 
 from code import InteractiveInterpreter
+import os
 import sys
 
+try:
+    from StringIO import StringIO
+except ImportError:
+    # Python 3.
+    from io import StringIO
+
 
 NAME = 'pyval_sandbox.py'
-VERSION = '1.0.1'
+VERSION = '1.1.0'
 VERSIONSTR = '{} v. {}'.format(NAME, VERSION)
 
 
@@ -42,6 +58,9 @@ dumblocals = {'__builtins__': None,
 for okmodule in whitelist_modules:
     dumblocals[okmodule] = __import__(okmodule)
 
+# Size of the length headers in worker mode.
+HEADERSIZE = 11
+
 
 class Compiler(InteractiveInterpreter):
 
@@ -73,10 +92,24 @@ class Compiler(InteractiveInterpreter):
         sys.stdout.write('{}'.format(exception))
 
 
-def main(args):
-    """ Main entry point, expects args from sys. """
-    # Read python source from stdin.
-    source = sys.stdin.read()
+def read_exact(size):
+    """ Read exactly `size` bytes from stdin, unless it is closed.
+        os.read() is used because pypy-sandbox blocks until it has every
+        byte that was asked for, and a file's read-ahead would wait for
+        bytes that won't be sent until this job is done.
+    """
+    chunks = []
+    while size > 0:
+        chunk = os.read(0, size)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def run_source(source):
+    """ Compile and run source, output goes to stdout/stderr. """
     compiler = Compiler(locals=dumblocals)
     try:
         if '\n' in source:
@@ -95,5 +128,49 @@ def main(args):
             compiler.send_error('incomplete source.')
 
 
+def to_bytes(s):
+    """ Encode output for the pipe, unless it already is bytes. """
+    if isinstance(s, bytes):
+        return s
+    return s.encode('utf-8')
+
+
+def run_worker():
+    """ Run a single job from stdin. See: Worker mode. """
+    header = read_exact(HEADERSIZE)
+    if len(header) < HEADERSIZE:
+        # Closed without a job.
+        return None
+    source = read_exact(int(header))
+    if not isinstance(source, str):
+        # Python 3.
+        source = source.decode('utf-8')
+    stdout, stderr = sys.stdout, sys.stderr
+    sys.stdout, sys.stderr = StringIO(), StringIO()
+    try:
+        run_source(source)
+    except SystemExit as ex:
+        if ex.code not in (None, 0):
+            sys.stderr.write('{}\n'.format(ex.code))
+    finally:
+        out = to_bytes(sys.stdout.getvalue())
+        err = to_bytes(sys.stderr.getvalue())
+        sys.stdout, sys.stderr = stdout, stderr
+    os.write(1, b''.join((
+        '{:010d}{:010d}\n'.format(len(out), len(err)).encode(),
+        out,
+        err,
+    )))
+
+
+def main(args):
+    """ Main entry point, expects args from sys. """
+    if '--worker' in args:
+        run_worker()
+        return 0
+    # Read python source from stdin.
+    run_source(sys.stdin.read())
+
+
 if __name__ == '__main__':
     sys.exit(main(sys.argv[1:]))
@@ -1,7 +1,9 @@
 import logging
 
+from django.db.models import F
 from django.views.decorators.cache import cache_page
 
+from projects.catalog import get_catalog
 from projects.models import wp_project
 
 from wp_main.utilities import responses
@@ -21,7 +23,7 @@ def view_index(request):
     # Hince the complication and mess.
 
     # get all projects if project is not disabled
-    all_projects = wp_project.objects.filter(disabled=False).order_by('name')
+    all_projects = get_catalog().projects
 
     if not all_projects:
         alertmsg = 'Sorry, no projects yet.'
@@ -67,11 +69,14 @@ def view_project(request, project, requested_page, source=None):
         # this will tell the template to add the screenshots javascript.
         use_screenshots = project.screenshot_dir != ''
         # keep track of how many times this has been viewed.
-        project.view_count += 1
-        project.save()
+        # This doesn't save() the shared catalog project, or signal a
+        # catalog rebuild.
+        wp_project.objects.filter(id=project.id).update(
+            view_count=F('view_count') + 1
+        )
 
     # Grab projects list for vertical menu
-    all_projects = wp_project.objects.filter(disabled=False).order_by('name')
+    all_projects = get_catalog().projects
     context = {
         'requested_page': requested_page,
         'projects': all_projects,
@@ -119,42 +124,19 @@ def request_name(request, name):
 def get_byname(name):
     """ safely retrieve project by name
         returns None on failure. """
-
-    try:
-        proj = wp_project.objects.get(name=name, disabled=False)
-        return proj
-    except wp_project.DoesNotExist:
-        # long search..
-        name = name.lower().replace(' ', '')
-        for proj in wp_project.objects.filter(disabled=False):
-            projname = proj.name.lower().replace(' ', '')
-            if projname == name:
-                return proj
-        return None
-    except Exception:
-        return None
+    return get_catalog().get_byname(name)
 
 
 def get_byalias(alias):
     """ safely retrieve project by alias
         returns None on failure. """
-
-    try:
-        proj = wp_project.objects.get(alias=alias, disabled=False)
-        return proj
-    except (wp_project.DoesNotExist, Exception):
-        return None
+    return get_catalog().get_byalias(alias)
 
 
 def get_byid(_id):
     """ safely retrieve project by id
         returns None on failure. """
-
-    try:
-        proj = wp_project.objects.get(id=_id, disabled=False)
-        return proj
-    except (wp_project.DoesNotExist, Exception):
-        return None
+    return get_catalog().get_byid(_id)
 
 
 def get_withmatches(identifier):
@@ -163,45 +145,21 @@ def get_withmatches(identifier):
         return list of possible close matches on failure
     """
     identifiers = str(identifier).split(' ')
-
-    # Try alias.
-    proj = get_byalias(identifiers[0])
-    if proj and not proj.disabled:
-        return proj
-
-    # Try name
-    proj = get_byname(' '.join(identifiers))
-    if proj and not proj.disabled:
+    catalog = get_catalog()
+
+    # Try alias, name, and then id.
+    proj = (
+        catalog.get_byalias(identifiers[0]) or
+        catalog.get_byname(' '.join(identifiers)) or
+        catalog.get_byid(identifiers[0])
+    )
+    if proj is not None:
         return proj
 
-    # Try id.
-    try:
-        _id = int(identifiers[0])
-    except (TypeError, ValueError):
-        pass
-    else:
-        proj = get_byid(_id)
-        if proj and not proj.disabled:
-            return proj
-
     # Search for matches
     return search_projects(identifiers)
 
 
-def match_items(query, items):
-    """ Does 'if query in item or item in query' for each
-        item in items.
-        Ex:
-            matched = match_items('test', ('testing', 'es', 'blah'))
-            # Returns True on 'testing', but would also return true on 'es'
-            # because 'test' is in 'testing', and 'es' is in 'test'.
-    """
-    for item in items:
-        if (query in item) or (item in query):
-            return True
-    return False
-
-
 def search_projects(identifiers):
     """ Searches all project attributes, trys to match identifiers string.
         Looks at name, alias, description, and id.
@@ -209,25 +167,4 @@ def search_projects(identifiers):
 
         Returns set of project matches, or empty set when nothing matches.
     """
-    matches = set()
-    # Try all words in identifier seperately
-    projects = wp_project.objects.filter(disabled=False).order_by('name')
-    # A map of project -> searchable strings
-    searchable = {
-        p: (
-            p.name.lower().replace(' ', ''),
-            p.alias.lower(),
-            p.description.lower().replace(' ', ''),
-            str(p.id)
-        )
-        for p in projects
-    }
-
-    for project in searchable:
-        for word in identifiers:
-            searchword = str(word).lower()
-            # Attributes to search, lowered and trimmed when applicable.
-            # try matching in various ways
-            if match_items(searchword, searchable[project]):
-                matches.add(project)
-    return matches
+    return get_catalog().search(identifiers)
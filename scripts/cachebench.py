@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+""" cachebench.py
+    Benchmarks the configured cache backends using the site's own pages.
+
+    Every page in the sitemap is rendered once (with the test client) to
+    build the page mix. Then the same weighted stream of page requests is
+    replayed against each backend, doing what the cache middleware does:
+    a get() for every request, and a set() of the response on a miss.
+"""
+
+import os
+import random
+import sys
+import time
+from bisect import bisect
+from itertools import accumulate
+
+from docopt import docopt
+
+NAME = 'WpCacheBench'
+VERSION = '0.0.1'
+VERSIONSTR = '{} v. {}'.format(NAME, VERSION)
+SCRIPT = os.path.split(sys.argv[0])[-1]
+
+USAGESTR = """{versionstr}
+    Usage:
+        {script} [-h | -v]
+        {script} [-n num] [-s seed] [CACHE...]
+
+    Options:
+        CACHE                 : Cache names from settings.CACHES to test.
+                                Default: cache_db cache_file
+        -h,--help             : Show this help message.
+        -n num,--number num   : Number of page requests to replay.
+                                Default: 5000
+        -s seed,--seed seed   : Random seed for the request stream.
+                                Default: 0
+        -v,--version          : Show version.
+""".format(script=SCRIPT, versionstr=VERSIONSTR)
+
+# Setup django environment
+try:
+    try:
+        # Import style for django.
+        from scripts import django_init
+    except ImportError:
+        # Import style for cmdline.
+        import django_init
+    if not django_init.init_django():
+        sys.exit(1)
+except ImportError as eximp:
+    print('\nUnable to import django_init.py!:\n{}'.format(eximp))
+    sys.exit(1)
+except Exception as ex:
+    print('\nUnable to initialize django environment!:\n{}'.format(ex))
+    sys.exit(1)
+
+from django.core.cache import caches  # noqa
+from django.test import Client  # noqa
+from wp_main.sitemaps import sitemaps  # noqa
+
+DEFAULT_CACHES = ('cache_db', 'cache_file')
+
+
+def main(argd):
+    """ Main entry point, expects doctopt arg dict as argd """
+    cachenames = argd['CACHE'] or DEFAULT_CACHES
+    try:
+        count = int(argd['--number'] or 5000)
+        seed = int(argd['--seed'] or 0)
+    except ValueError as ex:
+        print('\nInvalid number: {}'.format(ex))
+        return 1
+
+    pages = get_page_mix()
+    if not pages:
+        print('\nNo pages were rendered, nothing to benchmark.')
+        return 1
+    totalsize = sum(len(content) for _, content, _ in pages)
+    print('\nPage mix: {} pages, {:.1f}KB total.'.format(
+        len(pages),
+        totalsize / 1024
+    ))
+    stream = build_stream(pages, count, seed=seed)
+
+    for cachename in cachenames:
+        try:
+            cache = caches[cachename]
+        except Exception as ex:
+            print('\nUnable to load cache: {}\n  {}'.format(cachename, ex))
+            continue
+        print_result(cachename, bench_cache(cache, stream))
+    return 0
+
+
+def bench_cache(cache, stream):
+    """ Replay a request stream against a cache.
+        Returns a dict with timing info.
+    """
+    prefix = 'wp_cachebench.{}.'.format(time.time())
+    hits = misses = 0
+    gettime = settime = 0.0
+    for url, content in stream:
+        key = ''.join((prefix, url))
+        start = time.perf_counter()
+        value = cache.get(key)
+        gettime += time.perf_counter() - start
+        if value is not None:
+            hits += 1
+            continue
+        misses += 1
+        start = time.perf_counter()
+        cache.set(key, content)
+        settime += time.perf_counter() - start
+
+    for url in set(url for url, _ in stream):
+        cache.delete(''.join((prefix, url)))
+
+    total = gettime + settime
+    return {
+        'requests': len(stream),
+        'hits': hits,
+        'misses': misses,
+        'get_time': gettime,
+        'set_time': settime,
+        'total_time': total,
+        'per_request': (total / len(stream)) if stream else 0,
+    }
+
+
+def build_stream(pages, count, seed=0):
+    """ Build a list of (url, content) for `count` page requests,
+        weighted by sitemap priority.
+    """
+    rand = random.Random(seed)
+    cumweights = list(accumulate(weight for _, _, weight in pages))
+    total = cumweights[-1]
+    stream = []
+    for _ in range(count):
+        url, content, _ = pages[bisect(cumweights, rand.random() * total)]
+        stream.append((url, content))
+    return stream
+
+
+def get_page_mix():
+    """ Render every page in the sitemap, returning a list of
+        (url, content, weight).
+    """
+    client = Client()
+    protocol, domain = 'http', 'testserver'
+    pages = []
+    for section in sitemaps.SITEMAP_SECTIONS:
+        for smurl in section.build_urls(protocol, domain):
+            response = client.get(smurl.rel_location)
+            if response.status_code != 200:
+                continue
+            pages.append((
+                smurl.rel_location,
+                response.content,
+                float(smurl.priority),
+            ))
+    return pages
+
+
+def print_result(cachename, result):
+    """ Print timing info from bench_cache(). """
+    print('\n'.join((
+        '\n{name}:',
+        '    requests: {requests} ({hits} hits, {misses} misses)',
+        '    get time: {get_time:.4f}s',
+        '    set time: {set_time:.4f}s',
+        '       total: {total_time:.4f}s',
+        ' per request: {per_request_ms:.4f}ms',
+    )).format(
+        name=cachename,
+        per_request_ms=result['per_request'] * 1000,
+        **result
+    ))
+
+
+if __name__ == '__main__':
+    mainret = main(docopt(USAGESTR, version=VERSIONSTR))
+    sys.exit(mainret)
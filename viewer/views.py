@@ -5,6 +5,8 @@ from django.http import Http404
 
 # DEBUG?
 from django.conf import settings
+# View counters
+from django.db.models import F
 
 # Django decorators
 from django.views.decorators.csrf import csrf_protect
@@ -15,6 +17,7 @@ from wp_main.utilities import utilities, responses
 from downloads import dltools
 # For retrieving project information (source viewing)
 from projects import tools as ptools
+from projects.models import wp_project
 # Misc object info
 from misc import tools as misctools
 
@@ -214,8 +217,9 @@ def get_file_info(file_path):
     # Update project view count tracker
     miscobj = None
     if project:
-        project.view_count += 1
-        project.save()
+        wp_project.objects.filter(id=project.id).update(
+            view_count=F('view_count') + 1
+        )
     else:
         # Not a project, may be a Misc Object.
         miscobj = misctools.get_by_filename(file_path)
@@ -224,7 +228,7 @@ def get_file_info(file_path):
         # Update misc view count tracker
         if miscobj:
             miscobj.view_count += 1
-            miscobj.save()
+            miscobj.save(update_fields=['view_count'])
         else:
             log.debug(
                 'get_file_content: not a project or misc object: {}'.format(
@@ -241,7 +245,10 @@ def get_file_info(file_path):
                     dosave=False
                 )
             filetracker.view_count += 1
-            filetracker.save()
+            if filetracker.pk is None:
+                filetracker.save()
+            else:
+                filetracker.save(update_fields=['view_count'])
 
     # Get file content
     try:
@@ -29,6 +29,8 @@ BASE_DIR = os.path.split(SCRIPT_PARENT)[0]
 BASE_PARENT = os.path.split(BASE_DIR)[0]
 # File for list of IP's to ban.
 SECRET_BAN_FILE = os.path.join(BASE_DIR, 'wp_banned.lst')
+# Seconds between checks for changes to the ban file.
+BAN_RELOAD_INTERVAL = 2
 # Load secretive settings.
 SECRETS = settings_local.SecretSettings(BASE_DIR)
 # Server/Site info.
@@ -63,19 +65,35 @@ CACHES = {
 
     'cache_dummy': {
         'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
-    }
+    },
+
+    # Sharded file cache, shared by all mod_wsgi processes, with LRU culling.
+    'cache_file': {
+        'BACKEND': 'wp_main.utilities.filecache.ShardedFileCache',
+        'LOCATION': os.path.join(BASE_DIR, 'wp_cache'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+            'MAX_SIZE': 128 * 1024 * 1024,
+            'SHARDS': 16,
+        },
+    },
 }
 
 # Set which cache to use.
 if 'webapps' in BASE_PARENT and ('test' not in BASE_PARENT):
-    # Use db cache for live site.
-    CACHES['default'] = CACHES['cache_db']
+    # Use the file cache for live site (no db queries for cache hits).
+    CACHES['default'] = CACHES['cache_file']
 else:
     # Use dummy cache for local development, and test site.
     CACHES['default'] = CACHES['cache_dummy']
 # Tell django_user_agents which cache to use.
 USER_AGENTS_CACHE = 'default'
 
+# Max urls in one sitemap before sitemap.xml becomes a sitemap index.
+SITEMAP_MAX_URLS = 50000
+# Seconds to cache rendered sitemaps (they are invalidated on saves anyway).
+SITEMAP_CACHE_TIMEOUT = 60 * 60 * 24
+
 # main app (location of settings.py)
 MAIN_DIR = os.path.join(BASE_DIR, 'wp_main')
 
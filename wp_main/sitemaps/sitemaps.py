@@ -6,49 +6,106 @@
     Builds a sitemap.xml from wp apps/objects, and provides a Django view
     for serving it.
 
+    Apps add urls to the sitemap by defining a sitemap.py module
+    (see `must_implement` below). Each app is a 'section' of the sitemap.
+    Rendered sections are cached per (protocol, domain), and a section is
+    only rebuilt after one of its models is saved or deleted.
+
+    When there are more than settings.SITEMAP_MAX_URLS urls, sitemap.xml
+    becomes a sitemap index, pointing to /sitemap-<section>-<page>.xml.
+    Any sitemap can be requested gzipped by adding '.gz' to the url.
+
     -Christopher Welborn <cj@welbornprod.com> 4-3-2013
 """
 
-# TODO: This should be like searcher or updater, where apps define a
-#       sitemap.py and define what they want included in the sitemap.
-
+import gzip
 import logging
-
-# For today's date
+import time
 from datetime import date
+from hashlib import md5
 
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.http import Http404, HttpResponse
+from django.template import loader
 # django cache stuff
 from django.views.decorators.cache import never_cache
 
-# xml_response.
-from wp_main.utilities import responses
-# Local models to build urls.
-from apps.models import wp_app
-from blogger.models import wp_blog
-from img.models import wp_image
-from misc.models import wp_misc
-from projects.models import wp_project
+from wp_main.utilities import htmltools, responses, utilities
 
 log = logging.getLogger('wp.sitemaps')
 
+# Apps must have a sitemap.py module that implements these attributes:
+must_implement = (
+    # Desc: Yields SitemapUrl()s for the app.
+    # Signature: build_urls(protocol, domain)
+    'build_urls',
+
+    # Desc: Models that invalidate the app's cached sitemap when they are
+    #       saved or deleted.
+    # Ex: models = (wp_blog, )
+    'models',
+)
+
+# Saves that only update these fields don't invalidate a sitemap section.
+COUNTER_FIELDS = frozenset(('download_count', 'view_count'))
+
+# Set at end of init. (See bottom.)
+SITEMAP_SECTIONS = None
+
+
+@never_cache
+def view_sitemap(request, gz=None):
+    """ Delivers sitemap for current domain.
+        This is a sitemap index if there are too many urls for one sitemap.
+    """
+    protocol, domain = get_protocol_domain(request)
+    if not domain:
+        return sitemap_response('', gz=gz)
+
+    sections = SITEMAP_SECTIONS
+    genkey = '.'.join(s.get_generation() for s in sections)
+    content = get_cached(
+        'wp_sitemaps.document',
+        genkey,
+        protocol,
+        domain,
+        gz,
+        builder=lambda: build_document(sections, protocol, domain),
+    )
+    return sitemap_response(content, gz=gz)
+
 
 @never_cache
-def view_sitemap(request):
-    """ Delivers sitemap for current domain using sitemap.xml template """
-
-    # return xml sitemap response
-    return responses.xml_response(
-        'sitemaps/sitemap.xml',
-        context={
-            'url_list': [sm_url for sm_url in build_urls(request)]
-        },
-        request=request,
-        comments=False,
+def view_sitemap_section(request, section, page, gz=None):
+    """ Delivers one page of a section's sitemap. """
+    protocol, domain = get_protocol_domain(request)
+    if not domain:
+        return sitemap_response('', gz=gz)
+    sitemapsection = get_section(section)
+    if sitemapsection is None:
+        raise Http404('No sitemap for: {}'.format(section))
+    chunks = sitemapsection.get_chunks(protocol, domain)
+    try:
+        page = int(page)
+        count, urls_xml = chunks[page - 1]
+    except (IndexError, ValueError):
+        raise Http404('No sitemap page for: {} ({})'.format(section, page))
+
+    content = get_cached(
+        'wp_sitemaps.{}.{}'.format(sitemapsection.name, page),
+        sitemapsection.get_generation(),
+        protocol,
+        domain,
+        gz,
+        builder=lambda: render_urlset(urls_xml),
     )
+    return sitemap_response(content, gz=gz)
 
 
 @never_cache
-def view_blank_sitemap(request):
+def view_blank_sitemap(request, **kwargs):
     """ Delivers a blank sitemap
         (for servers that don't need a sitemap like the test-server).
     """
@@ -57,7 +114,7 @@ def view_blank_sitemap(request):
 
 
 @never_cache
-def view_byserver(request):
+def view_byserver(request, gz=None):
     """ Decides which sitemap to deliver according to server.
         sends blank sitemap to server with names starting with 'test.'
     """
@@ -67,51 +124,50 @@ def view_byserver(request):
         return view_blank_sitemap(request)
 
     # normal sitemap.
-    return view_sitemap(request)
-
+    return view_sitemap(request, gz=gz)
 
-def build_app_urls(protocol, domain):
-    """ Yields SitemapUrl()s for all web apps. """
-    # build apps urls.
-    apps = wp_app.objects.filter(
-        disabled=False,
-        admin_only=False)
-    for app in apps.order_by('name'):
-        yield SitemapUrl(
-            rel_location='/apps/{}'.format(app.alias),
-            protocol=protocol,
-            domain=domain,
-            changefreq='monthly',
-            lastmod=str(app.publish_date),
-            priority='0.9'
-        )
 
+@never_cache
+def view_section_byserver(request, section, page, gz=None):
+    """ Like view_byserver(), but for a single sitemap section page. """
+    server_name = request.META['SERVER_NAME']
+    if server_name.startswith('test.'):
+        return view_blank_sitemap(request)
 
-def build_blog_urls(protocol, domain):
-    """ Yields SitemapUrl()s for all blog posts. """
-    for post in wp_blog.objects.filter(disabled=False).order_by('-posted'):
-        yield SitemapUrl(
-            rel_location='/blog/view/{}'.format(post.slug),
-            protocol=protocol,
-            domain=domain,
-            changefreq='never',
-            lastmod=str(post.posted),
-            priority='0.5'
-        )
+    return view_sitemap_section(request, section, page, gz=gz)
 
 
-def build_img_urls(protocol, domain):
-    """ Yields SitemapUrl()s for all img posts. """
-    imgs = wp_image.objects.filter(disabled=False, private=False)
-    for img in imgs.order_by('-publish_date'):
-        yield SitemapUrl(
-            rel_location='/img?id={}'.format(img.image_id),
-            protocol=protocol,
-            domain=domain,
-            changefreq='never',
-            lastmod=str(img.publish_date.date()),
-            priority='0.5'
-        )
+def build_document(sections, protocol, domain):
+    """ Build the main sitemap.xml content.
+        Returns a urlset with all urls if there are few enough,
+        otherwise returns a sitemap index.
+    """
+    allchunks = [(s, s.get_chunks(protocol, domain)) for s in sections]
+    total = sum(
+        count
+        for _, chunks in allchunks
+        for count, _ in chunks
+    )
+    if total <= settings.SITEMAP_MAX_URLS:
+        return render_urlset(''.join(
+            urls_xml
+            for _, chunks in allchunks
+            for _, urls_xml in chunks
+        ))
+
+    locations = []
+    for section, chunks in allchunks:
+        for page in range(1, len(chunks) + 1):
+            locations.append(''.join((
+                protocol,
+                '://',
+                domain,
+                '/sitemap-{}-{}.xml'.format(section.name, page)
+            )))
+    return render_template(
+        'sitemaps/sitemap_index.xml',
+        {'sitemap_list': locations}
+    )
 
 
 def build_main_urls(protocol, domain):
@@ -140,33 +196,6 @@ def build_main_urls(protocol, domain):
         )
 
 
-def build_misc_urls(protocol, domain):
-    """ Yields SitemapUrl()s for all misc objects. """
-    # build misc urls.
-    for misc in wp_misc.objects.filter(disabled=False).order_by('name'):
-        yield SitemapUrl(
-            rel_location='/misc/{}'.format(misc.alias),
-            protocol=protocol,
-            domain=domain,
-            changefreq='monthly',
-            lastmod=str(misc.publish_date),
-            priority='0.8'
-        )
-
-
-def build_project_urls(protocol, domain):
-    """ Yields SitemapUrl()s for all project pages. """
-    for proj in wp_project.objects.filter(disabled=False).order_by('name'):
-        yield SitemapUrl(
-            rel_location='/projects/{}'.format(proj.alias),
-            protocol=protocol,
-            domain=domain,
-            changefreq='monthly',
-            lastmod=str(proj.publish_date),
-            priority='0.9'
-        )
-
-
 def build_urls(request):
     """ builds a list of SitemapUrl() containing:
         Full URL, Change Frequency, Last Modified Date
@@ -177,42 +206,249 @@ def build_urls(request):
         and the domain name.
         (for building location urls: http://mysite.com/projects/myproject)
 
+        This is not cached, the views use SitemapSection.get_chunks().
         returns list of SitemapUrl()
     """
-
+    protocol, domain = get_protocol_domain(request)
+    if not domain:
+        return
+    for section in SITEMAP_SECTIONS:
+        yield from section.build_urls(protocol, domain)
+
+
+def get_cached(prefix, generation, protocol, domain, gz, builder):
+    """ Get sitemap content from the cache, or build and cache it.
+        Arguments:
+            prefix      : Cache key prefix for this content.
+            generation  : Generation string, changes when content changes.
+            protocol    : Protocol used to build urls.
+            domain      : Domain used to build urls.
+            gz          : Whether the content should be gzipped (bytes).
+            builder     : Function that returns the content (str).
+    """
+    key = '.'.join((
+        prefix,
+        md5('{}:{}:{}'.format(generation, protocol, domain).encode())
+        .hexdigest(),
+        'gz' if gz else 'xml',
+    ))
+    content = cache.get(key)
+    if content is None:
+        content = builder()
+        if gz:
+            content = gzip.compress(content.encode('utf-8'))
+        cache.set(key, content, settings.SITEMAP_CACHE_TIMEOUT)
+    return content
+
+
+def get_protocol_domain(request):
+    """ Determine the protocol (http/https) and domain for a request.
+        Returns (protocol, None) if the domain couldn't be determined.
+    """
     try:
         # get protocol
         protocol = 'https' if request.is_secure() else 'http'
     except Exception as ex:
         errfmt = 'build_urls: unable to determine request.is_secure():\n  {}'
         log.error(errfmt.format(ex))
+        return None, None
+
+    # Find server name (.com or .info)
+    serverattrs = (
+        'HTTP_X_FORWARDED_HOST',
+        'HTTP_X_FORWARDED_SERVER',
+        'HTTP_HOST'
+    )
+    domain = None
+    for serverattr in serverattrs:
+        if serverattr in request.META.keys():
+            # get domain
+            domain = request.META[serverattr]
+            if domain:
+                break
+
+    # Unable to retrieve server name from request.
+    if not domain:
+        log.error('build_urls: unable to retrieve domain name!')
+    return protocol, domain
+
+
+def get_section(name):
+    """ Return a SitemapSection by name, or None if it doesn't exist. """
+    for section in SITEMAP_SECTIONS:
+        if section.name == name:
+            return section
+    return None
+
+
+def get_sitemap_apps():
+    """ Returns only apps that implement a sitemap.py. """
+    return utilities.get_apps(
+        include=is_sitemap_module,
+        child='sitemap')
+
+
+def get_sitemap_sections():
+    """ Build a SitemapSection for the main urls, and for every app
+        with a sitemap.py. Also connects the signals that invalidate
+        each section.
+    """
+    sections = [MainSitemapSection('main', build_main_urls)]
+    for sitemapmod in get_sitemap_apps():
+        appname = sitemapmod.__name__.rpartition('.')[0]
+        sections.append(SitemapSection(
+            appname.replace('.', '_'),
+            sitemapmod.build_urls,
+            models=sitemapmod.models,
+        ))
+    for section in sections:
+        section.connect_signals()
+    return sections
+
+
+def is_sitemap_module(sitemapmod):
+    """ Checks whether a sitemap.py implements all the must-have attributes.
+    """
+    # Sitemaps can be disabled simply by putting 'disabled = True' in the
+    # module.
+    if getattr(sitemapmod, 'disabled', False):
+        return False
+
+    missing = [a for a in must_implement if not hasattr(sitemapmod, a)]
+    if missing:
+        name = getattr(sitemapmod, '__name__', '<unknown>')
+        log.error('Module {} is missing sitemap attributes:\n    {}'.format(
+            name,
+            '\n    '.join(missing)
+        ))
+        return False
+    return True
+
+
+def render_template(template_name, context):
+    """ Render a sitemap template to a string, without comments. """
+    return htmltools.remove_comments(
+        loader.get_template(template_name).render(context)
+    )
+
+
+def render_urlset(urls_xml):
+    """ Wrap pre-rendered <url> elements in a urlset. """
+    return render_template('sitemaps/sitemap.xml', {'urls_xml': urls_xml})
+
+
+def sitemap_response(content, gz=None):
+    """ Build a sitemap HttpResponse from str or gzipped bytes. """
+    if gz:
+        response = HttpResponse(content, content_type='application/x-gzip')
     else:
-        # Find server name (.com or .info)
-        serverattrs = (
-            'HTTP_X_FORWARDED_HOST',
-            'HTTP_X_FORWARDED_SERVER',
-            'HTTP_HOST'
+        response = HttpResponse(content, content_type='application/xml')
+    return response
+
+
+class SitemapSection(object):
+
+    """ Builds and caches rendered sitemap urls for one app.
+        The rendered urls are split into chunks of at most
+        settings.SITEMAP_MAX_URLS.
+    """
+
+    def __init__(self, name, build_urls, models=None):
+        self.name = name
+        self.build_urls = build_urls
+        self.models = models or ()
+
+    def __repr__(self):
+        return 'SitemapSection({!r})'.format(self.name)
+
+    def connect_signals(self):
+        """ Invalidate this section when any of its models change. """
+        for model in self.models:
+            for signal, receiver in (
+                    (post_save, self.model_saved),
+                    (post_delete, self.invalidate)):
+                signal.connect(
+                    receiver,
+                    sender=model,
+                    weak=False,
+                    dispatch_uid='wp_sitemaps.{}.{}'.format(
+                        self.name,
+                        model.__name__
+                    )
+                )
+
+    @property
+    def generation_key(self):
+        return 'wp_sitemaps.generation.{}'.format(self.name)
+
+    def get_chunks(self, protocol, domain):
+        """ Return a list of (url_count, rendered_urls) for this section,
+            from the cache when possible.
+        """
+        key = 'wp_sitemaps.chunks.{}.{}'.format(
+            self.name,
+            md5('{}:{}:{}'.format(
+                self.get_generation(),
+                protocol,
+                domain
+            ).encode()).hexdigest()
         )
-        domain = None
-        for serverattr in serverattrs:
-            if serverattr in request.META.keys():
-                # get domain
-                domain = request.META[serverattr]
-                if domain:
-                    break
-
-        # Unable to retrieve server name from request.
-        if not domain:
-            log.error('build_urls: unable to retrieve domain name!')
-        else:
-            # url list, consists of SitemapUrl() items containing:
-            # (URL, Change Frequency, Last Modified Date)
-            yield from build_main_urls(protocol, domain)
-            yield from build_project_urls(protocol, domain)
-            yield from build_blog_urls(protocol, domain)
-            yield from build_misc_urls(protocol, domain)
-            yield from build_app_urls(protocol, domain)
-            yield from build_img_urls(protocol, domain)
+        chunks = cache.get(key)
+        if chunks is None:
+            chunks = self.render_chunks(protocol, domain)
+            cache.set(key, chunks, settings.SITEMAP_CACHE_TIMEOUT)
+        return chunks
+
+    def get_generation(self):
+        """ Return the current generation for this section.
+            It changes every time the section is invalidated.
+        """
+        generation = cache.get(self.generation_key)
+        if generation is None:
+            generation = self.invalidate()
+        return generation
+
+    def invalidate(self, **kwargs):
+        """ Start a new generation for this section, so cached content is
+            rebuilt on the next request. This is a signal receiver.
+        """
+        generation = '{}'.format(time.time())
+        cache.set(self.generation_key, generation, None)
+        return generation
+
+    def model_saved(self, update_fields=None, **kwargs):
+        """ Invalidate this section when a model is saved, unless only
+            view/download counters were updated. This is a signal receiver.
+        """
+        if update_fields and (set(update_fields) <= COUNTER_FIELDS):
+            return None
+        return self.invalidate()
+
+    def render_chunks(self, protocol, domain):
+        """ Build and render all urls for this section. """
+        maxurls = settings.SITEMAP_MAX_URLS
+        urls = list(self.build_urls(protocol, domain))
+        chunks = []
+        for i in range(0, len(urls), maxurls):
+            chunkurls = urls[i:i + maxurls]
+            chunks.append((
+                len(chunkurls),
+                render_template(
+                    'sitemaps/sitemap_urls.xml',
+                    {'url_list': chunkurls}
+                ),
+            ))
+        return chunks
+
+
+class MainSitemapSection(SitemapSection):
+
+    """ The main pages use today's date for lastmod, so the generation
+        changes every day instead of on model saves.
+    """
+
+    def get_generation(self):
+        return str(date.today())
 
 
 class SitemapUrl(object):  # noqa
@@ -259,3 +495,8 @@ class SitemapUrl(object):  # noqa
                 self.rel_location
             ))
         return surl
+
+
+# Load sitemap sections once, SitemapUrl must be defined first because the
+# app sitemap.py modules import it.
+SITEMAP_SECTIONS = get_sitemap_sections()
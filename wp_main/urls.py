@@ -75,9 +75,14 @@ urlpatterns = [
     ),
     # sitemap server
     url(
-        r'^sitemap\.xml$',
+        r'^sitemap\.xml(?P<gz>\.gz)?$',
         sitemaps.view_byserver
     ),
+    # sitemap pages (when sitemap.xml is an index)
+    url(
+        r'^sitemap-(?P<section>\w+)-(?P<page>\d+)\.xml(?P<gz>\.gz)?$',
+        sitemaps.view_section_byserver
+    ),
     # textmode test
     url(
         r'^[Tt]ext[Mm]ode$',
@@ -0,0 +1,539 @@
+r""" Welborn Productions - Utilities - Ban List
+    Compiled IP ban matcher, reloaded from the ban file when it changes,
+    and an append-only writer for adding new bans.
+
+    Ban file lines can be:
+        A literal IP, plain or regex-escaped:   1.2.3.4, 1\.2\.3\.4
+        A CIDR range:                           10.0.0.0/8, 2001:db8::/32
+        Any other regex pattern:                192\.168\..+
+
+    Literal IPs go into a set, CIDR ranges go into a sorted interval table,
+    and only the true regex patterns are combined into one alternation.
+
+    New bans are appended to the file with a single O_APPEND write, and
+    other processes only read the appended tail, as long as the part they
+    already read is unchanged. Duplicates that slip in
+    from concurrent writers are removed by compact() once there are enough
+    of them.
+"""
+import fcntl
+import hashlib
+import ipaddress
+import logging
+import os
+import re
+import threading
+import time
+from bisect import bisect_right
+
+log = logging.getLogger('wp.utilities.banlist')
+
+# Characters that can only appear in a pattern meant to be a regex.
+# (after unescaping '\.', which ban_add() used to write)
+_REGEX_CHARS = set('^$*+?{}[]|()\\')
+
+# Shared BanList instances, by file name (see get_banlist()).
+_banlists = {}
+_banlists_lock = threading.Lock()
+
+
+def _merge_ranges(ranges):
+    """ Merge a list of (start, end) int tuples into sorted,
+        non-overlapping (starts, ends) lists for bisecting.
+    """
+    starts, ends = [], []
+    for start, end in sorted(ranges):
+        if ends and start <= ends[-1] + 1:
+            # Overlapping or adjacent, extend the last range.
+            ends[-1] = max(ends[-1], end)
+            continue
+        starts.append(start)
+        ends.append(end)
+    return starts, ends
+
+
+def entry_key(kind, value):
+    """ Return a hashable key for a parsed entry, used for dedupe. """
+    if kind == 'regex':
+        return kind, value.pattern
+    return kind, value
+
+
+def format_lines(lines):
+    """ Return the bytes written to the ban file for a list of lines. """
+    return ''.join('{}\n'.format(l) for l in lines).encode()
+
+
+def get_banlist(filename=None, check_interval=None):
+    """ Return the shared BanList for a ban file.
+        Both the ban middleware and utilities.ban_add() use this, so new
+        bans are enforced in-process without touching the file again.
+        Arguments:
+            filename        : Ban file to use.
+                              Default: settings.SECRET_BAN_FILE
+            check_interval  : Seconds between file change checks.
+                              Default: settings.BAN_RELOAD_INTERVAL
+    """
+    if (filename is None) or (check_interval is None):
+        from django.conf import settings
+        if filename is None:
+            filename = settings.SECRET_BAN_FILE
+        if check_interval is None:
+            check_interval = settings.BAN_RELOAD_INTERVAL
+    with _banlists_lock:
+        banlist = _banlists.get(filename, None)
+        if banlist is None:
+            banlist = _banlists[filename] = BanList(
+                filename,
+                check_interval=check_interval
+            )
+    return banlist
+
+
+def parse_entry(line):
+    """ Classify a single ban file line.
+        Returns a tuple of (kind, value), where kind is one of:
+            'ip'    : value is a normalized IP string.
+            'cidr'  : value is an ipaddress.ip_network.
+            'regex' : value is the compiled pattern.
+        Returns (None, None) for blank lines, comments, and bad patterns.
+    """
+    line = line.strip()
+    if (not line) or line.startswith('#'):
+        return None, None
+
+    unescaped = line.replace('\\.', '.')
+    if not (_REGEX_CHARS.intersection(unescaped)):
+        try:
+            if '/' in unescaped:
+                return 'cidr', ipaddress.ip_network(unescaped, strict=False)
+            return 'ip', str(ipaddress.ip_address(unescaped))
+        except ValueError:
+            # Not an ip, it may still be a usable regex (like '10.0.0.').
+            pass
+    try:
+        return 'regex', re.compile(line)
+    except re.error as ex:
+        log.error('Bad regex pattern: {}\n{}'.format(line, ex))
+    return None, None
+
+
+class BanMatcher(object):
+    """ A compiled snapshot of the ban list.
+        Lookups are a set check, a bisect per IP version,
+        and (only if regex patterns exist) a single regex match.
+        New entries can be added in place with add_lines().
+    """
+    __slots__ = ('ips', 'networks', 'ranges', 'patterns', 'pattern')
+
+    def __init__(self, lines=None):
+        self.ips = set()
+        self.networks = set()
+        self.ranges = {}
+        self.patterns = []
+        self.pattern = None
+        if lines:
+            self.add_lines(lines)
+
+    def __bool__(self):
+        return self.count > 0
+
+    def __contains__(self, ip):
+        return self.is_banned(ip)
+
+    def add_lines(self, lines):
+        """ Parse ban file lines and add them to this matcher.
+            Returns a tuple of (entries, new_entries), so the caller can
+            tell how many duplicates were seen.
+        """
+        entries = 0
+        newips = 0
+        networks = []
+        patterns = []
+        patstrs = {p.pattern for p in self.patterns}
+        for line in lines:
+            kind, value = parse_entry(line)
+            if kind is None:
+                continue
+            entries += 1
+            if kind == 'ip':
+                if value not in self.ips:
+                    # set.add() is atomic, readers never see a partial set.
+                    self.ips.add(value)
+                    newips += 1
+            elif kind == 'cidr':
+                if value not in self.networks:
+                    self.networks.add(value)
+                    networks.append(value)
+            elif kind == 'regex':
+                if value.pattern not in patstrs:
+                    patstrs.add(value.pattern)
+                    patterns.append(value)
+
+        if networks:
+            self.ranges = self.build_ranges(self.networks)
+        if patterns:
+            self.patterns = self.patterns + patterns
+            self.pattern = self.combine_patterns(self.patterns)
+        return entries, newips + len(networks) + len(patterns)
+
+    @staticmethod
+    def build_ranges(networks):
+        """ Build a {version: (starts, ends)} interval table from
+            ipaddress networks.
+        """
+        ranges = {}
+        for network in networks:
+            ranges.setdefault(network.version, []).append((
+                int(network.network_address),
+                int(network.broadcast_address),
+            ))
+        return {
+            version: _merge_ranges(vranges)
+            for version, vranges in ranges.items()
+        }
+
+    @staticmethod
+    def combine_patterns(patterns):
+        """ Combine compiled patterns into one alternation.
+            Returns None if there are no patterns.
+        """
+        if not patterns:
+            return None
+        try:
+            return re.compile('|'.join(
+                '(?:{})'.format(p.pattern) for p in patterns
+            ))
+        except re.error as ex:
+            # Group names/backrefs can clash when combined.
+            # The patterns were valid alone, so just keep them separate.
+            log.error('Unable to combine ban patterns: {}'.format(ex))
+            return _PatternList(patterns)
+
+    @property
+    def count(self):
+        """ Number of unique ban entries. """
+        return len(self.ips) + len(self.networks) + len(self.patterns)
+
+    def in_ranges(self, ip):
+        """ Returns True if `ip` is inside one of the CIDR ranges. """
+        ranges = self.ranges
+        if not ranges:
+            return False
+        try:
+            ipaddr = ipaddress.ip_address(ip)
+        except ValueError:
+            return False
+        vranges = ranges.get(ipaddr.version, None)
+        if not vranges:
+            return False
+        starts, ends = vranges
+        ipint = int(ipaddr)
+        index = bisect_right(starts, ipint) - 1
+        return (index >= 0) and (ipint <= ends[index])
+
+    def is_banned(self, ip):
+        """ Returns True if the ip string matches any ban entry. """
+        if not ip:
+            return False
+        if ip in self.ips:
+            return True
+        if self.in_ranges(ip):
+            return True
+        pattern = self.pattern
+        return (pattern is not None) and bool(pattern.match(ip))
+
+
+class _PatternList(object):
+    """ Fallback for patterns that could not be combined into one regex.
+        Quacks like a compiled pattern for BanMatcher.
+    """
+    __slots__ = ('patterns', )
+
+    def __init__(self, patterns):
+        self.patterns = patterns
+
+    def match(self, s):
+        for pat in self.patterns:
+            m = pat.match(s)
+            if m:
+                return m
+        return None
+
+
+class BanList(object):
+    """ A BanMatcher that follows the ban file.
+        The file is stat'd at most once every `check_interval` seconds.
+        When it only grew (appends), just the new tail is read.
+        When it was replaced, truncated, or edited, the matcher is rebuilt.
+    """
+
+    def __init__(self, filename, check_interval=2, compact_threshold=100):
+        self.filename = filename
+        self.check_interval = check_interval
+        # Number of duplicate entries allowed before compacting the file.
+        self.compact_threshold = compact_threshold
+        self.matcher = BanMatcher()
+        # Duplicate entries seen in the file since the last full load.
+        self.dupes = 0
+        # (st_ino, st_mtime_ns, st_size) of the last read.
+        self.filestamp = None
+        # Byte offset that has been read up to.
+        self.offset = 0
+        # Hash of the bytes before `offset`, to tell appends from edits.
+        self.readhash = hashlib.sha1()
+        self.last_check = 0
+        self.lock = threading.RLock()
+        self.reload()
+
+    def __bool__(self):
+        return bool(self.matcher)
+
+    def __contains__(self, ip):
+        return self.is_banned(ip)
+
+    def add(self, ip):
+        """ Ban an ip, appending it to the ban file if it isn't already
+            banned. The in-memory matcher is updated immediately.
+            Only literal IPs are accepted, never patterns.
+            Returns True if the ip is banned (new or not),
+            and False if the ip is invalid or the ban file could not be
+            written.
+        """
+        try:
+            ip = str(ipaddress.ip_address((ip or '').strip()))
+        except ValueError:
+            log.error('Not banning invalid ip: {!r}'.format(ip))
+            return False
+        if self.matcher.is_banned(ip):
+            return True
+        try:
+            start, end = self.append_lines([ip])
+        except EnvironmentError as ex:
+            log.error('Unable to append to ban file: {}\n{}'.format(
+                self.filename,
+                ex,
+            ))
+            return False
+        with self.lock:
+            self.matcher.add_lines([ip])
+            if start == self.offset:
+                # Nothing unread came before this line, so skip over it
+                # instead of reading it back as a duplicate.
+                self.offset = end
+                self.readhash.update(format_lines([ip]))
+        log.debug('Banned ip: {}'.format(ip))
+        return True
+
+    def append_lines(self, lines):
+        """ Append lines to the ban file with a single O_APPEND write.
+            A shared lock is held so compact() never runs mid-write.
+            Returns the (start, end) file offsets for the written lines.
+            Raises EnvironmentError on failure.
+        """
+        data = format_lines(lines)
+        fd = self.open_locked(
+            os.O_WRONLY | os.O_APPEND | os.O_CREAT,
+            fcntl.LOCK_SH
+        )
+        try:
+            os.write(fd, data)
+            end = os.lseek(fd, 0, os.SEEK_CUR)
+        finally:
+            os.close(fd)
+        return end - len(data), end
+
+    def open_locked(self, flags, operation):
+        """ Open the ban file and flock() it.
+            If compact() replaced the file while waiting for the lock,
+            the new file is opened instead.
+            Returns the locked file descriptor.
+            Raises EnvironmentError on failure.
+        """
+        while True:
+            fd = os.open(self.filename, flags, 0o644)
+            try:
+                fcntl.flock(fd, operation)
+                if os.fstat(fd).st_ino == os.stat(self.filename).st_ino:
+                    return fd
+            except EnvironmentError:
+                os.close(fd)
+                raise
+            # This fd points to the old (replaced) file, try again.
+            os.close(fd)
+
+    def compact(self):
+        """ Rewrite the ban file without duplicate entries.
+            Blank lines are dropped, comments are kept.
+            The new file is written to a temp file and swapped in
+            atomically, while holding an exclusive lock so no appends
+            are lost.
+            Returns the number of lines removed, or None on errors.
+        """
+        tmpname = '{}.tmp'.format(self.filename)
+        try:
+            fd = self.open_locked(os.O_RDWR | os.O_CREAT, fcntl.LOCK_EX)
+        except EnvironmentError as ex:
+            log.error('Unable to open ban file: {}\n{}'.format(
+                self.filename,
+                ex,
+            ))
+            return None
+        try:
+            with open(fd, 'r', closefd=False) as f:
+                lines = f.readlines()
+            seen = set()
+            keep = []
+            for line in lines:
+                line = line.strip()
+                if not line:
+                    continue
+                kind, value = parse_entry(line)
+                if kind is not None:
+                    key = entry_key(kind, value)
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                keep.append(line)
+
+            with open(tmpname, 'w') as f:
+                f.write(''.join('{}\n'.format(l) for l in keep))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmpname, self.filename)
+        except EnvironmentError as ex:
+            log.error('Unable to compact ban file: {}\n{}'.format(
+                self.filename,
+                ex,
+            ))
+            return None
+        finally:
+            os.close(fd)
+
+        removed = len(lines) - len(keep)
+        log.debug('Compacted ban file, removed {} lines: {}'.format(
+            removed,
+            self.filename,
+        ))
+        self.reload()
+        return removed
+
+    def get_filestamp(self):
+        """ Return a (st_ino, st_mtime_ns, st_size) tuple for the ban file,
+            or None if it can't be stat'd.
+        """
+        try:
+            st = os.stat(self.filename)
+        except EnvironmentError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def is_banned(self, ip):
+        """ Returns True if the ip is banned, reloading first if needed. """
+        self.reload_if_changed()
+        return self.matcher.is_banned(ip)
+
+    def read_data(self):
+        """ Read the whole ban file.
+            Returns bytes (empty if the file doesn't exist),
+            or None on errors.
+        """
+        try:
+            with open(self.filename, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return b''
+        except EnvironmentError as ex:
+            log.error('Unable to read ban file: {}\n{}'.format(
+                self.filename,
+                ex,
+            ))
+            return None
+
+    @staticmethod
+    def split_lines(data, offset=0):
+        """ Return (lines, end) for the complete lines in data[offset:],
+            where `end` is the offset after the last complete line.
+            Any partial line is left for the next read.
+        """
+        end = data.rfind(b'\n', offset) + 1
+        if end <= offset:
+            return [], offset
+        return data[offset:end].decode(errors='replace').splitlines(), end
+
+    def reload(self, data=None):
+        """ Rebuild the matcher from the ban file, or from `data` if it
+            was already read.
+            On read errors the last good matcher is kept.
+        """
+        with self.lock:
+            stamp = self.get_filestamp()
+            if data is None:
+                data = self.read_data()
+            if data is None:
+                return False
+            lines, offset = self.split_lines(data)
+            matcher = BanMatcher()
+            entries, new = matcher.add_lines(lines)
+            self.matcher = matcher
+            self.dupes = entries - new
+            self.filestamp = stamp
+            self.offset = offset
+            self.readhash = hashlib.sha1(data[:offset])
+            self.last_check = time.monotonic()
+        log.debug('Loaded {} ban entries from: {}'.format(
+            self.matcher.count,
+            self.filename,
+        ))
+        self.compact_if_needed()
+        return True
+
+    def reload_tail(self):
+        """ Read only the lines appended since the last read.
+            If the part that was already read has changed, the file was
+            edited instead, and the whole file is loaded again.
+            Returns True if the file was read.
+        """
+        with self.lock:
+            stamp = self.get_filestamp()
+            data = self.read_data()
+            if data is None:
+                return False
+            prefix = data[:self.offset]
+            if ((len(prefix) < self.offset) or
+                    (hashlib.sha1(prefix).digest() !=
+                        self.readhash.digest())):
+                return self.reload(data=data)
+            lines, offset = self.split_lines(data, self.offset)
+            entries, new = self.matcher.add_lines(lines)
+            self.dupes += entries - new
+            self.filestamp = stamp
+            self.readhash.update(data[self.offset:offset])
+            self.offset = offset
+        self.compact_if_needed()
+        return True
+
+    def compact_if_needed(self):
+        """ Compact the ban file if too many duplicates have piled up. """
+        if self.dupes > self.compact_threshold:
+            return self.compact()
+        return None
+
+    def reload_if_changed(self):
+        """ Reload the ban file if the check interval has passed,
+            and the file has changed.
+            Returns True if anything was read.
+        """
+        now = time.monotonic()
+        if (now - self.last_check) < self.check_interval:
+            return False
+        self.last_check = now
+        stamp = self.get_filestamp()
+        if stamp == self.filestamp:
+            return False
+        oldstamp = self.filestamp
+        if stamp and oldstamp and (stamp[0] == oldstamp[0]):
+            if stamp[2] >= self.offset:
+                # Same file, maybe only appended to.
+                return self.reload_tail()
+        return self.reload()
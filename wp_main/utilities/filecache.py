@@ -0,0 +1,242 @@
+""" Welborn Productions - Utilities - File Cache
+    A sharded, file-based cache backend with LRU eviction.
+
+    Safe to share between mod_wsgi processes (all writes are atomic
+    renames), and needs no outside services.
+
+    Keys are hashed into one of SHARDS sub directories, and each shard is
+    limited to its share of MAX_ENTRIES and MAX_SIZE. A file's mtime is
+    bumped on every hit, so when a shard is full the least recently used
+    entries are removed first. Only the shard being written is scanned,
+    never the whole cache.
+
+    Settings example:
+        CACHES = {
+            'default': {
+                'BACKEND': 'wp_main.utilities.filecache.ShardedFileCache',
+                'LOCATION': '/path/to/cache_dir',
+                'TIMEOUT': 300,
+                'OPTIONS': {
+                    'MAX_ENTRIES': 2000,
+                    'MAX_SIZE': 64 * 1024 * 1024,
+                    'SHARDS': 16,
+                },
+            },
+        }
+"""
+import errno
+import hashlib
+import os
+import pickle
+import struct
+import tempfile
+import time
+import zlib
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.encoding import force_bytes
+
+# Expiration time header for each cache file. 0 means it never expires.
+HEADER = struct.Struct('!d')
+
+
+class ShardedFileCache(BaseCache):
+    """ File-based cache, split into shards, with per-shard LRU culling.
+        Options (besides the standard MAX_ENTRIES/CULL_FREQUENCY):
+            MAX_SIZE  : Max bytes for the whole cache.
+                        Default: 64MB
+            SHARDS    : Number of sub directories to spread keys over.
+                        Default: 16
+    """
+    cache_suffix = '.wpcache'
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._dir = os.path.abspath(location)
+        self._shards = max(1, int(options.get('SHARDS', 16)))
+        self._max_size = int(options.get('MAX_SIZE', 64 * 1024 * 1024))
+        # Limits for each shard.
+        self._shard_max_entries = max(
+            1,
+            -(-self._max_entries // self._shards)
+        )
+        self._shard_max_size = max(1, self._max_size // self._shards)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        if self.has_key(key, version):
+            return False
+        self.set(key, value, timeout, version)
+        return True
+
+    def clear(self):
+        """ Remove all cache files, from all shards. """
+        for shard in range(self._shards):
+            for entry in self._scan_shard(shard):
+                self._delete(entry.path)
+
+    def delete(self, key, version=None):
+        self._delete(self._key_to_file(key, version))
+
+    def get(self, key, default=None, version=None):
+        fname = self._key_to_file(key, version)
+        value = self._read(fname)
+        if value is None:
+            return default
+        # Mark as recently used.
+        try:
+            os.utime(fname)
+        except OSError:
+            pass
+        return value[0]
+
+    def has_key(self, key, version=None):
+        return self._read(
+            self._key_to_file(key, version),
+            load=False
+        ) is not None
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        fname = self._key_to_file(key, version)
+        shard_dir = os.path.dirname(fname)
+        self._createdir(shard_dir)
+        expiry = self.get_backend_timeout(timeout)
+        data = b''.join((
+            HEADER.pack(expiry or 0),
+            zlib.compress(pickle.dumps(value, pickle.HIGHEST_PROTOCOL)),
+        ))
+        fd, tmp_path = tempfile.mkstemp(dir=shard_dir, suffix='.tmp')
+        renamed = False
+        try:
+            with open(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, fname)
+            renamed = True
+        finally:
+            if not renamed:
+                self._delete(tmp_path)
+        self._cull(shard_dir)
+
+    def stats(self):
+        """ Return a dict with the number of entries, and total size. """
+        entries = size = 0
+        for shard in range(self._shards):
+            for entry in self._scan_shard(shard):
+                try:
+                    size += entry.stat().st_size
+                except OSError:
+                    continue
+                entries += 1
+        return {'entries': entries, 'size': size, 'shards': self._shards}
+
+    def _createdir(self, dirpath):
+        try:
+            os.makedirs(dirpath, 0o700, exist_ok=True)
+        except OSError as ex:
+            raise EnvironmentError(
+                'Cache directory \'{}\' does not exist '
+                'and could not be created: {}'.format(dirpath, ex)
+            )
+
+    def _cull(self, shard_dir):
+        """ Remove the least recently used entries from a shard,
+            if it is over the entry or size limits.
+            A CULL_FREQUENCY of 0 clears the whole shard.
+        """
+        entries = []
+        total_size = 0
+        for entry in self._scan_dir(shard_dir):
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, entry.path))
+            total_size += st.st_size
+
+        over_count = len(entries) > self._shard_max_entries
+        over_size = total_size > self._shard_max_size
+        if not (over_count or over_size):
+            return
+        if self._cull_frequency == 0:
+            for _, _, fname in entries:
+                self._delete(fname)
+            return
+
+        # Oldest (least recently used) first.
+        entries.sort()
+        remaining = target = len(entries)
+        if over_count:
+            target -= max(1, remaining // self._cull_frequency)
+        for _, size, fname in entries:
+            if (remaining <= target) and (
+                    total_size <= self._shard_max_size):
+                break
+            self._delete(fname)
+            remaining -= 1
+            total_size -= size
+
+    def _delete(self, fname):
+        if not fname.startswith(self._dir):
+            return
+        try:
+            os.remove(fname)
+        except OSError as ex:
+            # Another process may have removed it first.
+            if ex.errno != errno.ENOENT:
+                raise
+
+    def _key_to_file(self, key, version=None):
+        """ Convert a key into a cache file path, inside of its shard dir.
+        """
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        keyhash = hashlib.md5(force_bytes(key)).hexdigest()
+        shard = int(keyhash[:8], 16) % self._shards
+        return os.path.join(
+            self._dir,
+            '{:03d}'.format(shard),
+            ''.join((keyhash, self.cache_suffix))
+        )
+
+    def _read(self, fname, load=True):
+        """ Read a cache file, removing it if it has expired.
+            Returns a tuple of (value, ) if it exists and hasn't expired,
+            or None. If `load` is False, the value is not unpickled.
+        """
+        try:
+            with open(fname, 'rb') as f:
+                header = f.read(HEADER.size)
+                if len(header) < HEADER.size:
+                    return None
+                expiry = HEADER.unpack(header)[0]
+                if expiry and (expiry < time.time()):
+                    f.close()
+                    self._delete(fname)
+                    return None
+                if not load:
+                    return (None, )
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            return (pickle.loads(zlib.decompress(data)), )
+        except (zlib.error, pickle.UnpicklingError, EOFError):
+            # Corrupt file, treat as a miss.
+            self._delete(fname)
+        return None
+
+    def _scan_dir(self, dirpath):
+        """ Yield os.DirEntry's for cache files in a directory. """
+        try:
+            entries = list(os.scandir(dirpath))
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            if entry.name.endswith(self.cache_suffix):
+                yield entry
+
+    def _scan_shard(self, shard):
+        """ Yield os.DirEntry's for cache files in a shard. """
+        yield from self._scan_dir(
+            os.path.join(self._dir, '{:03d}'.format(shard))
+        )
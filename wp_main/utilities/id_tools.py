@@ -5,6 +5,8 @@
 """
 from random import SystemRandom
 
+from django.db import connections, router
+
 SYSRANDOM = SystemRandom()
 # Changing the start char will wreck previously encoded ids.
 IDSTARTCHAR = 'a'
@@ -67,3 +69,24 @@ def decode_id(idstr):
         intstr = str(ord(c) - startchar)
         finalid.append(intstr)
     return int(''.join(finalid))
+
+
+def reserve_ids(model, count=1):
+    """ Reserve primary keys from a model's id sequence, so ids (and the
+        ids encoded from them) can be set before the row is inserted.
+        Only PostgreSQL sequences are supported.
+        Returns a list of ids, or None if ids can't be reserved.
+        Arguments:
+            model  : Model class to reserve ids for.
+            count  : Number of ids to reserve.
+    """
+    connection = connections[router.db_for_write(model)]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT nextval(pg_get_serial_sequence(%s, %s)) '
+            'FROM generate_series(1, %s)',
+            [model._meta.db_table, model._meta.pk.column, count]
+        )
+        return [row[0] for row in cursor.fetchall()]
@@ -0,0 +1,86 @@
+""" Welborn Productions - Utilities - Rate Limit
+    An in-memory, sliding-window rate limiter keyed by any hashable value
+    (usually an IP address).
+
+    This is per-process, so it is only a fast first check. Callers that
+    need a hard limit across processes should fall back to the database.
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class SlidingWindowLimiter(object):
+    """ Allows `limit` hits per key within any `window` seconds.
+        Keys that haven't been hit for a whole window are dropped, and the
+        least recently hit keys are dropped when there are more than
+        `maxkeys`.
+    """
+
+    def __init__(self, window, limit=1, maxkeys=10000):
+        self.window = window
+        self.limit = limit
+        self.maxkeys = maxkeys
+        # {key: deque([hit_time, ...])}, least recently hit first.
+        self.hits = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.hits)
+
+    def _prune(self, key, now):
+        """ Remove hits for `key` that are outside of the window.
+            Returns the remaining hits, or None if there are none.
+            The lock must be held.
+        """
+        hits = self.hits.get(key, None)
+        if hits is None:
+            return None
+        cutoff = now - self.window
+        while hits and (hits[0] <= cutoff):
+            hits.popleft()
+        if not hits:
+            del self.hits[key]
+            return None
+        return hits
+
+    def add(self, key, now=None):
+        """ Record a hit for `key`. """
+        now = time.time() if now is None else now
+        with self.lock:
+            hits = self._prune(key, now)
+            if hits is None:
+                hits = self.hits[key] = deque()
+            else:
+                self.hits.move_to_end(key)
+            hits.append(now)
+            while len(self.hits) > self.maxkeys:
+                self.hits.popitem(last=False)
+
+    def allowed(self, key, now=None):
+        """ Returns True if another hit for `key` is within the limit. """
+        return self.retry_after(key, now=now) == 0
+
+    def clear(self):
+        with self.lock:
+            self.hits.clear()
+
+    def last_hit(self, key, now=None):
+        """ Return the time of the last hit for `key` within the window,
+            or None.
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            hits = self._prune(key, now)
+            return hits[-1] if hits else None
+
+    def retry_after(self, key, now=None):
+        """ Return the number of seconds until `key` is allowed another
+            hit, or 0 if it is allowed now.
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            hits = self._prune(key, now)
+            if (hits is None) or (len(hits) < self.limit):
+                return 0
+            return hits[-self.limit] + self.window - now
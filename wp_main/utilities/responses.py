@@ -23,7 +23,8 @@ from django.http import (
     HttpResponse,
     HttpResponseServerError,
     Http404,
-    QueryDict
+    QueryDict,
+    StreamingHttpResponse
 )
 from django.template import loader  # noqa
 # Mark Html generated by these functions as safe to view.
@@ -591,6 +592,45 @@ def json_response_err(ex, logit=False):
     return json_response(errdata)
 
 
+def json_stream_response(data, listkey, items, chunk_size=100):
+    """ Returns a StreamingHttpResponse with application/json.
+        The `items` are encoded one at a time as they are iterated, into a
+        list at `listkey`, so large lists are never built in memory.
+        Arguments:
+            data        : A dict for the rest of the JSON object.
+            listkey     : Key for the streamed list, in the JSON object.
+            items       : An iterable of JSON-serializable items.
+            chunk_size  : Number of encoded items to send at a time.
+    """
+    return StreamingHttpResponse(
+        json_stream_chunks(data, listkey, items, chunk_size=chunk_size),
+        content_type='application/json'
+    )
+
+
+def json_stream_chunks(data, listkey, items, chunk_size=100):
+    """ Yields JSON strings for json_stream_response(). Joined together,
+        they are the JSON object for `data`, with `items` at `listkey`.
+    """
+    head = json.dumps(data, sort_keys=True)[:-1]
+    yield '{}{}{}: ['.format(
+        head,
+        ', ' if data else '',
+        json.dumps(listkey)
+    )
+    chunk = []
+    separator = ''
+    for item in items:
+        chunk.append(json.dumps(item, sort_keys=True))
+        if len(chunk) >= chunk_size:
+            yield ''.join((separator, ', '.join(chunk)))
+            separator = ', '
+            chunk = []
+    if chunk:
+        yield ''.join((separator, ', '.join(chunk)))
+    yield ']}'
+
+
 def redirect_perm_response(redirect_to):
     """ returns a permanently moved response. """
 
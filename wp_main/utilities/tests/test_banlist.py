@@ -0,0 +1,178 @@
+""" Welborn Productions - Utilities - Tests - Ban List
+    Tests for the banlist module.
+"""
+import os
+import tempfile
+
+from django.test import TestCase
+
+from wp_main.utilities.banlist import BanList, BanMatcher, parse_entry
+
+
+class BanListTest(TestCase):
+
+    def setUp(self):
+        fd, self.filename = tempfile.mkstemp(suffix='.lst')
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def write_lines(self, *lines):
+        with open(self.filename, 'w') as f:
+            f.write('\n'.join(lines))
+            f.write('\n')
+
+    def test_parse_entry(self):
+        """ parse_entry() classifies literals, ranges, and regexes. """
+        self.assertEqual(parse_entry('1.2.3.4'), ('ip', '1.2.3.4'))
+        self.assertEqual(
+            parse_entry('1\\.2\\.3\\.4'),
+            ('ip', '1.2.3.4'),
+            msg='escaped literal ip was not unescaped.'
+        )
+        kind, value = parse_entry('10.0.0.0/8')
+        self.assertEqual(kind, 'cidr')
+        kind, value = parse_entry('192\\.168\\..+')
+        self.assertEqual(kind, 'regex')
+        self.assertEqual(parse_entry('# comment'), (None, None))
+        self.assertEqual(parse_entry('   '), (None, None))
+        self.assertEqual(
+            parse_entry('(bad'),
+            (None, None),
+            msg='bad regex pattern was not ignored.'
+        )
+
+    def test_matcher(self):
+        """ BanMatcher matches literals, ranges, and regexes. """
+        matcher = BanMatcher([
+            '1\\.2\\.3\\.4',
+            '10.0.0.0/8',
+            '11.0.0.0/16',
+            '11.0.0.0/24',
+            '2001:db8::/32',
+            '192\\.168\\..+',
+        ])
+        for ip in (
+                '1.2.3.4',
+                '10.0.0.1',
+                '10.255.255.255',
+                '11.0.200.1',
+                '2001:db8::1',
+                '192.168.1.1'):
+            self.assertTrue(matcher.is_banned(ip), msg=ip)
+        for ip in (
+                '1.2.3.5',
+                '9.255.255.255',
+                '11.1.0.0',
+                '2001:db9::1',
+                '127.0.0.1',
+                '',
+                None):
+            self.assertFalse(matcher.is_banned(ip), msg=ip)
+
+    def test_reload(self):
+        """ BanList picks up file changes without a restart. """
+        self.write_lines('1.2.3.4')
+        banlist = BanList(self.filename, check_interval=0)
+        self.assertTrue(banlist.is_banned('1.2.3.4'))
+        self.assertFalse(banlist.is_banned('5.6.7.8'))
+
+        self.write_lines('1.2.3.4', '5.6.7.8', '9.9.9.9')
+        self.assertTrue(
+            banlist.is_banned('5.6.7.8'),
+            msg='new ban was not picked up.'
+        )
+
+    def test_reload_edited(self):
+        """ BanList reloads the whole file when it was edited in place. """
+        self.write_lines('1.2.3.4', '5.6.7.8')
+        banlist = BanList(self.filename, check_interval=0)
+        st = os.stat(self.filename)
+
+        def touch(secs):
+            # Make sure the mtime changes, even on coarse timestamps.
+            mtime = st.st_mtime_ns + (secs * 10 ** 9)
+            os.utime(self.filename, ns=(st.st_atime_ns, mtime))
+
+        # Same size, same inode.
+        self.write_lines('1.2.3.5', '5.6.7.8')
+        touch(1)
+        self.assertTrue(
+            banlist.is_banned('1.2.3.5'),
+            msg='same-size edit was not picked up.'
+        )
+        self.assertFalse(
+            banlist.is_banned('1.2.3.4'),
+            msg='edited ban was kept.'
+        )
+
+        # Rewritten, and grown past the last read offset.
+        self.write_lines('9.9.9.9', '8.8.8.8', '7.7.7.7')
+        touch(2)
+        for ip in ('9.9.9.9', '8.8.8.8', '7.7.7.7'):
+            self.assertTrue(banlist.is_banned(ip), msg=ip)
+        for ip in ('1.2.3.5', '5.6.7.8'):
+            self.assertFalse(banlist.is_banned(ip), msg=ip)
+
+    def test_add(self):
+        """ BanList.add() appends new bans, and skips duplicates. """
+        self.write_lines('# Banned ips.', '1.2.3.4')
+        banlist = BanList(self.filename, check_interval=0)
+        self.assertTrue(banlist.add('5.6.7.8'))
+        self.assertTrue(
+            banlist.matcher.is_banned('5.6.7.8'),
+            msg='new ban was not added to the matcher.'
+        )
+        self.assertTrue(banlist.add('1.2.3.4'))
+        with open(self.filename, 'r') as f:
+            lines = f.read().splitlines()
+        self.assertEqual(
+            lines,
+            ['# Banned ips.', '1.2.3.4', '5.6.7.8'],
+            msg='duplicate ban was appended.'
+        )
+
+        # Another process appending is picked up from the tail.
+        other = BanList(self.filename, check_interval=0)
+        other.add('9.9.9.9')
+        self.assertTrue(banlist.is_banned('9.9.9.9'))
+        self.assertEqual(
+            banlist.dupes,
+            0,
+            msg='own appended line was read back as a duplicate.'
+        )
+
+    def test_add_invalid(self):
+        """ BanList.add() only writes literal IPs. """
+        self.write_lines('1.2.3.4')
+        banlist = BanList(self.filename, check_interval=0)
+        for ip in ('.*', '10.0.0.0/8', '1\\.2\\.3\\.5', '', None):
+            self.assertFalse(banlist.add(ip), msg=ip)
+        self.assertFalse(banlist.is_banned('8.8.8.8'))
+        with open(self.filename, 'r') as f:
+            lines = f.read().splitlines()
+        self.assertEqual(lines, ['1.2.3.4'])
+
+    def test_compact(self):
+        """ BanList.compact() removes duplicate entries. """
+        self.write_lines(
+            '# Banned ips.',
+            '1.2.3.4',
+            '1\\.2\\.3\\.4',
+            '',
+            '10.0.0.0/8',
+            '10.0.0.0/8',
+            '5.6.7.8',
+        )
+        banlist = BanList(self.filename, check_interval=0)
+        self.assertEqual(banlist.dupes, 2)
+        self.assertEqual(banlist.compact(), 3)
+        self.assertEqual(banlist.dupes, 0)
+        with open(self.filename, 'r') as f:
+            lines = f.read().splitlines()
+        self.assertEqual(
+            lines,
+            ['# Banned ips.', '1.2.3.4', '10.0.0.0/8', '5.6.7.8']
+        )
+        self.assertTrue(banlist.is_banned('10.1.2.3'))
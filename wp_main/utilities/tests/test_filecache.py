@@ -0,0 +1,67 @@
+""" Welborn Productions - Utilities - Tests - File Cache
+    Tests for the sharded file cache backend.
+"""
+import os
+import shutil
+import tempfile
+import time
+
+from django.test import TestCase
+
+from wp_main.utilities.filecache import ShardedFileCache
+
+
+class ShardedFileCacheTest(TestCase):
+
+    def setUp(self):
+        self.cachedir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cachedir, ignore_errors=True)
+
+    def get_cache(self, **options):
+        return ShardedFileCache(self.cachedir, {'OPTIONS': options})
+
+    def test_get_set(self):
+        """ Basic get/set/add/delete works. """
+        cache = self.get_cache()
+        cache.set('key', {'value': 1})
+        self.assertEqual(cache.get('key'), {'value': 1})
+        self.assertIsNone(cache.get('missing'))
+        self.assertEqual(cache.get('missing', 'default'), 'default')
+        self.assertFalse(cache.add('key', 2))
+        self.assertTrue(cache.add('newkey', 2))
+        cache.delete('key')
+        self.assertFalse(cache.has_key('key'))
+
+    def test_expired(self):
+        """ Expired entries are misses. """
+        cache = self.get_cache()
+        cache.set('key', 'value', timeout=0)
+        self.assertIsNone(cache.get('key'))
+        cache.set('key', 'value', timeout=None)
+        self.assertEqual(cache.get('key'), 'value')
+
+    def test_lru_cull(self):
+        """ The least recently used entries are culled first. """
+        cache = self.get_cache(SHARDS=1, MAX_ENTRIES=4, CULL_FREQUENCY=4)
+        for i in range(4):
+            cache.set('key{}'.format(i), i)
+        # Make key0 the most recently used.
+        past = time.time() - 60
+        for i in range(1, 4):
+            fname = cache._key_to_file('key{}'.format(i))
+            os.utime(fname, (past + i, past + i))
+        cache.set('key4', 4)
+        self.assertEqual(cache.stats()['entries'], 4)
+        self.assertEqual(cache.get('key0'), 0)
+        self.assertIsNone(cache.get('key1'))
+
+    def test_max_size(self):
+        """ Shards stay under their share of MAX_SIZE. """
+        cache = self.get_cache(SHARDS=2, MAX_SIZE=4096)
+        for i in range(50):
+            cache.set('key{}'.format(i), os.urandom(256))
+        self.assertLessEqual(cache.stats()['size'], 4096)
+        cache.clear()
+        self.assertEqual(cache.stats()['entries'], 0)
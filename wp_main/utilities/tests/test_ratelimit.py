@@ -0,0 +1,37 @@
+""" Welborn Productions - Utilities - Tests - Rate Limit
+    Tests for the ratelimit module.
+"""
+from django.test import TestCase
+
+from wp_main.utilities.ratelimit import SlidingWindowLimiter
+
+
+class SlidingWindowLimiterTest(TestCase):
+
+    def test_limit(self):
+        """ hits are limited within the window, and allowed after it. """
+        limiter = SlidingWindowLimiter(10, limit=2)
+        self.assertTrue(limiter.allowed('a', now=100))
+        limiter.add('a', now=100)
+        limiter.add('a', now=104)
+        self.assertFalse(limiter.allowed('a', now=105))
+        self.assertEqual(limiter.retry_after('a', now=105), 5)
+        self.assertTrue(
+            limiter.allowed('b', now=105),
+            msg='Keys should be limited separately.'
+        )
+        self.assertTrue(limiter.allowed('a', now=110))
+        self.assertEqual(limiter.last_hit('a', now=110), 104)
+        self.assertIsNone(limiter.last_hit('a', now=114))
+        self.assertEqual(len(limiter), 0, msg='Expired keys were not dropped.')
+
+    def test_maxkeys(self):
+        """ the least recently hit keys are dropped past maxkeys. """
+        limiter = SlidingWindowLimiter(10, maxkeys=2)
+        limiter.add('a', now=1)
+        limiter.add('b', now=2)
+        limiter.add('a', now=3)
+        limiter.add('c', now=4)
+        self.assertEqual(len(limiter), 2)
+        self.assertIsNone(limiter.last_hit('b', now=5))
+        self.assertEqual(limiter.last_hit('a', now=5), 3)
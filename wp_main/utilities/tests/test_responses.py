@@ -1,3 +1,5 @@
+import json
+
 from django.http import QueryDict
 from django.test import TestCase
 
@@ -59,6 +61,27 @@ class ResponsesTest(TestCase):
             msg='Non existent request arg did not return the default: 26'
         )
 
+    def test_json_stream_chunks(self):
+        """ json_stream_chunks() joins into valid JSON. """
+        for count in (0, 1, 2, 3, 7):
+            items = [{'id': i} for i in range(count)]
+            chunks = resp.json_stream_chunks(
+                {'status': 'ok'},
+                'items',
+                iter(items),
+                chunk_size=3
+            )
+            self.assertEqual(
+                json.loads(''.join(chunks)),
+                {'status': 'ok', 'items': items},
+                msg='Bad JSON for {} items.'.format(count)
+            )
+        self.assertEqual(
+            json.loads(''.join(resp.json_stream_chunks({}, 'items', []))),
+            {'items': []},
+            msg='Bad JSON for empty data.'
+        )
+
 
 class FakeRequestArgs(object):
     """ For testing functions that deal with request args.
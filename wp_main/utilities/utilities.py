@@ -13,6 +13,7 @@ import os
 import sys
 import traceback
 from datetime import datetime
+from functools import lru_cache
 
 from django.conf import settings
 from django.db import connection
@@ -20,7 +21,8 @@ from django.db import connection
 from django.utils.module_loading import import_module
 
 # User-Agent helper...
-from django_user_agents.utils import get_user_agent
+from django_user_agents.utils import get_parsed_user_agent, get_user_agent
+from wp_main.utilities.banlist import get_banlist
 
 log = logging.getLogger('wp.utilities')
 
@@ -61,48 +63,24 @@ def append_path(*args):
 
 
 def ban_add(request):
-    """ Ban an IP by adding it to the banned.lst file (if not already banned)
+    """ Ban an IP by appending it to the banned.lst file
+        (if not already banned). The ban is enforced right away in this
+        process, and other processes pick it up on their next file check.
     """
     remote_ip = get_remote_ip(request)
     if not remote_ip:
         log.error('Unable to ban, no ip available!')
         return None
-    try:
-        with open(settings.SECRET_BAN_FILE, 'r') as f:
-            banpats = set(s.strip() for s in f)
-    except EnvironmentError as ex:
+    if not get_banlist().add(remote_ip):
         log.error(
-            'Unable to read ban file: {}\n  {}  \n{} was not banned!'.format(
+            'Unable to write ban file: {}\n  {} was not banned!'.format(
                 settings.SECRET_BAN_FILE,
-                ex,
-                remote_ip
-            )
-        )
-        return None
-    banip = remote_ip.replace('.', '\.')
-    banpats.add(banip)
-    banpats = sorted(s for s in banpats if s)
-    try:
-        with open(settings.SECRET_BAN_FILE, 'w') as f:
-            f.write('\n'.join(banpats))
-            f.write('\n')
-    except EnvironmentError as ex:
-        log.error(
-            '\n    '.join((
-                'Unable to write banned.lst: {fname}',
-                '{ex}',
-                'IPs need banning!:\n      {banpats}',
-                'Happened while banning: {banip}'
-            )).format(
-                fname=settings.SECRET_BAN_FILE,
-                ex=ex,
-                banpats='\n      '.join(banpats),
-                banip=banip
+                remote_ip,
             )
         )
         return None
-    log.debug('Banned ip pattern: {}'.format(banip))
-    return banip
+    log.debug('Banned ip: {}'.format(remote_ip))
+    return remote_ip
 
 
 def debug_allowed(request):
@@ -612,44 +590,9 @@ def get_user_agent_dict(request):
     ua = get_user_agent(request)
     if not ua:
         return {}
-    # Attributes and default values.
-    ua_attrs = {
-        'browser': {'family': '', 'version': '', 'version_string': ''},
-        'device': {'family': '', 'brand': '', 'model': ''},
-        'is_bot': False,
-        'is_mobile': False,
-        'is_pc': False,
-        'is_tablet': False,
-        'is_touch_capable': False,
-        'os': {'family': '', 'version': '', 'version_string': ''},
-        'ua_string': '',
-    }
-
-    def parse_family_val(v):
-        """ Turn UserAgents tuple-based values into dicts. """
-        attrs = ('family', 'brand', 'model', 'version', 'version_string')
-        if not any(hasattr(v, a) for a in attrs):
-            return v
-        values = set()
-        keyvalstrs = []
-        notset = object()
-        for a in attrs:
-            val = getattr(v, a, notset)
-            if (val is notset) or (not val):
-                # Ignore missing attrs/values.
-                continue
-            if val in values:
-                # Don't add duplicate values (family: nexus, model: nexus)
-                continue
-            values.add(val)
-            keyvalstrs.append('{}: {}'.format(a.title(), val))
-
-        return ', '.join(keyvalstrs)
-
-    return {
-        k: parse_family_val(getattr(ua, k, ua_attrs[k]))
-        for k in ua_attrs
-    }
+    # The dict is built once per user agent string, and copied so callers
+    # can't modify the cached version.
+    return dict(user_agent_dict(ua.ua_string))
 
 
 def is_file_or_dir(spath):
@@ -811,3 +754,49 @@ def trim_special(source):
         return source
     special = '<>/.\'"#!;:\\&='
     return ''.join((c for c in source if c not in special))
+
+
+@lru_cache(maxsize=256)
+def user_agent_dict(ua_string):
+    """ Build the dict form of a parsed user agent string.
+        Results are memoized per-process, see get_user_agent_dict().
+    """
+    ua = get_parsed_user_agent(ua_string)
+    # Attributes and default values.
+    ua_attrs = {
+        'browser': {'family': '', 'version': '', 'version_string': ''},
+        'device': {'family': '', 'brand': '', 'model': ''},
+        'is_bot': False,
+        'is_mobile': False,
+        'is_pc': False,
+        'is_tablet': False,
+        'is_touch_capable': False,
+        'os': {'family': '', 'version': '', 'version_string': ''},
+        'ua_string': '',
+    }
+
+    def parse_family_val(v):
+        """ Turn UserAgents tuple-based values into dicts. """
+        attrs = ('family', 'brand', 'model', 'version', 'version_string')
+        if not any(hasattr(v, a) for a in attrs):
+            return v
+        values = set()
+        keyvalstrs = []
+        notset = object()
+        for a in attrs:
+            val = getattr(v, a, notset)
+            if (val is notset) or (not val):
+                # Ignore missing attrs/values.
+                continue
+            if val in values:
+                # Don't add duplicate values (family: nexus, model: nexus)
+                continue
+            values.add(val)
+            keyvalstrs.append('{}: {}'.format(a.title(), val))
+
+        return ', '.join(keyvalstrs)
+
+    return {
+        k: parse_family_val(getattr(ua, k, ua_attrs[k]))
+        for k in ua_attrs
+    }